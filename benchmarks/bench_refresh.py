@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the WireGUI refresh loop
+
+Runs the main window offscreen against N simulated interfaces with M peers
+each and measures what a refresh tick costs: refresh_status (background poll
+plus the GUI-thread update), show_tunnel_info, load_tunnels and
+get_transfer_stats. Reports latency percentiles, process spawns and memory.
+
+The simulated `wg` is either injected as the status backend runner (no
+processes at all, measures our own code) or installed as stub `wg` and
+`wg-quick` scripts on PATH (measures the real fork/exec path too).
+
+    python3 benchmarks/bench_refresh.py --interfaces 20 --peers 50 --ticks 200
+    python3 benchmarks/bench_refresh.py --runner path --json > before.json
+    python3 benchmarks/bench_refresh.py --profile refresh.prof
+"""
+
+import argparse
+import base64
+import cProfile
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+STUB_WG = """#!{python}
+import os, sys
+sys.path.insert(0, {bench_dir!r})
+from bench_refresh import FakeWg
+if sys.argv[1:4] != ['show', 'all', 'dump']:
+    sys.exit(0)
+state = os.environ['WIREGUI_BENCH_STATE']
+try:
+    with open(state) as f:
+        tick = int(f.read() or 0)
+except OSError:
+    tick = 0
+with open(state, 'w') as f:
+    f.write(str(tick + 1))
+fake = FakeWg(int(os.environ['WIREGUI_BENCH_INTERFACES']),
+              int(os.environ['WIREGUI_BENCH_PEERS']), tick=tick)
+sys.stdout.write(fake.dump())
+"""
+
+STUB_WG_QUICK = """#!/bin/sh
+exit 0
+"""
+
+def fake_key(*parts):
+    """A stable, well-formed WireGuard key"""
+    digest = hashlib.sha256('-'.join(map(str, parts)).encode()).digest()
+    return base64.b64encode(digest).decode()
+
+class FakeWg:
+    """Simulated `wg show all dump` output, counters advance on every call"""
+    def __init__(self, interfaces, peers, tick=0):
+        self.interfaces = interfaces
+        self.peers = peers
+        self.tick = tick
+        self.started = int(time.time())
+
+    def names(self):
+        return [f"wg{i}" for i in range(self.interfaces)]
+
+    def dump(self):
+        now = self.started + self.tick
+        lines = []
+        for i, name in enumerate(self.names()):
+            lines.append(f"{name}\t{fake_key('priv', i)}\t{fake_key('pub', i)}\t{51820 + i}\toff")
+            for j in range(self.peers):
+                rx = (i + 1) * (j + 1) * 1500 * self.tick
+                tx = (i + 1) * (j + 1) * 700 * self.tick
+                lines.append(f"{name}\t{fake_key('peer', i, j)}\t(none)\t"
+                             f"198.51.100.{j % 250 + 1}:{51820 + j}\t"
+                             f"10.{i}.{j // 250}.{j % 250 + 1}/32\t"
+                             f"{now - 5}\t{rx}\t{tx}\t25")
+        return '\n'.join(lines) + '\n'
+
+    def __call__(self, args, timeout=None):
+        output = self.dump()
+        self.tick += 1
+        return subprocess.CompletedProcess(args, 0, output, '')
+
+    def write_configs(self, config_dir):
+        """Write a valid config for every simulated interface"""
+        for i, name in enumerate(self.names()):
+            lines = ["[Interface]",
+                     f"PrivateKey = {fake_key('priv', i)}",
+                     f"Address = 10.{i}.255.1/16",
+                     f"ListenPort = {51820 + i}",
+                     ""]
+            for j in range(self.peers):
+                lines += ["[Peer]",
+                          f"PublicKey = {fake_key('peer', i, j)}",
+                          f"AllowedIPs = 10.{i}.{j // 250}.{j % 250 + 1}/32",
+                          f"Endpoint = 198.51.100.{j % 250 + 1}:{51820 + j}",
+                          "PersistentKeepalive = 25",
+                          ""]
+            path = os.path.join(config_dir, f"{name}.conf")
+            with open(path, 'w') as f:
+                f.write('\n'.join(lines))
+            os.chmod(path, 0o600)
+
+def percentiles(samples):
+    """p50/p90/p99/max of a list of seconds, in milliseconds"""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+    return {'n': len(ordered), 'p50': pick(0.50), 'p90': pick(0.90),
+            'p99': pick(0.99), 'max': ordered[-1] * 1000,
+            'mean': sum(ordered) / len(ordered) * 1000}
+
+def memory_kib(field):
+    """A memory figure of this process from /proc/self/status, e.g. VmRSS"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+def setup_environment(workdir, args):
+    """Keep the run away from the user's settings, state and tunnels"""
+    os.environ['QT_QPA_PLATFORM'] = 'offscreen'
+    for var in ('XDG_CONFIG_HOME', 'XDG_DATA_HOME', 'XDG_STATE_HOME', 'XDG_CACHE_HOME'):
+        os.environ[var] = os.path.join(workdir, var.lower())
+        os.makedirs(os.environ[var], exist_ok=True)
+    # No daemon or helper may answer for the simulated interfaces
+    os.environ['XDG_RUNTIME_DIR'] = os.path.join(workdir, 'runtime')
+    os.makedirs(os.environ['XDG_RUNTIME_DIR'], mode=0o700, exist_ok=True)
+    if args.runner == 'path':
+        bin_dir = os.path.join(workdir, 'bin')
+        os.makedirs(bin_dir)
+        stubs = {'wg': STUB_WG.format(python=sys.executable,
+                                      bench_dir=os.path.dirname(os.path.abspath(__file__))),
+                 'wg-quick': STUB_WG_QUICK}
+        for name, text in stubs.items():
+            path = os.path.join(bin_dir, name)
+            with open(path, 'w') as f:
+                f.write(text)
+            os.chmod(path, 0o755)
+        os.environ['PATH'] = bin_dir + os.pathsep + os.environ.get('PATH', '')
+        os.environ['WIREGUI_BENCH_STATE'] = os.path.join(workdir, 'wg-tick')
+        os.environ['WIREGUI_BENCH_INTERFACES'] = str(args.interfaces)
+        os.environ['WIREGUI_BENCH_PEERS'] = str(args.peers)
+
+def run(args, workdir):
+    setup_environment(workdir, args)
+
+    from PyQt5.QtCore import QEventLoop, QSettings
+    from PyQt5.QtWidgets import QApplication
+
+    QSettings.setPath(QSettings.NativeFormat, QSettings.UserScope,
+                      os.environ['XDG_CONFIG_HOME'])
+    QSettings.setPath(QSettings.IniFormat, QSettings.UserScope,
+                      os.environ['XDG_CONFIG_HOME'])
+    settings = QSettings('WireGUI', 'WireGUI')
+    settings.setValue('status_backend', 'wg')
+    settings.setValue('use_helper', False)
+    settings.setValue('traffic_accounting', not args.no_traffic)
+    settings.setValue('auto_restart', False)
+    settings.sync()
+
+    from wiregui import WireGuardGUI
+    from wiregui_core import WgDumpBackend, run_command, spawn_count
+
+    fake = FakeWg(args.interfaces, args.peers)
+    config_dir = os.path.join(workdir, 'wireguard')
+    os.makedirs(config_dir, mode=0o700)
+    fake.write_configs(config_dir)
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    window = WireGuardGUI(config_dir=config_dir)
+    window.show()
+    # Tunnels and the first status poll follow asynchronously
+    while 'status' not in window.startup:
+        app.processEvents(QEventLoop.WaitForMoreEvents)
+    # Only the benchmark drives refreshes
+    window.scheduler.callback = lambda: None
+    window.link_refresh.timeout.disconnect()
+
+    def drain():
+        while window.poll_pending:
+            app.processEvents(QEventLoop.WaitForMoreEvents)
+        app.processEvents()
+
+    window.status.backend = WgDumpBackend(fake if args.runner == 'inject' else run_command)
+    window.select_tunnel('wg0')
+
+    gui_times = []
+    on_status_polled = window.on_status_polled
+
+    def timed_status_polled(interfaces, error):
+        start = time.perf_counter()
+        on_status_polled(interfaces, error)
+        gui_times.append(time.perf_counter() - start)
+
+    window.on_status_polled = timed_status_polled
+
+    spawns_before = spawn_count()
+
+    def measure(fn, samples, spawn_counts):
+        before = spawn_count()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+        spawn_counts.append(spawn_count() - before)
+
+    names = fake.names()
+    timings = {'refresh_status': [], 'show_tunnel_info': [],
+               'load_tunnels': [], 'get_transfer_stats': []}
+    forks = {name: [] for name in timings}
+
+    def refresh():
+        window.refresh_status()
+        drain()
+
+    for _ in range(args.warmup):
+        refresh()
+    del gui_times[:]
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    rss_before = memory_kib('VmRSS')
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler:
+        profiler.enable()
+    for tick in range(args.ticks):
+        name = names[tick % len(names)]
+        measure(refresh, timings['refresh_status'], forks['refresh_status'])
+        measure(lambda: window.show_tunnel_info(name),
+                timings['show_tunnel_info'], forks['show_tunnel_info'])
+        measure(window.load_tunnels, timings['load_tunnels'], forks['load_tunnels'])
+        measure(lambda: window.get_transfer_stats(name),
+                timings['get_transfer_stats'], forks['get_transfer_stats'])
+    if profiler:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+    rss_after = memory_kib('VmRSS')
+
+    memory = {'rss_before_kib': rss_before, 'rss_after_kib': rss_after,
+              'max_rss_kib': memory_kib('VmHWM')}
+    if args.tracemalloc:
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        memory.update(traced_kib=current // 1024, traced_peak_kib=peak // 1024)
+
+    window.close()
+    window.executor.wait()
+    window.bulk_executor.wait()
+
+    return {
+        'interfaces': args.interfaces,
+        'peers': args.peers,
+        'ticks': args.ticks,
+        'runner': args.runner,
+        'startup_ms': {phase: seconds * 1000 for phase, seconds in window.startup.items()},
+        'latency_ms': dict({name: percentiles(samples) for name, samples in timings.items()},
+                           on_status_polled=percentiles(gui_times)),
+        'spawns_per_call': {name: sum(counts) / max(len(counts), 1)
+                            for name, counts in forks.items()},
+        'spawns_total': spawn_count() - spawns_before,
+        'memory': memory,
+    }
+
+def print_report(report):
+    print(f"{report['interfaces']} interfaces × {report['peers']} peers, "
+          f"{report['ticks']} ticks, runner: {report['runner']}")
+    print("startup: " + ', '.join(f"{phase} {ms:.1f} ms"
+                                  for phase, ms in report['startup_ms'].items()))
+    print()
+    print(f"{'':22} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9} {'spawns':>7}")
+    for name, stats in report['latency_ms'].items():
+        spawns = report['spawns_per_call'].get(name)
+        spawns = f"{spawns:7.2f}" if spawns is not None else f"{'':7}"
+        print(f"{name:22} {stats['p50']:9.3f} {stats['p90']:9.3f} "
+              f"{stats['p99']:9.3f} {stats['max']:9.3f} {spawns}")
+    print("(latency in ms, spawns per call)")
+    print()
+    memory = report['memory']
+    print(f"RSS {memory['rss_before_kib']} → {memory['rss_after_kib']} KiB over the run, "
+          f"max {memory['max_rss_kib']} KiB")
+    if 'traced_kib' in memory:
+        print(f"Python heap {memory['traced_kib']} KiB, peak {memory['traced_peak_kib']} KiB")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the WireGUI refresh loop")
+    parser.add_argument('--interfaces', type=int, default=10, help="simulated interfaces")
+    parser.add_argument('--peers', type=int, default=20, help="peers per interface")
+    parser.add_argument('--ticks', type=int, default=100, help="measured refresh ticks")
+    parser.add_argument('--warmup', type=int, default=5, help="ticks before measuring")
+    parser.add_argument('--runner', choices=('inject', 'path'), default='inject',
+                        help="inject the fake wg, or run stub scripts from PATH")
+    parser.add_argument('--no-traffic', action='store_true',
+                        help="disable traffic accounting")
+    parser.add_argument('--tracemalloc', action='store_true',
+                        help="trace Python allocations (slows the run down)")
+    parser.add_argument('--profile', metavar='FILE',
+                        help="write cProfile stats of the measured ticks")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args(argv)
+    if args.interfaces < 1 or args.peers < 0 or args.ticks < 1:
+        parser.error("need at least one interface and one tick")
+
+    with tempfile.TemporaryDirectory(prefix='wiregui-bench-') as workdir:
+        report = run(args, workdir)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""Record the netlink replies of a live system as a test fixture
+
+Run as root with WireGuard interfaces up and idle (the `wg show all dump`
+taken afterwards must show the same counters). Private keys end up in the
+output, so only record test interfaces:
+
+    sudo python3 tests/fixtures/record_netlink.py "description" > tests/fixtures/NAME.json
+"""
+import json
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from wiregui_core import NETLINK_GENERIC, NETLINK_ROUTE, NetlinkBackend
+
+class RecordingSocket:
+    """Passes calls through to a netlink socket and keeps every recv() buffer"""
+    def __init__(self, sock):
+        self.sock = sock
+        self.chunks = []
+
+    def send(self, data):
+        return self.sock.send(data)
+
+    def recv(self, size):
+        data = self.sock.recv(size)
+        self.chunks.append(data)
+        return data
+
+def main():
+    route = RecordingSocket(NetlinkBackend.open_socket(NETLINK_ROUTE))
+    genl = RecordingSocket(NetlinkBackend.open_socket(NETLINK_GENERIC))
+    NetlinkBackend(route, genl).poll()
+    dump = subprocess.run(['wg', 'show', 'all', 'dump'], capture_output=True, text=True, check=True)
+    json.dump({'description': ' '.join(sys.argv[1:]),
+               'route': [chunk.hex() for chunk in route.chunks],
+               'genl': [chunk.hex() for chunk in genl.chunks],
+               'wg_dump': dump.stdout}, sys.stdout, indent=1)
+    print()
+
+if __name__ == '__main__':
+    main()
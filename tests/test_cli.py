@@ -0,0 +1,101 @@
+"""Headless `wiregui` commands with simulated backends and daemon"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import wiregui_core
+from wiregui_core import cli_main
+
+UP = {'wg0': {'peers': []}}
+
+class Backend:
+    name = 'test'
+
+    def __init__(self, interfaces=None, error=None):
+        self.interfaces = interfaces or {}
+        self.error = error
+
+    def poll(self):
+        if self.error:
+            raise self.error
+        return self.interfaces
+
+    def fallback(self):
+        return None
+
+class Daemon:
+    """DaemonClient that answers ping, then fails like a daemon that just exited"""
+    def __init__(self, available=True):
+        self.is_available = available
+        self.requests = []
+
+    def available(self):
+        return self.is_available
+
+    def request(self, cmd, **params):
+        self.requests.append(cmd)
+        raise ConnectionRefusedError(111, "Connection refused")
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def cli(tmp_path, monkeypatch):
+    for name in ('wg0', 'wg1'):
+        (tmp_path / f"{name}.conf").write_text("[Interface]\n")
+    state = {'backend': Backend(UP), 'daemon': Daemon(available=False), 'commands': []}
+    monkeypatch.setattr(wiregui_core, 'select_status_backend',
+                        lambda preference='auto': state['backend'])
+    monkeypatch.setattr(wiregui_core, 'DaemonClient', lambda *args, **kwargs: state['daemon'])
+
+    def run_command(args, timeout=None):
+        state['commands'].append(args)
+        return subprocess.CompletedProcess(args, 0, '', '')
+
+    monkeypatch.setattr(wiregui_core, 'run_command', run_command)
+
+    def run(*argv):
+        return cli_main([*argv, '--config-dir', str(tmp_path)])
+
+    run.state = state
+    return run
+
+def test_list(cli, capsys):
+    assert cli('list') == 0
+    assert capsys.readouterr().out == "wg0\tup\nwg1\tdown\n"
+
+def test_list_without_status_still_lists(cli, capsys):
+    cli.state['backend'] = Backend(error=RuntimeError("wg: command not found"))
+    assert cli('list') == 0
+    out, err = capsys.readouterr()
+    assert out == "wg0\tunknown\nwg1\tunknown\n"
+    assert err == "wiregui: status unavailable: wg: command not found\n"
+
+def test_status_without_status_fails(cli, capsys):
+    cli.state['backend'] = Backend(error=PermissionError(1, "Operation not permitted"))
+    assert cli('status') == 1
+    out, err = capsys.readouterr()
+    assert out == ''
+    assert err.startswith("wiregui: status unavailable:")
+
+def test_daemon_lost_after_ping_falls_back(cli, capsys):
+    cli.state['daemon'] = Daemon()
+    assert cli('list') == 0
+    assert capsys.readouterr().out == "wg0\tup\nwg1\tdown\n"
+    assert cli('status', 'wg0') == 0
+    assert cli.state['daemon'].requests == ['status', 'status']
+
+def test_up_falls_back_when_the_daemon_is_lost(cli):
+    cli.state['daemon'] = Daemon()
+    assert cli('up', 'wg1') == 0
+    assert cli.state['daemon'].requests == ['up']
+    assert cli.state['commands'] == [['wg-quick', 'up', 'wg1']]
+
+def test_invalid_name(cli):
+    assert cli('down', 'wg0\n') == 2
+    assert cli.state['commands'] == []
@@ -0,0 +1,132 @@
+"""Config parsing and the incremental validator"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import wiregui_core
+from wiregui_core import ConfigValidator, config_errors, parse_config, validate_config
+
+KEY_A = 'yAnz5TF+lXXJte14tji3zlMNq+hd2rYUIgJBgB3fBmk='
+KEY_B = 'xTIBA5rboUvnH4htodjb6e697QjLERt1NAB4mZqp8Dg='
+KEY_C = 'TrMvSoP4jYQlY6RIzBgbssQqY3vxI2Pi+y71lOWWXX0='
+
+CONFIG = f"""# Office
+[Interface]
+PrivateKey = {KEY_A}
+Address = 10.0.0.2/32, fd00::2/128
+DNS = 10.0.0.1
+
+[Peer]
+PublicKey = {KEY_B}
+AllowedIPs = 10.0.0.0/24
+Endpoint = vpn.example.com:51820
+
+[Peer]
+PublicKey = {KEY_C}
+AllowedIPs = 10.1.0.0/24
+AllowedIPs = 10.2.0.0/24
+"""
+
+@pytest.mark.parametrize('text', [
+    CONFIG,
+    CONFIG.replace('\n', '\r\n'),
+    CONFIG.rstrip('\n'),
+    CONFIG.replace('\n', '\r\n').rstrip('\r\n'),
+    "  [Interface]  \n\tPrivateKey=abc  # keep\n\n\n[Peer]\n",
+    "no section = here\n[Interface]\n",
+    "",
+    "\n\n",
+])
+def test_round_trip(text):
+    assert parse_config(text).to_text() == text
+
+def test_sections_and_values():
+    config = parse_config(CONFIG)
+    assert [section.name for section in config.sections] == [None, 'Interface', 'Peer', 'Peer']
+    assert config.interface.get('privatekey') == KEY_A
+    assert config.interface.get_list('Address') == ['10.0.0.2/32', 'fd00::2/128']
+    assert config.peers[1].get_list('AllowedIPs') == ['10.1.0.0/24', '10.2.0.0/24']
+    assert config.peers[0].get('Missing', 'default') == 'default'
+
+def test_crlf_values_have_no_carriage_return():
+    config = parse_config(CONFIG.replace('\n', '\r\n'))
+    assert config.interface.get('DNS') == '10.0.0.1'
+    assert config.peers[0].get('Endpoint') == 'vpn.example.com:51820'
+    assert config.peers[1].get_list('AllowedIPs') == ['10.1.0.0/24', '10.2.0.0/24']
+
+def test_set_keeps_comments_and_line_endings():
+    text = CONFIG.replace('DNS = 10.0.0.1', 'DNS = 10.0.0.1 # resolver')
+    for newline in ('\n', '\r\n'):
+        config = parse_config(text.replace('\n', newline))
+        config.interface.set('dns', '10.0.0.53')
+        config.interface.set('ListenPort', '51820')
+        expected = text.replace('DNS = 10.0.0.1 # resolver',
+                                'DNS = 10.0.0.53 # resolver\nListenPort = 51820')
+        assert config.to_text() == expected.replace('\n', newline)
+
+def test_valid_config_has_no_issues():
+    assert validate_config(CONFIG) == []
+    assert validate_config(CONFIG.replace('\n', '\r\n')) == []
+
+def test_issue_line_numbers():
+    text = CONFIG.replace('DNS = 10.0.0.1', 'DNS = 10.0.0.1\nMTU = 10\nBogus = 1')
+    issues = validate_config(text)
+    assert [(issue.line, issue.severity) for issue in issues] == [(6, 'error'), (7, 'warning')]
+    assert issues[0].message.startswith('MTU')
+    assert validate_config(text.replace('\n', '\r\n'))[0].line == 6
+
+def test_duplicate_allowed_ips_line_numbers():
+    # The second peer also routes 10.0.0.0/24 on line 15, the first one on line 9
+    text = CONFIG.replace('AllowedIPs = 10.2.0.0/24', 'AllowedIPs = 10.2.0.0/24, 10.0.0.0/24')
+    errors = config_errors(validate_config(text))
+    assert [(issue.line, issue.message) for issue in errors] == [
+        (15, "AllowedIPs 10.0.0.0/24 is also routed to the peer on line 9")]
+
+def test_duplicates_are_compared_normalized():
+    text = CONFIG.replace('AllowedIPs = 10.1.0.0/24', 'AllowedIPs = 10.0.0.0/24 ')
+    assert [issue.line for issue in validate_config(text)] == [14]
+
+def test_duplicate_public_key_and_interface():
+    text = CONFIG.replace(KEY_C, KEY_B) + f"\n[Interface]\nPrivateKey = {KEY_A}\n"
+    issues = validate_config(text)
+    assert [(issue.line, issue.message) for issue in issues] == [
+        (12, "PublicKey also used by the peer on line 7"),
+        (17, "more than one [Interface]"),
+    ]
+
+def test_incremental_validation_only_checks_changed_sections(monkeypatch):
+    checked = []
+    validate_section = wiregui_core.validate_section
+
+    def counting(chunk):
+        checked.append(chunk.split('\n', 1)[0].strip())
+        return validate_section(chunk)
+
+    monkeypatch.setattr(wiregui_core, 'validate_section', counting)
+    validator = ConfigValidator()
+    assert validator.validate(CONFIG) == []
+    assert len(checked) == 4
+    checked.clear()
+    # Editing the first peer re-checks it alone
+    edited = CONFIG.replace('10.0.0.0/24', '10.1.0.0/24')
+    issues = validator.validate(edited)
+    assert checked == ['[Peer]']
+    assert [issue.line for issue in issues] == [14]
+    checked.clear()
+    # Lines inserted above shift the cached results of the sections below
+    shifted = edited.replace('# Office', '# Office\n# second comment\n#')
+    issues = validator.validate(shifted)
+    assert checked == ['# Office']
+    assert [issue.line for issue in issues] == [16]
+    assert issues[0].message == "AllowedIPs 10.1.0.0/24 is also routed to the peer on line 11"
+
+def test_validator_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(ConfigValidator, 'MAX_CACHED', 3)
+    validator = ConfigValidator()
+    for port in range(10):
+        validator.validate(CONFIG.replace('DNS', f"ListenPort = {port}\nDNS"))
+        assert len(validator.cache) <= 4
@@ -0,0 +1,134 @@
+"""Handshake health of active tunnels and the restart backoff"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from wiregui_core import HealthMonitor, format_age
+
+NOW = 1_000_000.0
+
+def peer(key, handshake=0.0, endpoint='203.0.113.1:51820', keepalive=25, tx=0):
+    return {'public_key': key, 'endpoint': endpoint, 'allowed_ips': [],
+            'latest_handshake': handshake, 'rx': 0, 'tx': tx, 'keepalive': keepalive}
+
+def iface(*peers):
+    return {'peers': list(peers)}
+
+def test_handshakes_decide_the_state():
+    monitor = HealthMonitor(stale_after=180)
+    assert monitor.update({'wg0': iface(peer('a', NOW - 10), peer('b', NOW - 10))}, NOW) == []
+    assert monitor.state('wg0') == 'healthy'
+    changes = monitor.update({'wg0': iface(peer('a', NOW - 10), peer('b', NOW - 300))}, NOW)
+    assert changes == [('wg0', 'healthy', 'degraded')]
+    assert [p['public_key'] for p in monitor.tunnels['wg0'].stale_peers] == ['b']
+    changes = monitor.update({'wg0': iface(peer('a', NOW - 300), peer('b', NOW - 300))}, NOW)
+    assert changes == [('wg0', 'degraded', 'stale')]
+    # Going down while stale is reported, the record is dropped
+    assert monitor.update({}, NOW) == [('wg0', 'stale', None)]
+    assert monitor.state('wg0') is None
+
+def test_peers_without_endpoint_are_not_judged():
+    monitor = HealthMonitor(stale_after=180)
+    monitor.update({'wg0': iface(peer('server', NOW - 10), peer('road', 0, endpoint=None))}, NOW)
+    assert monitor.state('wg0') == 'healthy'
+    assert monitor.tunnels['wg0'].peers == 1
+
+def test_no_handshake_gets_a_grace_period():
+    monitor = HealthMonitor(stale_after=180)
+    monitor.update({'wg0': iface(peer('a'))}, NOW)
+    assert monitor.state('wg0') == 'healthy'
+    monitor.update({'wg0': iface(peer('a'))}, NOW + 180)
+    assert monitor.state('wg0') == 'healthy'
+    assert monitor.update({'wg0': iface(peer('a'))}, NOW + 181) == [('wg0', 'healthy', 'stale')]
+
+def test_disabled_monitor_judges_nothing():
+    monitor = HealthMonitor(stale_after=0)
+    assert monitor.update({'wg0': iface(peer('a', NOW - 10000))}, NOW) == []
+    assert monitor.state('wg0') is None
+
+def test_idle_peer_without_keepalive_is_not_stale():
+    monitor = HealthMonitor(stale_after=180)
+    idle = peer('a', NOW - 3600, keepalive=0, tx=1000)
+    monitor.update({'wg0': iface(idle)}, NOW)
+    monitor.update({'wg0': iface(idle)}, NOW + 600)
+    assert monitor.state('wg0') == 'healthy'
+
+def test_peer_without_keepalive_sending_without_handshake_is_stale():
+    monitor = HealthMonitor(stale_after=180)
+    monitor.update({'wg0': iface(peer('a', NOW - 3600, keepalive=0, tx=1000))}, NOW)
+    # It sends over the old session, which needs a new handshake
+    changes = monitor.update({'wg0': iface(peer('a', NOW - 3600, keepalive=0, tx=1500))}, NOW + 5)
+    assert changes == [('wg0', 'healthy', 'stale')]
+    # The handshake comes, the peer is fine again
+    changes = monitor.update({'wg0': iface(peer('a', NOW + 6, keepalive=0, tx=1600))}, NOW + 7)
+    assert changes == [('wg0', 'stale', 'healthy')]
+
+def test_fresh_session_without_keepalive_is_not_marked():
+    monitor = HealthMonitor(stale_after=60)
+    # Within REKEY_AFTER_TIME of the handshake sending needs no new one
+    monitor.update({'wg0': iface(peer('a', NOW - 30, keepalive=0, tx=10))}, NOW)
+    monitor.update({'wg0': iface(peer('a', NOW - 30, keepalive=0, tx=20))}, NOW + 60)
+    assert monitor.state('wg0') == 'healthy'
+    assert monitor.tunnels['wg0'].sent == {}
+    # Once older, the traffic from then on counts
+    monitor.update({'wg0': iface(peer('a', NOW - 30, keepalive=0, tx=20))}, NOW + 100)
+    assert monitor.tunnels['wg0'].sent == {'a': (NOW - 30, 20)}
+    monitor.update({'wg0': iface(peer('a', NOW - 30, keepalive=0, tx=30))}, NOW + 110)
+    assert monitor.state('wg0') == 'stale'
+    # Marks of peers that left the config are dropped
+    monitor.update({'wg0': iface(peer('b', NOW + 100))}, NOW + 110)
+    assert monitor.tunnels['wg0'].sent == {}
+
+def test_restart_backoff_doubles_up_to_the_limit():
+    monitor = HealthMonitor(stale_after=180, backoff=60, max_backoff=200, max_restarts=100)
+    stale = {'wg0': iface(peer('a', NOW - 1000))}
+    now = NOW
+    monitor.update(stale, now)
+    delays = []
+    for _attempt in range(4):
+        assert monitor.due_restarts(now) == ['wg0']
+        delay = monitor.restarted('wg0', now)
+        delays.append(delay)
+        # Fresh grace period, and the backoff holds even once it is over
+        monitor.update(stale, now + 1)
+        assert monitor.due_restarts(now + 1) == []
+        now += delay
+        monitor.update(stale, now)
+    assert delays == [60, 120, 200, 200]
+
+def test_backoff_is_reset_by_a_handshake_only():
+    monitor = HealthMonitor(stale_after=180, backoff=60)
+    monitor.update({'wg0': iface(peer('a', NOW - 1000))}, NOW)
+    monitor.restarted('wg0', NOW)
+    # Healthy during the grace period of the restart, without a handshake
+    monitor.update({'wg0': iface(peer('a'))}, NOW + 10)
+    assert monitor.state('wg0') == 'healthy'
+    assert 'wg0' in monitor.backoffs
+    monitor.update({'wg0': iface(peer('a', NOW + 20))}, NOW + 20)
+    assert 'wg0' not in monitor.backoffs
+    assert monitor.restarted('wg0', NOW + 30) == 60
+
+def test_backoff_survives_the_interface_going_down():
+    monitor = HealthMonitor(stale_after=180, backoff=60)
+    monitor.update({'wg0': iface(peer('a', NOW - 1000))}, NOW)
+    monitor.restarted('wg0', NOW)
+    monitor.update({}, NOW + 1)  # wg-quick down during the restart
+    assert monitor.restarted('wg0', NOW + 2) == 120
+
+def test_global_restart_limit():
+    monitor = HealthMonitor(stale_after=180, max_restarts=2, restart_window=600)
+    stale = {f"wg{k}": iface(peer('a', NOW - 1000)) for k in range(4)}
+    monitor.update(stale, NOW)
+    assert monitor.due_restarts(NOW) == ['wg0', 'wg1']
+    monitor.restarted('wg0', NOW)
+    assert monitor.due_restarts(NOW) == ['wg1']
+    monitor.restarted('wg1', NOW)
+    assert monitor.due_restarts(NOW + 599) == []
+    # The window passed, and so did the backoff of the first two
+    assert monitor.due_restarts(NOW + 600) == ['wg0', 'wg1']
+
+def test_thresholds_are_formatted_in_any_unit():
+    assert [format_age(seconds) for seconds in (0, 45, 60, 90, 180, 3600, 3605, 7322)] == [
+        '0s', '45s', '1m', '1m 30s', '3m', '1h', '1h 0m 5s', '2h 2m 2s']
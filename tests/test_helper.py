@@ -0,0 +1,196 @@
+"""Request handling of the privileged helper
+
+The helper is the boundary between the user and root, so these call its
+handle() and allow_peer() directly with crafted requests and peers.
+"""
+import os
+import socket
+import struct
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from wiregui_core import TUNNEL_NAME, PrivilegedHelper, check_tunnel_name
+
+UID = 1000
+
+CONFIG = """[Interface]
+PrivateKey = yAnz5TF+lXXJte14tji3zlMNq+hd2rYUIgJBgB3fBmk=
+Address = 10.0.0.2/32
+
+[Peer]
+PublicKey = xTIBA5rboUvnH4htodjb6e697QjLERt1NAB4mZqp8Dg=
+AllowedIPs = 0.0.0.0/0
+"""
+
+HOOKED = CONFIG.replace("Address = 10.0.0.2/32\n",
+                        "Address = 10.0.0.2/32\nPostUp = ip rule add table 200\n")
+
+class FakePeer:
+    """Stands in for the client connection, reports the given credentials"""
+    def __init__(self, uid, pid=4242, gid=100):
+        self.creds = struct.pack('3i', pid, uid, gid)
+        self.options = []
+
+    def getsockopt(self, level, option, size):
+        self.options.append((level, option))
+        return self.creds[:size]
+
+class NoInterfaces:
+    name = 'test'
+
+    def poll(self):
+        return {}
+
+@pytest.fixture
+def helper(tmp_path, monkeypatch):
+    helper = PrivilegedHelper(UID, config_dir=str(tmp_path / 'configs'))
+    os.mkdir(helper.config_dir)
+    helper.poller.backend = NoInterfaces()
+    helper.commands = []
+
+    def run_command(args, timeout=None):
+        helper.commands.append(args)
+        return subprocess.CompletedProcess(args, 0, '', '')
+
+    monkeypatch.setattr('wiregui_core.run_command', run_command)
+    return helper
+
+def read_file(helper, name):
+    with open(os.path.join(helper.config_dir, f"{name}.conf")) as f:
+        return f.read()
+
+def write_file(helper, name, text):
+    with open(os.path.join(helper.config_dir, f"{name}.conf"), 'w') as f:
+        f.write(text)
+
+def test_peer_credentials():
+    helper = PrivilegedHelper.__new__(PrivilegedHelper)
+    helper.uid = UID
+    peer = FakePeer(UID)
+    assert helper.allow_peer(peer)
+    assert peer.options == [(socket.SOL_SOCKET, socket.SO_PEERCRED)]
+    assert helper.allow_peer(FakePeer(0))
+    assert not helper.allow_peer(FakePeer(UID + 1))
+    assert not helper.allow_peer(FakePeer(65534))
+
+def test_peer_credentials_of_a_real_socket():
+    helper = PrivilegedHelper.__new__(PrivilegedHelper)
+    left, right = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        helper.uid = os.getuid()
+        assert helper.allow_peer(right)
+        if os.getuid() != 0:
+            helper.uid = os.getuid() + 1
+            assert not helper.allow_peer(right)
+    finally:
+        left.close()
+        right.close()
+
+@pytest.mark.parametrize('cmd', ['exec', 'shell', 'restart', 'import', '', None])
+def test_commands_outside_the_whitelist(helper, cmd):
+    reply = helper.handle({'cmd': cmd, 'name': 'wg0', 'args': ['id']})
+    assert reply['ok'] is False
+    assert 'unknown command' in reply['error']
+    assert helper.commands == []
+
+@pytest.mark.parametrize('name', [
+    'wg0\n', 'wg0\nx', '.', '..', '../wg0', 'wg0/x', '', 'a' * 16, 'wg 0', 'wg0;id', 'wg0$',
+    None, 42, ['wg0'],
+])
+def test_invalid_tunnel_names(helper, name):
+    assert not (isinstance(name, str) and TUNNEL_NAME.match(name))
+    with pytest.raises(ValueError):
+        check_tunnel_name(name)
+    for request in ({'cmd': 'stat'}, {'cmd': 'read'}, {'cmd': 'delete'}, {'cmd': 'versions'},
+                    {'cmd': 'write', 'text': CONFIG}):
+        with pytest.raises(ValueError):
+            helper.handle(dict(request, name=name))
+    with pytest.raises(ValueError):
+        helper.handle({'cmd': 'write_many', 'configs': {name: CONFIG}}
+                      if isinstance(name, str) else {'cmd': 'rename', 'name': 'wg0',
+                                                     'new_name': name, 'text': CONFIG})
+    for cmd in ('up', 'down'):
+        assert helper.handle({'cmd': cmd, 'name': name})['ok'] is False
+    assert helper.commands == []
+    assert os.listdir(helper.config_dir) == []
+
+@pytest.mark.parametrize('name', ['wg0', 'a' * 15, 'x.y', '...', 'wg_=+-'])
+def test_valid_tunnel_names(helper, name):
+    assert helper.handle({'cmd': 'write', 'name': name, 'text': CONFIG}) == {'ok': True}
+    assert helper.handle({'cmd': 'read', 'name': name})['text'] == CONFIG
+    helper.handle({'cmd': 'up', 'name': name})
+    assert helper.commands == [['wg-quick', 'up', name]]
+
+def test_invalid_text(helper):
+    for text in (None, 42, ['x'], 'x' * (PrivilegedHelper.MAX_CONFIG_SIZE + 1)):
+        assert helper.handle({'cmd': 'write', 'name': 'wg0', 'text': text})['ok'] is False
+        assert helper.handle({'cmd': 'write_many', 'configs': {'wg0': text}})['ok'] is False
+    assert helper.handle({'cmd': 'write_many', 'configs': ['wg0']})['ok'] is False
+    assert os.listdir(helper.config_dir) == []
+
+@pytest.mark.parametrize('hook', ['PreUp', 'PostUp', 'PreDown', 'PostDown',
+                                  'postup', 'POSTDOWN', '  PreUp  '])
+def test_new_hooks_are_refused(helper, hook):
+    text = CONFIG.replace("[Interface]\n", f"[Interface]\n{hook} = touch /root/owned\n")
+    with pytest.raises(ValueError, match='run as root'):
+        helper.handle({'cmd': 'write', 'name': 'wg0', 'text': text})
+    assert not os.path.exists(os.path.join(helper.config_dir, 'wg0.conf'))
+    # Nor over an existing config without hooks
+    write_file(helper, 'wg1', CONFIG)
+    with pytest.raises(ValueError):
+        helper.handle({'cmd': 'write', 'name': 'wg1', 'text': text})
+    assert read_file(helper, 'wg1') == CONFIG
+
+def test_hook_in_a_peer_section_is_refused(helper):
+    with pytest.raises(ValueError):
+        helper.handle({'cmd': 'write', 'name': 'wg0', 'text': CONFIG + "PostUp = id\n"})
+
+def test_existing_hooks_may_be_kept_or_dropped(helper):
+    write_file(helper, 'wg0', HOOKED)
+    edited = HOOKED.replace('10.0.0.2/32', '10.0.0.3/32')
+    assert helper.handle({'cmd': 'write', 'name': 'wg0', 'text': edited}) == {'ok': True}
+    assert read_file(helper, 'wg0') == edited
+    assert helper.handle({'cmd': 'write', 'name': 'wg0', 'text': CONFIG}) == {'ok': True}
+    # Once dropped, it cannot be put back
+    with pytest.raises(ValueError):
+        helper.handle({'cmd': 'write', 'name': 'wg0', 'text': HOOKED})
+
+def test_changed_or_repeated_hooks_are_refused(helper):
+    write_file(helper, 'wg0', HOOKED)
+    for text in (HOOKED.replace('table 200', 'table 200; id'),
+                 HOOKED.replace('PostUp', 'PreUp'),
+                 HOOKED + "[Peer]\nPostUp = ip rule add table 200\n"):
+        with pytest.raises(ValueError):
+            helper.handle({'cmd': 'write', 'name': 'wg0', 'text': text})
+    assert read_file(helper, 'wg0') == HOOKED
+
+def test_write_many_refuses_all_if_one_adds_a_hook(helper):
+    with pytest.raises(ValueError):
+        helper.handle({'cmd': 'write_many', 'configs': {'wg0': CONFIG, 'wg1': HOOKED}})
+    assert os.listdir(helper.config_dir) == []
+
+def test_rename_checks_hooks_against_the_old_config(helper):
+    write_file(helper, 'wg0', HOOKED)
+    assert helper.handle({'cmd': 'rename', 'name': 'wg0', 'new_name': 'wg1',
+                          'text': HOOKED}) == {'ok': True}
+    assert read_file(helper, 'wg1') == HOOKED
+    assert not os.path.exists(os.path.join(helper.config_dir, 'wg0.conf'))
+    write_file(helper, 'wg2', CONFIG)
+    with pytest.raises(ValueError):
+        helper.handle({'cmd': 'rename', 'name': 'wg2', 'new_name': 'wg3', 'text': HOOKED})
+    assert sorted(os.listdir(helper.config_dir)) == ['.wiregui-history', 'wg1.conf', 'wg2.conf']
+
+def test_read_version_only_serves_the_tunnels_history(helper):
+    helper.handle({'cmd': 'write', 'name': 'wg0', 'text': CONFIG})
+    helper.handle({'cmd': 'write', 'name': 'wg1', 'text': CONFIG.replace('.2/', '.3/')})
+    (_timestamp, digest), = helper.handle({'cmd': 'versions', 'name': 'wg0'})['versions']
+    assert helper.handle({'cmd': 'read_version', 'name': 'wg0', 'digest': digest})['text'] == CONFIG
+    with pytest.raises(ValueError):
+        helper.handle({'cmd': 'read_version', 'name': 'wg1', 'digest': digest})
+    with pytest.raises(ValueError):
+        helper.handle({'cmd': 'read_version', 'name': 'wg0', 'digest': '../../../etc/shadow'})
@@ -0,0 +1,114 @@
+"""Atomic config writes and the versioned config history"""
+import os
+import stat
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import wiregui_core
+from wiregui_core import ConfigHistory, LocalTunnelOps, atomic_write
+
+@pytest.fixture
+def ops(tmp_path):
+    return LocalTunnelOps(str(tmp_path))
+
+def mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+def test_atomic_write_replaces_the_file(tmp_path):
+    path = str(tmp_path / 'wg0.conf')
+    atomic_write(path, "old\n")
+    inode = os.stat(path).st_ino
+    atomic_write(path, b"new\n")
+    with open(path) as f:
+        assert f.read() == "new\n"
+    assert os.stat(path).st_ino != inode
+    assert mode(path) == 0o600
+    assert os.listdir(tmp_path) == ['wg0.conf']
+
+def test_atomic_write_keeps_the_old_file_on_failure(tmp_path, monkeypatch):
+    path = str(tmp_path / 'wg0.conf')
+    atomic_write(path, "old\n")
+
+    def fail(fd):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(os, 'fsync', fail)
+    with pytest.raises(OSError):
+        atomic_write(path, "new\n")
+    with open(path) as f:
+        assert f.read() == "old\n"
+    # No temp file is left behind, and none would look like a tunnel
+    assert os.listdir(tmp_path) == ['wg0.conf']
+
+def test_history_records_each_distinct_version(ops):
+    ops.write('wg0', "one\n")
+    ops.write('wg0', "one\n")
+    ops.write('wg0', "two\n")
+    versions = ops.versions('wg0')
+    assert [ops.read_version('wg0', digest) for _timestamp, digest in versions] == ["two\n", "one\n"]
+    assert versions[0][0] >= versions[1][0]
+    history = ops.history
+    assert mode(history.path) == 0o700
+    assert len(os.listdir(history.objects)) == 2
+
+def test_hand_edits_are_kept_before_a_write(ops):
+    ops.write('wg0', "one\n")
+    with open(ops.path('wg0'), 'w') as f:
+        f.write("edited by hand\n")
+    ops.write('wg0', "three\n")
+    assert [ops.read_version('wg0', digest) for _timestamp, digest in ops.versions('wg0')] == [
+        "three\n", "edited by hand\n", "one\n"]
+
+def test_identical_text_is_stored_once(ops):
+    ops.write('wg0', "same\n")
+    ops.write('wg1', "same\n")
+    assert len(os.listdir(ops.history.objects)) == 1
+    assert ops.versions('wg0')[0][1] == ops.versions('wg1')[0][1]
+
+def test_delete_keeps_the_last_version(ops):
+    ops.write('wg0', "one\n")
+    with open(ops.path('wg0'), 'w') as f:
+        f.write("last\n")
+    ops.delete('wg0')
+    assert not ops.exists('wg0')
+    assert ops.read_version('wg0', ops.versions('wg0')[0][1]) == "last\n"
+
+def test_rename_moves_the_config(ops):
+    ops.write('wg0', "one\n")
+    ops.rename('wg0', 'wg1', "two\n")
+    assert ops.list() == ['wg1']
+    assert ops.read('wg1') == "two\n"
+    assert len(ops.versions('wg0')) == 1
+
+def test_old_versions_are_dropped_and_collected(ops, monkeypatch):
+    monkeypatch.setattr(ConfigHistory, 'MAX_VERSIONS', 3)
+    for k in range(6):
+        ops.write('wg0', f"version {k}\n")
+    ops.write('wg1', "version 0\n")
+    assert [ops.read_version('wg0', digest) for _timestamp, digest in ops.versions('wg0')] == [
+        "version 5\n", "version 4\n", "version 3\n"]
+    # Dropped versions are deleted unless another tunnel still uses them
+    ops.write('wg0', "version 6\n")
+    assert sorted(ops.history.load(name) for name in os.listdir(ops.history.objects)) == [
+        "version 0\n", "version 4\n", "version 5\n", "version 6\n"]
+
+def test_read_version_checks_the_tunnel(ops):
+    ops.write('wg0', "one\n")
+    ops.write('wg1', "two\n")
+    digest = ops.versions('wg1')[0][1]
+    with pytest.raises(ValueError):
+        ops.read_version('wg0', digest)
+    with pytest.raises(ValueError):
+        ops.history.load('../wg0.conf')
+
+def test_batch_syncs_each_directory_once(ops, monkeypatch):
+    synced = []
+    monkeypatch.setattr(wiregui_core, 'fsync_dir', synced.append)
+    with ops.batch():
+        ops.write_many({f"wg{k}": f"config {k}\n" for k in range(10)})
+        ops.delete('wg0')
+    assert sorted(synced) == sorted({ops.config_dir, ops.history.path, ops.history.objects})
@@ -0,0 +1,65 @@
+"""The bounded log ring and its mirrors"""
+import os
+import struct
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from wiregui_core import JournalMirror, LogBuffer, LogRecord, log_level, open_log_mirror
+
+def messages(buffer):
+    return [buffer[index].message for index in range(len(buffer))]
+
+def test_ring_wraps_and_drops_the_oldest():
+    buffer = LogBuffer(3)
+    assert len(buffer) == 0 and not buffer.full
+    for k in range(3):
+        buffer.append(LogRecord(f"m{k}"))
+    assert buffer.full
+    assert messages(buffer) == ['m0', 'm1', 'm2']
+    for k in range(3, 8):
+        buffer.append(LogRecord(f"m{k}"))
+        assert len(buffer) == 3
+    assert messages(buffer) == ['m5', 'm6', 'm7']
+    assert buffer.start == 8 % 3
+
+def test_index_out_of_range():
+    buffer = LogBuffer(4)
+    buffer.append(LogRecord("only"))
+    for index in (-1, 1, 4):
+        with pytest.raises(IndexError):
+            buffer[index]
+
+def test_drop_oldest_frees_the_slot():
+    buffer = LogBuffer(2)
+    buffer.append(LogRecord("a"))
+    buffer.append(LogRecord("b"))
+    buffer.drop_oldest()
+    assert messages(buffer) == ['b']
+    assert buffer.items.count(None) == 1
+    buffer.append(LogRecord("c"))
+    buffer.append(LogRecord("d"))
+    assert messages(buffer) == ['c', 'd']
+
+def test_levels_from_the_prefix():
+    assert [log_level(m) for m in ("✓ done", "✗ failed", "⚠ careful", "plain")] == [
+        'info', 'error', 'warning', 'info']
+
+def test_file_mirror_writes_lines(tmp_path):
+    path = str(tmp_path / 'logs' / 'wiregui.log')
+    mirror = open_log_mirror('file', path)
+    mirror.write(LogRecord("✗ wg0 failed", 'error', 'wg0', timestamp=0))
+    mirror.write(LogRecord("hello", timestamp=0))
+    mirror.close()
+    with open(path, encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    assert [line.split(' ', 2)[2] for line in lines] == ["ERROR [wg0] ✗ wg0 failed", "INFO hello"]
+    assert open_log_mirror('off') is None
+
+def test_journal_fields():
+    assert JournalMirror.field('MESSAGE', 'one line') == b'MESSAGE=one line\n'
+    assert JournalMirror.field('MESSAGE', 'two\nlines') == (
+        b'MESSAGE\n' + struct.pack('<Q', 9) + b'two\nlines\n')
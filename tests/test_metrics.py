@@ -0,0 +1,128 @@
+"""Prometheus text exposition of Metrics"""
+import os
+import re
+import sys
+import urllib.error
+import urllib.request
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from wiregui_core import Metrics, MetricsServer, metric_labels
+
+NOW = 1_000_000.0
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{(?:[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\\n]|\\[\\"n])*"'
+                    r'(?:,[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\\n]|\\[\\"n])*")*)?\})? (\S+)$')
+SUFFIXES = {'counter': ('',), 'gauge': ('',), 'summary': ('_count', '_sum', '')}
+
+def parse(text):
+    """{family: (type, [(name, labels, value)])}, asserting the text format rules"""
+    assert text.endswith('\n')
+    families = {}
+    current = None
+    for line in text[:-1].split('\n'):
+        if line.startswith('# HELP '):
+            name, help_text = line[7:].split(' ', 1)
+            assert name not in families, f"{name} exposed twice"
+            assert help_text
+            current = name
+        elif line.startswith('# TYPE '):
+            name, kind = line[7:].split(' ')
+            assert name == current and kind in SUFFIXES
+            families[name] = (kind, [])
+        else:
+            match = SAMPLE.match(line)
+            assert match, f"not a sample line: {line!r}"
+            sample_name, labels, value = match.group(1), match.group(2) or '', match.group(3)
+            kind, samples = families[current]
+            assert sample_name in [current + suffix for suffix in SUFFIXES[kind]]
+            samples.append((sample_name, labels, float(value)))
+    return families
+
+def values(families, name):
+    return {labels: value for _sample, labels, value in families[name][1]}
+
+def peer(rx, tx, handshake):
+    return {'public_key': 'k', 'endpoint': None, 'allowed_ips': [], 'latest_handshake': handshake,
+            'rx': rx, 'tx': tx, 'keepalive': 0}
+
+def fed_metrics():
+    metrics = Metrics()
+    interfaces = {'wg0': {'peers': [peer(100, 10, NOW - 30), peer(200, 20, NOW - 5)]},
+                  'wg1': {'peers': [peer(0, 0, 0)]}}
+    metrics.record_poll(interfaces, ['wg0', 'wg1', 'office'], 0.0025, 1)
+    metrics.record_poll(interfaces, ['wg0', 'wg1', 'office'], 0.0015, 0)
+    metrics.record_poll_error()
+    metrics.record_toggle('wg0', 'up', 0.5, True)
+    metrics.record_toggle('wg0', 'up', 1.5, False)
+    metrics.record_toggle('office', 'down', 0.25, True)
+    metrics.record_startup('window', 0.125)
+    metrics.record_lag(0.02)
+    metrics.record_lag(0.01)
+    return metrics
+
+def test_empty_metrics_are_valid():
+    families = parse(Metrics().render(NOW))
+    assert values(families, 'wiregui_tunnel_up') == {}
+    assert values(families, 'wiregui_poll_duration_seconds') == {'': 0.0}
+
+def test_render():
+    families = parse(fed_metrics().render(NOW))
+    assert values(families, 'wiregui_tunnel_up') == {
+        '{tunnel="office"}': 0, '{tunnel="wg0"}': 1, '{tunnel="wg1"}': 1}
+    assert values(families, 'wiregui_tunnel_peers') == {'{tunnel="wg0"}': 2, '{tunnel="wg1"}': 1}
+    assert values(families, 'wiregui_tunnel_receive_bytes_total') == {
+        '{tunnel="wg0"}': 300, '{tunnel="wg1"}': 0}
+    assert values(families, 'wiregui_tunnel_transmit_bytes_total')['{tunnel="wg0"}'] == 30
+    # Without any handshake there is no age at all, rather than a huge one
+    assert values(families, 'wiregui_tunnel_last_handshake_age_seconds') == {'{tunnel="wg0"}': 5}
+    kind, samples = families['wiregui_toggle_duration_seconds']
+    assert kind == 'summary'
+    assert samples == [
+        ('wiregui_toggle_duration_seconds_count', '{tunnel="office",action="down"}', 1),
+        ('wiregui_toggle_duration_seconds_sum', '{tunnel="office",action="down"}', 0.25),
+        ('wiregui_toggle_duration_seconds_count', '{tunnel="wg0",action="up"}', 2),
+        ('wiregui_toggle_duration_seconds_sum', '{tunnel="wg0",action="up"}', 2.0),
+    ]
+    assert values(families, 'wiregui_toggle_failures_total') == {
+        '{tunnel="office",action="down"}': 0, '{tunnel="wg0",action="up"}': 1}
+    assert values(families, 'wiregui_toggle_last_duration_seconds')[
+        '{tunnel="wg0",action="up"}'] == 1.5
+    poll = {name: value for name, _labels, value in families['wiregui_poll_duration_seconds'][1]}
+    assert poll == {'wiregui_poll_duration_seconds_count': 2,
+                    'wiregui_poll_duration_seconds_sum': 0.004}
+    assert values(families, 'wiregui_poll_errors_total') == {'': 1}
+    assert values(families, 'wiregui_poll_last_duration_seconds') == {'': 0.0015}
+    assert values(families, 'wiregui_event_loop_lag_seconds') == {'': 0.01}
+    assert values(families, 'wiregui_event_loop_lag_max_seconds') == {'': 0.02}
+    assert values(families, 'wiregui_startup_seconds') == {'{phase="window"}': 0.125}
+
+def test_counters_are_never_rounded():
+    metrics = Metrics()
+    metrics.record_poll({'wg0': {'peers': [peer(123456789012345, 1, NOW)]}}, ['wg0'], 0.1, 0)
+    assert 'wiregui_tunnel_receive_bytes_total{tunnel="wg0"} 123456789012345\n' in metrics.render(NOW)
+
+def test_label_values_are_escaped():
+    assert metric_labels(tunnel='a"b\\c\nd') == '{tunnel="a\\"b\\\\c\\nd"}'
+    metrics = Metrics()
+    metrics.record_toggle('a"b\\c\nd', 'up', 1.0, True)
+    families = parse(metrics.render(NOW))
+    assert list(values(families, 'wiregui_toggle_failures_total')) == [
+        '{tunnel="a\\"b\\\\c\\nd",action="up"}']
+
+def test_server_serves_the_rendering():
+    server = MetricsServer(fed_metrics(), 0)
+    server.start()
+    try:
+        with urllib.request.urlopen(server.url(), timeout=5) as response:
+            assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+            families = parse(response.read().decode())
+        assert values(families, 'wiregui_poll_errors_total') == {'': 1}
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(server.url().replace('/metrics', '/other'), timeout=5)
+        assert error.value.code == 404
+    finally:
+        server.stop()
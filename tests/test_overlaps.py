@@ -0,0 +1,161 @@
+"""AllowedIPs overlaps: the prefix trie, find_overlaps and OverlapAnalyzer"""
+import ipaddress
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from wiregui_core import ConfigCache, OverlapAnalyzer, PrefixTrie, find_overlaps
+
+def net(text):
+    return ipaddress.ip_network(text)
+
+def config(*allowed_ips):
+    return ''.join(f"[Peer]\nPublicKey = peer{number}key\nAllowedIPs = {ips}\n"
+                   for number, ips in enumerate(allowed_ips))
+
+class MemoryOps:
+    """Config files in a dict, counts reads; on_read runs during a read"""
+    def __init__(self, configs):
+        self.configs = dict(configs)
+        self.reads = []
+        self.on_read = None
+
+    def stat(self, tunnel_name):
+        return (hash(self.configs.get(tunnel_name)),)
+
+    def read(self, tunnel_name):
+        self.reads.append(tunnel_name)
+        if tunnel_name not in self.configs:
+            raise FileNotFoundError(tunnel_name)
+        text = self.configs[tunnel_name]
+        if self.on_read:
+            self.on_read(tunnel_name)
+        return text
+
+def pairs(overlaps):
+    return sorted((o.tunnel, str(o.network), o.other_tunnel, str(o.other_network))
+                  for o in overlaps)
+
+def test_trie_covering():
+    trie = PrefixTrie()
+    for text in ('0.0.0.0/0', '10.0.0.0/8', '10.1.0.0/16', '10.1.2.0/24', '192.168.0.0/16',
+                 '::/0', 'fd00::/8'):
+        trie.insert(net(text), text)
+    assert sorted(owner for _network, owner in trie.covering(net('10.1.2.3/32'))) == [
+        '0.0.0.0/0', '10.0.0.0/8', '10.1.0.0/16', '10.1.2.0/24']
+    assert [owner for _network, owner in trie.covering(net('10.2.0.0/16'))] == [
+        '0.0.0.0/0', '10.0.0.0/8']
+    # Families are kept apart, a shorter prefix is not covered by a longer one
+    assert [owner for _network, owner in trie.covering(net('fd00::1/128'))] == ['::/0', 'fd00::/8']
+    assert [owner for _network, owner in trie.covering(net('10.0.0.0/7'))] == ['0.0.0.0/0']
+
+def test_trie_keeps_equal_prefixes():
+    trie = PrefixTrie()
+    trie.insert(net('10.0.0.0/24'), 'a')
+    trie.insert(net('10.0.0.0/24'), 'b')
+    assert [owner for _network, owner in trie.covering(net('10.0.0.0/24'))] == ['a', 'b']
+
+def test_find_overlaps():
+    prefixes = [
+        (net('10.0.0.0/24'), 'home', 'p1'),
+        (net('10.0.0.0/24'), 'office', 'p2'),
+        (net('10.0.0.128/25'), 'lab', 'p3'),
+        (net('0.0.0.0/0'), 'full', 'p4'),
+        (net('10.0.0.0/25'), 'home', 'p5'),  # only reported against other tunnels
+        (net('fd00::/64'), 'home', 'p6'),
+        (net('192.168.1.0/24'), 'office', 'p7'),
+    ]
+    overlaps = find_overlaps(prefixes)
+    assert pairs(overlaps) == [
+        ('home', '10.0.0.0/24', 'full', '0.0.0.0/0'),
+        ('home', '10.0.0.0/24', 'office', '10.0.0.0/24'),
+        ('home', '10.0.0.0/25', 'full', '0.0.0.0/0'),
+        ('home', '10.0.0.0/25', 'office', '10.0.0.0/24'),
+        ('lab', '10.0.0.128/25', 'full', '0.0.0.0/0'),
+        ('lab', '10.0.0.128/25', 'home', '10.0.0.0/24'),
+        ('lab', '10.0.0.128/25', 'office', '10.0.0.0/24'),
+        ('office', '10.0.0.0/24', 'full', '0.0.0.0/0'),
+        ('office', '192.168.1.0/24', 'full', '0.0.0.0/0'),
+    ]
+    same = [o for o in overlaps if o.same]
+    assert len(same) == 1
+    assert same[0].describe('office') == "10.0.0.0/24 is also routed by home"
+    lab = next(o for o in overlaps if o.tunnel == 'lab' and o.other_tunnel == 'home')
+    assert lab.describe('lab') == ("10.0.0.128/25 takes traffic of 10.0.0.0/24 "
+                                   "from home while both are up")
+    assert lab.describe('home') == ("10.0.0.128/25 of lab shadows part of 10.0.0.0/24 "
+                                    "while both are up")
+
+def test_find_overlaps_scales_with_prefixes():
+    prefixes = [(ipaddress.ip_network((0x0a000000 + (k << 8), 24)), f"wg{k}", 'p')
+                for k in range(5000)]
+    assert find_overlaps(prefixes) == []
+    prefixes.append((net('10.0.0.0/16'), 'wide', 'p'))
+    assert len(find_overlaps(prefixes)) == 256
+
+def test_analyzer_reads_only_changed_configs():
+    ops = MemoryOps({'a': config('10.0.0.0/24'), 'b': config('10.0.0.0/16'),
+                     'c': config('192.168.0.0/24')})
+    cache = ConfigCache(ops)
+    analyzer = OverlapAnalyzer(cache)
+    assert analyzer.analyze(['a', 'b', 'c'])
+    assert sorted(ops.reads) == ['a', 'b', 'c']
+    assert pairs(analyzer.overlaps('a')) == [('a', '10.0.0.0/24', 'b', '10.0.0.0/16')]
+    assert analyzer.overlaps('c') == []
+    ops.reads.clear()
+    assert analyzer.analyze(['a', 'b', 'c'])
+    assert ops.reads == []
+    ops.configs['c'] = config('10.0.0.0/8')
+    cache.invalidate('c')
+    assert analyzer.analyze(['a', 'b', 'c'])
+    assert ops.reads == ['c']
+    assert len(analyzer.overlaps('c')) == 2
+    assert len(analyzer.overlaps('c', among={'a'})) == 1
+    # A tunnel that is gone drops out of the result
+    assert analyzer.analyze(['a', 'c'])
+    assert analyzer.overlaps('b') == []
+    assert sorted(analyzer.prefixes) == ['a', 'c']
+
+def test_analyzer_drops_a_config_changed_while_reading():
+    ops = MemoryOps({'a': config('10.0.0.0/24'), 'b': config('172.16.0.0/12')})
+    cache = ConfigCache(ops)
+    analyzer = OverlapAnalyzer(cache)
+
+    def edit(tunnel_name):
+        if tunnel_name == 'b':
+            ops.on_read = None
+            ops.configs['b'] = config('10.0.0.0/16')
+            cache.invalidate('b')
+
+    ops.on_read = edit
+    assert not analyzer.analyze(['a', 'b'])
+    assert 'b' not in analyzer.prefixes
+    assert analyzer.analyze(['a', 'b'])
+    assert len(analyzer.overlaps('a')) == 1
+
+def test_analyzer_drops_everything_read_before_a_global_invalidation():
+    ops = MemoryOps({'a': config('10.0.0.0/24'), 'b': config('172.16.0.0/12')})
+    cache = ConfigCache(ops)
+    analyzer = OverlapAnalyzer(cache)
+    analyzer.invalidate('a')  # an older change of a single tunnel
+
+    def edit_all(tunnel_name):
+        ops.on_read = None
+        ops.configs['a'] = config('10.0.0.0/16')
+        ops.configs['b'] = config('10.0.0.0/8')
+        cache.invalidate()
+
+    ops.on_read = edit_all
+    assert not analyzer.analyze(['a', 'b'])
+    # Both were read at the old version, neither may be kept as fresh
+    assert analyzer.prefixes == {}
+    assert analyzer.analyze(['a', 'b'])
+    assert pairs(analyzer.overlaps('a')) == [('a', '10.0.0.0/16', 'b', '10.0.0.0/8')]
+
+def test_unreadable_config_has_no_prefixes():
+    ops = MemoryOps({'a': config('10.0.0.0/24')})
+    analyzer = OverlapAnalyzer(ConfigCache(ops))
+    assert analyzer.analyze(['a', 'missing'])
+    assert analyzer.prefixes['missing'] == []
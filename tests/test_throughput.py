@@ -0,0 +1,83 @@
+"""Per-peer throughput from successive status snapshots"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from wiregui_core import RingBuffer, ThroughputTracker
+
+def snapshot(**peers):
+    """{'wg0': {'peers': [...]}} from keyword peer=(rx, tx) on wg0"""
+    return {'wg0': {'peers': [{'public_key': key, 'endpoint': '203.0.113.1:51820',
+                               'rx': rx, 'tx': tx} for key, (rx, tx) in peers.items()]}}
+
+def rates(tracker):
+    return {key: (state.rx_rates.values(), state.tx_rates.values())
+            for key, state in tracker.rates('wg0')}
+
+def test_first_sighting_is_only_a_baseline():
+    tracker = ThroughputTracker()
+    # Counters of a long-running tunnel are history, not traffic now
+    assert tracker.update(snapshot(a=(10**9, 10**8)), now=100) == {}
+    assert rates(tracker) == {'a': ([], [])}
+    assert tracker.update(snapshot(a=(10**9 + 2000, 10**8 + 1000)), now=102) == {
+        'wg0': (2000, 1000)}
+    assert rates(tracker) == {'a': ([1000.0], [500.0])}
+
+def test_new_peer_on_a_known_interface_starts_with_a_baseline():
+    tracker = ThroughputTracker()
+    tracker.update(snapshot(a=(0, 0)), now=100)
+    assert tracker.update(snapshot(a=(100, 0), b=(5000, 5000)), now=101) == {'wg0': (100, 0)}
+    assert tracker.update(snapshot(a=(100, 0), b=(5010, 5000)), now=102) == {'wg0': (10, 0)}
+
+def test_counter_reset_counts_the_new_value():
+    tracker = ThroughputTracker()
+    tracker.update(snapshot(a=(5000, 4000)), now=100)
+    # The interface was restarted, its counters began again at zero
+    assert tracker.update(snapshot(a=(300, 200)), now=101) == {'wg0': (300, 200)}
+    assert rates(tracker)['a'] == ([300.0], [200.0])
+    assert tracker.update(snapshot(a=(400, 200)), now=102) == {'wg0': (100, 0)}
+
+def test_no_time_passed_no_rate():
+    tracker = ThroughputTracker()
+    tracker.update(snapshot(a=(0, 0)), now=100)
+    assert tracker.update(snapshot(a=(50, 50)), now=100) == {}
+    assert rates(tracker)['a'] == ([], [])
+
+def test_gone_peers_are_dropped():
+    tracker = ThroughputTracker()
+    tracker.update(snapshot(a=(0, 0), b=(0, 0)), now=100)
+    tracker.update(snapshot(a=(10, 10)), now=101)
+    assert [key for key, _state in tracker.rates('wg0')] == ['a']
+    tracker.update({}, now=102)
+    assert tracker.peers == {}
+    # Back again: a new baseline
+    assert tracker.update(snapshot(a=(10**6, 0)), now=103) == {}
+
+def test_reset_forgets_baselines():
+    tracker = ThroughputTracker()
+    tracker.update(snapshot(a=(0, 0)), now=100)
+    tracker.reset()
+    assert tracker.update(snapshot(a=(10**6, 0)), now=101) == {}
+
+def test_rates_sorted_busiest_first():
+    tracker = ThroughputTracker()
+    tracker.update(snapshot(a=(0, 0), b=(0, 0), c=(0, 0)), now=100)
+    tracker.update(snapshot(a=(10, 0), b=(1000, 0), c=(0, 100)), now=101)
+    assert [key for key, _state in tracker.rates('wg0')] == ['b', 'c', 'a']
+    assert tracker.rates('wg9') == []
+
+def test_history_is_bounded():
+    tracker = ThroughputTracker(history=3)
+    for k in range(6):
+        tracker.update(snapshot(a=(k * 100, 0)), now=100 + k)
+    assert rates(tracker)['a'] == ([100.0, 100.0, 100.0], [0.0, 0.0, 0.0])
+
+def test_ring_buffer_wraps():
+    ring = RingBuffer(3)
+    assert ring.values() == [] and ring.last() == 0.0
+    for value in range(1, 6):
+        ring.append(value)
+    assert ring.values() == [3.0, 4.0, 5.0]
+    assert ring.last() == 5.0
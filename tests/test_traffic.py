@@ -0,0 +1,99 @@
+"""Per-tunnel traffic totals rolled up into minute, hour and day buckets"""
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from wiregui_core import TrafficStore
+
+# About 10:00 local time on the 15th; minutes and hours are epoch aligned,
+# days and months follow the local calendar
+NOW = int(datetime(2026, 3, 15, 10, 0).timestamp()) // 3600 * 3600
+DAY = TrafficStore.day_start(NOW)
+
+@pytest.fixture
+def store(tmp_path):
+    store = TrafficStore(str(tmp_path / 'traffic.db'))
+    store.last_compaction = NOW  # compact only when a test asks for it
+    yield store
+    store.db.close()
+
+def buckets(store, resolution):
+    return store.db.execute("""
+        SELECT tunnel, bucket, rx, tx FROM traffic WHERE resolution = ?
+        ORDER BY tunnel, bucket""", (resolution,)).fetchall()
+
+def test_flush_rolls_up_minutes_hours_and_days(store):
+    store.add('wg0', 100, 10, now=NOW + 5)
+    store.add('wg0', 200, 20, now=NOW + 50)   # same minute
+    store.add('wg0', 400, 40, now=NOW + 61)   # next minute, same hour
+    store.add('wg0', 800, 80, now=NOW + 3600)  # next hour, same day
+    store.add('wg1', 1, 2, now=NOW)
+    assert buckets(store, 60) == []  # nothing written before flush
+    store.flush(now=NOW + 3600)
+    assert buckets(store, 60) == [('wg0', NOW, 300, 30), ('wg0', NOW + 60, 400, 40),
+                                  ('wg0', NOW + 3600, 800, 80), ('wg1', NOW, 1, 2)]
+    assert buckets(store, 3600) == [('wg0', NOW, 700, 70), ('wg0', NOW + 3600, 800, 80),
+                                    ('wg1', NOW, 1, 2)]
+    assert buckets(store, 86400) == [('wg0', DAY, 1500, 150), ('wg1', DAY, 1, 2)]
+    assert store.pending == {}
+
+def test_flushes_add_up(store):
+    for k in range(3):
+        store.add('wg0', 10, 1, now=NOW + k)
+        store.flush(now=NOW + k)
+    assert buckets(store, 60) == [('wg0', NOW, 30, 3)]
+    assert buckets(store, 86400) == [('wg0', DAY, 30, 3)]
+
+def test_total_includes_pending_bytes(store):
+    store.add('wg0', 100, 10, now=NOW - 86400)
+    store.add('wg0', 200, 20, now=NOW)
+    store.flush(now=NOW)
+    store.add('wg0', 5, 5, now=NOW + 60)
+    assert store.total('wg0', NOW) == (205, 25)
+    assert store.total('wg0', NOW - 86400) == (305, 35)
+    assert store.total('wg1', NOW) == (0, 0)
+
+def test_month_total_follows_the_calendar(store):
+    last_month = int(datetime(2026, 2, 28, 23, 0).timestamp())
+    first_day = int(datetime(2026, 3, 1, 0, 30).timestamp())
+    store.add('wg0', 1000, 1000, now=last_month)
+    store.add('wg0', 10, 1, now=first_day)
+    store.add('wg0', 20, 2, now=NOW)
+    store.flush(now=NOW)
+    assert store.month_total('wg0', now=NOW) == (30, 3)
+    assert store.month_total('wg0', now=first_day) == (30, 3)
+
+def test_compact_keeps_coarse_buckets(store):
+    old = NOW - 100 * 86400
+    store.add('wg0', 1, 1, now=old)
+    store.add('wg0', 2, 2, now=NOW - 3 * 86400)
+    store.add('wg0', 4, 4, now=NOW)
+    store.flush(now=NOW)
+    store.compact(now=NOW)
+    # Minutes for two days, hours for 90 days, days forever
+    assert [row[1] for row in buckets(store, 60)] == [NOW]
+    assert [row[1] for row in buckets(store, 3600)] == [NOW - 3 * 86400, NOW]
+    assert len(buckets(store, 86400)) == 3
+    assert store.total('wg0', old) == (7, 7)
+
+def test_flush_compacts_once_an_hour(store):
+    store.add('wg0', 1, 1, now=NOW - 3 * 86400)
+    store.flush(now=NOW + 3599)
+    assert len(buckets(store, 60)) == 1
+    store.flush(now=NOW + 3600)
+    assert buckets(store, 60) == []
+    assert store.last_compaction == NOW + 3600
+
+def test_close_flushes(tmp_path):
+    path = str(tmp_path / 'traffic.db')
+    store = TrafficStore(path)
+    store.add('wg0', 7, 8, now=NOW)
+    store.close()
+    reopened = TrafficStore(path)
+    assert reopened.total('wg0', NOW) == (7, 8)
+    reopened.db.close()
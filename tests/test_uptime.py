@@ -0,0 +1,103 @@
+"""Tunnel uptime records keyed by interface instance"""
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from wiregui_core import UptimeTracker
+
+class Links:
+    """Interface name -> ifindex, like the kernel hands them out"""
+    def __init__(self):
+        self.indexes = {}
+        self.next_index = 10
+
+    def up(self, name):
+        self.indexes[name] = self.next_index
+        self.next_index += 1
+
+    def down(self, name):
+        self.indexes.pop(name, None)
+
+    def __call__(self, name):
+        return self.indexes.get(name)
+
+def tracker(tmp_path, links):
+    return UptimeTracker(path=str(tmp_path / 'uptime.json'), ifindex=links)
+
+def test_interfaces_up_at_the_first_poll_are_not_exact(tmp_path):
+    links = Links()
+    links.up('wg0')
+    uptime = tracker(tmp_path, links)
+    uptime.update({'wg0': {}}, now=100)
+    assert uptime.since('wg0') == (100, False)
+    # Seen appearing between two polls
+    links.up('wg1')
+    uptime.update({'wg0': {}, 'wg1': {}}, now=105)
+    assert uptime.since('wg0') == (100, False)
+    assert uptime.since('wg1') == (105, True)
+
+def test_records_survive_a_restart_of_the_gui(tmp_path):
+    links = Links()
+    links.up('wg0')
+    uptime = tracker(tmp_path, links)
+    uptime.link_event('wg0', True, now=100)
+    with open(tmp_path / 'uptime.json') as f:
+        assert json.load(f) == {'wg0': [10, 100, True]}
+    restarted = tracker(tmp_path, links)
+    restarted.update({'wg0': {}}, now=500)
+    assert restarted.since('wg0') == (100, True)
+
+def test_recreated_interface_starts_over(tmp_path):
+    links = Links()
+    links.up('wg0')
+    uptime = tracker(tmp_path, links)
+    uptime.link_event('wg0', True, now=100)
+    # Restarted while the GUI was closed: same name, new ifindex
+    links.down('wg0')
+    links.up('wg0')
+    restarted = tracker(tmp_path, links)
+    restarted.update({'wg0': {}}, now=500)
+    assert restarted.since('wg0') == (500, False)
+
+def test_restart_between_two_polls(tmp_path):
+    links = Links()
+    links.up('wg0')
+    uptime = tracker(tmp_path, links)
+    uptime.update({'wg0': {}}, now=100)
+    links.down('wg0')
+    links.up('wg0')
+    uptime.update({'wg0': {}}, now=200)
+    assert uptime.since('wg0') == (200, True)
+
+def test_missing_from_a_partial_snapshot_keeps_the_record(tmp_path):
+    links = Links()
+    links.up('wg0')
+    uptime = tracker(tmp_path, links)
+    uptime.update({'wg0': {}}, now=100)
+    # The interface is still there, it only is not in this snapshot
+    uptime.update({}, now=200)
+    assert uptime.since('wg0') == (100, False)
+    links.down('wg0')
+    uptime.update({}, now=300)
+    assert uptime.since('wg0') is None
+
+def test_link_events(tmp_path):
+    links = Links()
+    uptime = tracker(tmp_path, links)
+    uptime.link_event('wg0', True, now=100)
+    assert uptime.since('wg0') is None  # already gone again, no ifindex
+    links.up('wg0')
+    uptime.link_event('wg0', True, now=110)
+    uptime.link_event('wg0', True, now=120)
+    assert uptime.since('wg0') == (110, True)
+    uptime.link_event('wg0', False, now=130)
+    assert uptime.since('wg0') is None
+
+def test_unreadable_state_is_ignored(tmp_path):
+    (tmp_path / 'uptime.json').write_text('{"wg0": [1, 2]}')
+    assert tracker(tmp_path, Links()).records == {}
+    (tmp_path / 'uptime.json').write_text('not json')
+    assert tracker(tmp_path, Links()).records == {}
@@ -1,256 +1,839 @@
 #!/usr/bin/env python3
 import sys
+import time
+
+# Startup timing (see WireGuardGUI.mark_startup) counts from here
+STARTED = time.monotonic()
+
+import wiregui_core
+
+# Headless commands never load Qt, see wiregui_core.cli_main
+if __name__ == '__main__' and len(sys.argv) > 1 and sys.argv[1] in wiregui_core.CLI_COMMANDS:
+    sys.exit(wiregui_core.cli_main(sys.argv[1:]))
+
 import os
 import subprocess
-import webbrowser
-import time
+import struct
+import socket
+import re
+import bisect
+import gc
 from datetime import timedelta
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
-                             QHBoxLayout, QPushButton, QListWidget, QLabel, 
+                             QHBoxLayout, QPushButton, QListView, QLabel, 
                              QTextEdit, QTabWidget, QMessageBox, QInputDialog,
-                             QFileDialog, QListWidgetItem, QDialog, QLineEdit,
-                             QFormLayout, QCheckBox, QRadioButton, QButtonGroup)
-from PyQt5.QtCore import Qt, QTimer, QSettings
-from PyQt5.QtGui import QFont, QColor, QPalette
+                             QFileDialog, QDialog, QLineEdit, QScrollArea,
+                             QGridLayout, QAbstractItemView, QMenu, QComboBox,
+                             QSystemTrayIcon)
+from PyQt5.QtCore import (Qt, QTimer, QSettings, QObject, QRunnable, QEvent,
+                          QThreadPool, QSocketNotifier, QProcess, QFileSystemWatcher,
+                          QAbstractListModel, QModelIndex, QPointF, pyqtSignal,
+                          QSortFilterProxyModel)
+from PyQt5.QtGui import (QFont, QColor, QPalette, QPainter, QPen, QPolygonF, QIcon,
+                         QPixmap)
+from wiregui_core import (CONFIG_DIR, NETLINK_ROUTE, RTMGRP_LINK, RTM_NEWLINK,
+                          RTM_DELLINK, iter_nl_messages, parse_link_message,
+                          ConfigCache, ThroughputTracker, TrafficStore, StatusPoller,
+                          select_status_backend, format_bytes, run_command,
+                          LocalTunnelOps, DaemonBackend, HelperClient, start_helper,
+                          plan_switch, validate_config, config_errors,
+                          OverlapAnalyzer, LogRecord, LogBuffer, LOG_LEVELS, log_level,
+                          open_log_mirror, HealthMonitor, UptimeTracker, Metrics,
+                          MetricsServer, metrics_socket_path, spawn_count, format_age)
+from wiregui_themes import load_themes
 
-class SettingsDialog(QDialog):
-    """Settings dialog"""
-    def __init__(self, current_theme, auto_start, parent=None):
-        super().__init__(parent)
-        self.current_theme = current_theme
-        self.auto_start = auto_start
-        self.new_theme = current_theme
-        self.new_auto_start = auto_start
-        self.initUI()
-        if current_theme == "dark":
-            self.apply_dark_theme()
-        
-    def initUI(self):
-        self.setWindowTitle('Settings')
-        self.setGeometry(300, 300, 400, 300)
-        
-        layout = QVBoxLayout()
-        self.setLayout(layout)
-        
-        # Theme section
-        theme_label = QLabel('Theme:')
-        theme_label.setFont(QFont('Arial', 11, QFont.Bold))
-        layout.addWidget(theme_label)
-        
-        self.theme_group = QButtonGroup()
-        self.light_radio = QRadioButton('Light Mode')
-        self.dark_radio = QRadioButton('Dark Mode')
-        self.theme_group.addButton(self.light_radio, 0)
-        self.theme_group.addButton(self.dark_radio, 1)
+class WorkerSignals(QObject):
+    """Signals of a Worker, a QRunnable cannot emit signals itself"""
+    finished = pyqtSignal(object, object)
+
+class Worker(QRunnable):
+    """Runs a function on the thread pool and emits (result, error)"""
+    def __init__(self, fn, args):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.signals = WorkerSignals()
+        self.setAutoDelete(False)
         
-        if self.current_theme == "light":
-            self.light_radio.setChecked(True)
+    def run(self):
+        try:
+            result, error = self.fn(*self.args), None
+        except Exception as e:
+            result, error = None, e
+        try:
+            self.signals.finished.emit(result, error)
+        except RuntimeError:
+            pass  # the GUI went away while we were running (shutdown)
+
+class CommandExecutor(QObject):
+    """Runs wg/wg-quick work off the GUI thread, callbacks run on the GUI thread"""
+    def __init__(self, parent=None, max_threads=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        if max_threads:
+            self.pool.setMaxThreadCount(max_threads)
+        self.workers = set()
+        
+    def submit(self, fn, *args, callback=None):
+        """Run fn(*args) in the pool, then call callback(result, error)"""
+        worker = Worker(fn, args)
+        self.workers.add(worker)
+        worker.signals.finished.connect(
+            lambda result, error: self._finished(worker, callback, result, error),
+            Qt.QueuedConnection)
+        self.pool.start(worker)
+        
+    def run(self, args, callback=None):
+        """Run a command in the pool, then call callback(CompletedProcess)"""
+        self.submit(run_command, args,
+                    callback=(lambda result, error: callback(result)) if callback else None)
+        
+    def _finished(self, worker, callback, result, error):
+        self.workers.discard(worker)
+        if callback:
+            callback(result, error)
+            
+    def wait(self, msecs=-1):
+        """Block until all running work is done (used on shutdown)"""
+        return self.pool.waitForDone(msecs)
+
+class LinkMonitor(QObject):
+    """Pushes link add/remove events, from rtnetlink or `ip monitor link`
+    
+    Both sources are driven by the Qt event loop, nothing runs while no
+    link changes. `available` is False when neither source could start.
+    """
+    link_changed = pyqtSignal(str, bool)  # interface name, present
+    
+    IP_MONITOR_LINE = re.compile(r'^(Deleted\s+)?\d+:\s+([^:@\s]+)')
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.sock = None
+        self.notifier = None
+        self.process = None
+        self.source = None
+        try:
+            self.start_netlink()
+        except (OSError, AttributeError):
+            self.start_ip_monitor()
+            
+    @property
+    def available(self):
+        return self.source is not None
+        
+    def start_netlink(self):
+        """Subscribe to the RTMGRP_LINK multicast group"""
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+        self.sock.bind((0, RTMGRP_LINK))
+        self.sock.setblocking(False)
+        self.notifier = QSocketNotifier(self.sock.fileno(), QSocketNotifier.Read, self)
+        self.notifier.activated.connect(self.read_netlink)
+        self.source = 'netlink'
+        
+    def start_ip_monitor(self):
+        """Fall back to parsing `ip -o monitor link`"""
+        self.process = QProcess(self)
+        self.process.readyReadStandardOutput.connect(self.read_ip_monitor)
+        self.process.start('ip', ['-o', 'monitor', 'link'])
+        if self.process.waitForStarted(1000):
+            self.source = 'ip monitor'
         else:
-            self.dark_radio.setChecked(True)
+            self.process = None
             
-        layout.addWidget(self.light_radio)
-        layout.addWidget(self.dark_radio)
-        
-        layout.addSpacing(20)
-        
-        # Auto-start section
-        autostart_label = QLabel('Startup:')
-        autostart_label.setFont(QFont('Arial', 11, QFont.Bold))
-        layout.addWidget(autostart_label)
-        
-        self.autostart_checkbox = QCheckBox('Launch WireGUI on system startup')
-        self.autostart_checkbox.setChecked(self.auto_start)
-        layout.addWidget(self.autostart_checkbox)
-        
-        layout.addSpacing(20)
-        
-        # Support section
-        support_label = QLabel('Support:')
-        support_label.setFont(QFont('Arial', 11, QFont.Bold))
-        layout.addWidget(support_label)
-        
-        bug_btn = QPushButton('Report a Bug')
-        bug_btn.setStyleSheet("background-color: #ff5c3c; color: white; padding: 10px; border-radius: 3px;")
-        bug_btn.clicked.connect(lambda: webbrowser.open('https://github.com/yourusername/issues'))
-        layout.addWidget(bug_btn)
-        
-        help_btn = QPushButton('Need Assistance')
-        help_btn.setStyleSheet("background-color: #ff5c3c; color: white; padding: 10px; border-radius: 3px;")
-        help_btn.clicked.connect(lambda: webbrowser.open('https://github.com/yourusername'))
-        layout.addWidget(help_btn)
-        
-        layout.addStretch()
-        
-        # Save/Cancel buttons
-        btn_layout = QHBoxLayout()
-        
-        save_btn = QPushButton('Save')
-        save_btn.setStyleSheet("background-color: #ff5c3c; color: white; padding: 8px; border-radius: 3px;")
-        save_btn.clicked.connect(self.save_settings)
-        btn_layout.addWidget(save_btn)
-        
-        cancel_btn = QPushButton('Cancel')
-        cancel_btn.clicked.connect(self.reject)
-        btn_layout.addWidget(cancel_btn)
-        
-        layout.addLayout(btn_layout)
-        
-    def save_settings(self):
-        self.new_theme = "light" if self.light_radio.isChecked() else "dark"
-        self.new_auto_start = self.autostart_checkbox.isChecked()
-        self.accept()
-        
-    def get_settings(self):
-        return self.new_theme, self.new_auto_start
+    def read_netlink(self):
+        while True:
+            try:
+                data = self.sock.recv(65536)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                # ENOBUFS: events were dropped, report nothing specific
+                self.link_changed.emit('', True)
+                return
+            for msg_type, _flags, payload in iter_nl_messages(data):
+                if msg_type in (RTM_NEWLINK, RTM_DELLINK):
+                    _ifindex, name, _kind = parse_link_message(payload)
+                    self.link_changed.emit(name, msg_type == RTM_NEWLINK)
+                    
+    def read_ip_monitor(self):
+        output = bytes(self.process.readAllStandardOutput()).decode('utf-8', 'replace')
+        for line in output.splitlines():
+            match = self.IP_MONITOR_LINE.match(line)
+            if match:
+                self.link_changed.emit(match.group(2), match.group(1) is None)
+                
+    def stop(self):
+        if self.notifier:
+            self.notifier.setEnabled(False)
+            self.sock.close()
+        if self.process:
+            self.process.kill()
+            self.process.waitForFinished(1000)
+        self.source = None
+
+# inotify constants from sys/inotify.h
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_Q_OVERFLOW = 0x4000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+class ConfigDirWatcher(QObject):
+    """Reports added/removed/renamed/changed configs in the config directory
+    
+    Uses inotify, so only the files that changed are looked at. Without
+    inotify it falls back to QFileSystemWatcher, which only says that the
+    directory changed, and emits rescan_needed instead. When the directory
+    cannot be watched at all (e.g. a 0700 /etc/wireguard without root),
+    rescan_needed is emitted every rescan_interval seconds and error says why.
+    """
+    added = pyqtSignal(str)
+    removed = pyqtSignal(str)
+    renamed = pyqtSignal(str, str)
+    changed = pyqtSignal(str)
+    rescan_needed = pyqtSignal()
+    
+    def __init__(self, path, parent=None, rescan_interval=30):
+        super().__init__(parent)
+        self.path = path
+        self.fd = None
+        self.notifier = None
+        self.fallback = None
+        self.rescan_timer = None
+        self.error = None
+        try:
+            self.start_inotify()
+        except (OSError, AttributeError) as e:
+            self.error = str(e)
+            self.fallback = QFileSystemWatcher(self)
+            if self.fallback.addPath(path):
+                self.fallback.directoryChanged.connect(lambda _path: self.rescan_needed.emit())
+            else:
+                self.fallback = None
+                self.rescan_timer = QTimer(self)
+                self.rescan_timer.setInterval(rescan_interval * 1000)
+                self.rescan_timer.timeout.connect(self.rescan_needed)
+                self.rescan_timer.start()
+            
+    def start_inotify(self):
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_CLOSE_WRITE
+        if libc.inotify_add_watch(fd, os.fsencode(self.path), mask) < 0:
+            error = ctypes.get_errno()
+            os.close(fd)
+            raise OSError(error, os.strerror(error))
+        self.fd = fd
+        self.notifier = QSocketNotifier(fd, QSocketNotifier.Read, self)
+        self.notifier.activated.connect(self.read_events)
+        
+    def read_events(self):
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return
+        moved_from = {}
+        offset = 0
+        while offset + 16 <= len(data):
+            _wd, mask, cookie, length = struct.unpack_from('=iIII', data, offset)
+            name = os.fsdecode(data[offset + 16:offset + 16 + length].rstrip(b'\0'))
+            offset += 16 + length
+            if mask & IN_Q_OVERFLOW:
+                self.rescan_needed.emit()
+                return
+            if not name.endswith('.conf'):
+                continue
+            tunnel_name = name[:-5]
+            if mask & IN_MOVED_FROM:
+                moved_from[cookie] = tunnel_name
+            elif mask & IN_MOVED_TO and cookie in moved_from:
+                self.renamed.emit(moved_from.pop(cookie), tunnel_name)
+            elif mask & (IN_CREATE | IN_MOVED_TO):
+                self.added.emit(tunnel_name)
+                if mask & IN_MOVED_TO:
+                    self.changed.emit(tunnel_name)
+            elif mask & IN_DELETE:
+                self.removed.emit(tunnel_name)
+            elif mask & IN_CLOSE_WRITE:
+                self.changed.emit(tunnel_name)
+        # Moved out of the directory
+        for tunnel_name in moved_from.values():
+            self.removed.emit(tunnel_name)
+            
+    def stop(self):
+        if self.rescan_timer:
+            self.rescan_timer.stop()
+        if self.notifier:
+            self.notifier.setEnabled(False)
+            os.close(self.fd)
+            self.notifier = None
+
+class TunnelRecord:
+    """Compact per-tunnel state behind one row of the tunnel list"""
+    __slots__ = ('name', 'active', 'rx', 'tx', 'handshake', 'health')
     
-    def apply_dark_theme(self):
-        self.setStyleSheet("""
-            QDialog {
-                background-color: #2b2b2b;
-                color: #ffffff;
-            }
-            QLabel {
-                color: #ffffff;
-            }
-            QRadioButton {
-                color: #ffffff;
-            }
-            QCheckBox {
-                color: #ffffff;
-            }
-            QPushButton {
-                background-color: #3c3c3c;
-                color: #ffffff;
-                border: 1px solid #555555;
-                padding: 8px;
-                border-radius: 3px;
-            }
-            QPushButton:hover {
-                background-color: #4a4a4a;
-            }
-        """)
+    def __init__(self, name):
+        self.name = name
+        self.active = False
+        self.health = 'healthy'
+        self.rx = 0
+        self.tx = 0
+        self.handshake = 0
 
-class ConfigEditorDialog(QDialog):
-    """Dialog to edit configuration and tunnel name"""
-    def __init__(self, tunnel_name, config_content, theme, parent=None):
+class TunnelListModel(QAbstractListModel):
+    """Sorted tunnel list, only rows whose state changed are repainted"""
+    ActiveRole = Qt.UserRole
+    RxRole = Qt.UserRole + 1
+    TxRole = Qt.UserRole + 2
+    HandshakeRole = Qt.UserRole + 3
+    
+    def __init__(self, parent=None):
         super().__init__(parent)
-        self.tunnel_name = tunnel_name
-        self.config_content = config_content
-        self.new_tunnel_name = tunnel_name
-        self.theme = theme
-        self.initUI()
-        if theme == "dark":
-            self.apply_dark_theme()
-        
-    def initUI(self):
-        self.setWindowTitle(f'Edit configuration: {self.tunnel_name}')
-        self.setGeometry(200, 200, 600, 550)
-        
-        layout = QVBoxLayout()
-        self.setLayout(layout)
-        
-        # Form for tunnel name
-        form_layout = QFormLayout()
-        self.name_input = QLineEdit(self.tunnel_name)
-        form_layout.addRow('Tunnel name:', self.name_input)
-        layout.addLayout(form_layout)
-        
-        # Info label
-        info = QLabel('Edit the WireGuard configuration below:')
-        layout.addWidget(info)
+        self.records = []
+        self.names = []  # sorted, parallel to records for bisect
+        self.active_names = set()
+        self.active_color = QColor(255, 92, 60)  # Orange #ff5c3c
+        self.inactive_color = QColor(204, 204, 204)
+        self.stale_color = QColor(224, 160, 48)  # Amber, active but no handshakes
+        # The theme replaces these (set_colors)
+        
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.records)
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        record = self.records[index.row()]
+        if role == Qt.DisplayRole:
+            return record.name
+        if role == Qt.ForegroundRole:
+            if not record.active:
+                return self.inactive_color
+            return self.stale_color if record.health != 'healthy' else self.active_color
+        if role == Qt.ToolTipRole and record.active and record.health != 'healthy':
+            return f"{record.name}: peers not handshaking ({record.health})"
+        if role == self.ActiveRole:
+            return record.active
+        if role == self.RxRole:
+            return record.rx
+        if role == self.TxRole:
+            return record.tx
+        if role == self.HandshakeRole:
+            return record.handshake
+        return None
+    
+    def row_of(self, name):
+        """Row of a tunnel, or -1"""
+        row = bisect.bisect_left(self.names, name)
+        if row < len(self.names) and self.names[row] == name:
+            return row
+        return -1
+    
+    def name_at(self, row):
+        return self.names[row]
+    
+    def set_names(self, names):
+        """Replace all rows at once (initial load)"""
+        self.beginResetModel()
+        self.names = sorted(names)
+        self.records = [TunnelRecord(name) for name in self.names]
+        self.active_names = set()
+        self.endResetModel()
+        
+    def insert(self, name):
+        """Insert a tunnel at its sorted position, returns False if present"""
+        row = bisect.bisect_left(self.names, name)
+        if row < len(self.names) and self.names[row] == name:
+            return False
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.names.insert(row, name)
+        self.records.insert(row, TunnelRecord(name))
+        self.endInsertRows()
+        return True
+    
+    def remove(self, name):
+        """Remove a tunnel, returns False if it was not listed"""
+        row = self.row_of(name)
+        if row < 0:
+            return False
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.names[row]
+        del self.records[row]
+        self.active_names.discard(name)
+        self.endRemoveRows()
+        return True
+    
+    def update_status(self, interfaces):
+        """Apply a status snapshot
+        
+        Only tunnels that are or were active are looked at, and dataChanged
+        is emitted only for rows whose active state flipped.
+        """
+        for name in self.active_names | interfaces.keys():
+            row = self.row_of(name)
+            if row < 0:
+                continue
+            record = self.records[row]
+            iface = interfaces.get(name)
+            active = iface is not None
+            if iface is not None:
+                peers = iface['peers']
+                record.rx = sum(peer['rx'] for peer in peers)
+                record.tx = sum(peer['tx'] for peer in peers)
+                record.handshake = max((peer['latest_handshake'] for peer in peers), default=0)
+            if active != record.active:
+                record.active = active
+                index = self.index(row)
+                self.dataChanged.emit(index, index, [Qt.ForegroundRole, self.ActiveRole])
+        self.active_names = {name for name in interfaces if self.row_of(name) >= 0}
+        
+    def set_health(self, name, health):
+        """Mark an active tunnel healthy, degraded or stale"""
+        row = self.row_of(name)
+        if row >= 0 and self.records[row].health != health:
+            self.records[row].health = health
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.ForegroundRole, Qt.ToolTipRole])
+            
+    def set_colors(self, active, inactive, stale):
+        """Change the row colours (theme switch)"""
+        self.active_color, self.inactive_color, self.stale_color = active, inactive, stale
+        if self.records:
+            self.dataChanged.emit(self.index(0), self.index(len(self.records) - 1),
+                                  [Qt.ForegroundRole])
+
+class LogModel(QAbstractListModel):
+    """Log records in a fixed-size ring, memory stays constant"""
+    RecordRole = Qt.UserRole
+    
+    def __init__(self, capacity=5000, parent=None):
+        super().__init__(parent)
+        self.buffer = LogBuffer(capacity)
+        self.colors = {'error': QColor('#dc3545'), 'warning': QColor('#e0a030')}
         
-        # Editor
-        self.editor = QTextEdit()
-        self.editor.setPlainText(self.config_content)
-        self.editor.setFont(QFont('Courier', 10))
-        layout.addWidget(self.editor)
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.buffer)
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        record = self.buffer[index.row()]
+        if role == Qt.DisplayRole:
+            # One line per row (uniform sizes), e.g. wg-quick stderr is multi-line
+            return record.format().strip().replace('\n', ' ↵ ')
+        if role == Qt.ToolTipRole:
+            return record.message
+        if role == Qt.ForegroundRole:
+            return self.colors.get(record.level)
+        if role == self.RecordRole:
+            return record
+        return None
+    
+    def append(self, record):
+        if self.buffer.full:
+            self.beginRemoveRows(QModelIndex(), 0, 0)
+            self.buffer.drop_oldest()
+            self.endRemoveRows()
+        row = len(self.buffer)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.buffer.append(record)
+        self.endInsertRows()
+
+class LogFilterModel(QSortFilterProxyModel):
+    """Shows log records at or above a level that contain the search text"""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.min_level = 0
+        self.search = ''
         
-        # Buttons
-        btn_layout = QHBoxLayout()
+    def set_min_level(self, level):
+        self.min_level = LOG_LEVELS.index(level)
+        self.invalidateFilter()
         
-        save_btn = QPushButton('Save')
-        save_btn.setStyleSheet("background-color: #ea5c1f; color: white; padding: 8px; border-radius: 3px;")
-        save_btn.clicked.connect(self.save_and_accept)
-        btn_layout.addWidget(save_btn)
+    def set_search(self, text):
+        self.search = text.strip().lower()
+        self.invalidateFilter()
         
-        cancel_btn = QPushButton('Cancel')
-        cancel_btn.clicked.connect(self.reject)
-        btn_layout.addWidget(cancel_btn)
+    def filterAcceptsRow(self, source_row, source_parent):
+        record = self.sourceModel().buffer[source_row]
+        if LOG_LEVELS.index(record.level) < self.min_level:
+            return False
+        if self.search:
+            return (self.search in record.message.lower() or
+                    (record.tunnel is not None and self.search in record.tunnel.lower()))
+        return True
+
+class RefreshScheduler(QObject):
+    """Calls a refresh callback at an adaptive cadence
+    
+    'fast' ticks every FAST_INTERVAL ms. 'idle' starts at IDLE_INTERVAL and
+    doubles on every tick up to MAX_INTERVAL. 'off' does not tick at all.
+    Going back to 'fast' refreshes immediately.
+    """
+    FAST_INTERVAL = 1000
+    IDLE_INTERVAL = 2000
+    MAX_INTERVAL = 60000
+    
+    def __init__(self, callback, parent=None):
+        super().__init__(parent)
+        self.callback = callback
+        self.mode = 'off'
+        self.interval = self.FAST_INTERVAL
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.tick)
+        
+    def set_mode(self, mode):
+        if mode == self.mode:
+            return
+        previous, self.mode = self.mode, mode
+        if mode == 'off':
+            self.timer.stop()
+        elif mode == 'fast':
+            self.interval = self.FAST_INTERVAL
+            if previous == 'idle':
+                self.tick()
+            else:
+                self.timer.start(self.interval)
+        else:
+            self.interval = self.IDLE_INTERVAL
+            self.timer.start(self.interval)
+            
+    def tick(self):
+        self.callback()
+        if self.mode == 'idle':
+            self.interval = min(self.interval * 2, self.MAX_INTERVAL)
+        if self.mode != 'off':
+            self.timer.start(self.interval)
+
+class SparklineWidget(QWidget):
+    """Small line chart of one or more RingBuffers on a shared scale"""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.series = []
+        self.setFixedHeight(24)
+        self.setMinimumWidth(120)
         
-        layout.addLayout(btn_layout)
+    def set_series(self, series):
+        """series: [(RingBuffer, QColor)]"""
+        self.series = series
+        self.update()
         
-    def save_and_accept(self):
-        """Save the new tunnel name and accept"""
-        self.new_tunnel_name = self.name_input.text().strip()
-        if not self.new_tunnel_name:
-            QMessageBox.warning(self, "Error", "Tunnel name cannot be empty!")
+    def paintEvent(self, event):
+        if not self.series:
             return
-        self.accept()
-        
-    def get_config(self):
-        """Get the edited configuration"""
-        return self.editor.toPlainText()
-    
-    def get_tunnel_name(self):
-        """Get the new tunnel name"""
-        return self.new_tunnel_name
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        width, height = self.width(), self.height()
+        peak = max((max(buffer.values(), default=0) for buffer, _color in self.series),
+                   default=0) or 1.0
+        for buffer, color in self.series:
+            values = buffer.values()
+            if len(values) < 2:
+                continue
+            step = width / max(buffer.size - 1, 1)
+            offset = width - (len(values) - 1) * step
+            points = [QPointF(offset + i * step, height - 1 - value / peak * (height - 2))
+                      for i, value in enumerate(values)]
+            painter.setPen(QPen(color, 1))
+            painter.drawPolyline(QPolygonF(points))
+
+class PeerRatesWidget(QScrollArea):
+    """Live per-peer rates of one interface, busiest peer first"""
+    RX_COLOR = QColor(76, 175, 80)   # Green #4caf50
+    TX_COLOR = QColor(255, 92, 60)   # Orange #ff5c3c
     
-    def apply_dark_theme(self):
-        """Apply dark theme to dialog"""
-        self.setStyleSheet("""
-            QDialog {
-                background-color: #2b2b2b;
-                color: #ffffff;
-            }
-            QLabel {
-                color: #ffffff;
-            }
-            QLineEdit {
-                background-color: #3c3c3c;
-                color: #ffffff;
-                border: 1px solid #555555;
-                padding: 5px;
-                border-radius: 3px;
-            }
-            QTextEdit {
-                background-color: #1e1e1e;
-                color: #d4d4d4;
-                border: 1px solid #555555;
-                border-radius: 3px;
-            }
-            QPushButton {
-                background-color: #3c3c3c;
-                color: #ffffff;
-                border: 1px solid #555555;
-                padding: 8px;
-                border-radius: 3px;
-            }
-            QPushButton:hover {
-                background-color: #4a4a4a;
-            }
-        """)
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWidgetResizable(True)
+        self.setMaximumHeight(160)
+        container = QWidget()
+        self.grid = QGridLayout()
+        self.grid.setContentsMargins(2, 2, 2, 2)
+        container.setLayout(self.grid)
+        self.setWidget(container)
+        self.rows = []
+        
+    def show_rates(self, rates):
+        """rates: [(public_key, PeerRate)] as from ThroughputTracker.rates"""
+        while len(self.rows) < len(rates):
+            label = QLabel()
+            label.setFont(QFont('Courier', 9))
+            sparkline = SparklineWidget()
+            self.grid.addWidget(label, len(self.rows), 0)
+            self.grid.addWidget(sparkline, len(self.rows), 1)
+            self.rows.append((label, sparkline))
+        for row, (label, sparkline) in enumerate(self.rows):
+            if row >= len(rates):
+                label.hide()
+                sparkline.hide()
+                continue
+            public_key, state = rates[row]
+            label.setText(f"{public_key[:8]}… {state.endpoint or ''}\n"
+                          f"↓ {format_bytes(state.rx_rates.last())}/s "
+                          f"↑ {format_bytes(state.tx_rates.last())}/s")
+            sparkline.set_series([(state.rx_rates, self.RX_COLOR),
+                                  (state.tx_rates, self.TX_COLOR)])
+            label.show()
+            sparkline.show()
+
+def tray_icon(color):
+    """Round tray icon in one colour"""
+    pixmap = QPixmap(64, 64)
+    pixmap.fill(Qt.transparent)
+    painter = QPainter(pixmap)
+    painter.setRenderHint(QPainter.Antialiasing)
+    painter.setPen(QPen(QColor('#ffffff'), 6))
+    painter.setBrush(QColor(color))
+    painter.drawEllipse(5, 5, 54, 54)
+    painter.end()
+    return QIcon(pixmap)
+
+def set_style_state(widget, state):
+    """Switch the `state` property the stylesheet matches on, re-polish only on a change"""
+    if widget.property('state') == state:
+        return
+    widget.setProperty('state', state)
+    widget.style().unpolish(widget)
+    widget.style().polish(widget)
+
+def release_memory():
+    """Collect garbage and hand freed heap back to the system (glibc only)"""
+    import ctypes
+    gc.collect()
+    try:
+        ctypes.CDLL(None).malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
 
 class WireGuardGUI(QMainWindow):
-    def __init__(self):
+    def __init__(self, config_dir=CONFIG_DIR, hidden=False):
         super().__init__()
-        self.config_dir = "/etc/wireguard"
+        self.config_dir = config_dir
         self.settings = QSettings('WireGUI', 'WireGUI')
+        self.themes, self.theme_errors = load_themes()
         self.theme = self.settings.value('theme', 'dark')
+        if self.theme not in self.themes:
+            self.theme = 'dark'
         self.auto_start = self.settings.value('auto_start', False, type=bool)
-        self.connection_start_time = None
-        self.initUI()
+        self.uptime = UptimeTracker()
+        self.status = StatusPoller(select_status_backend(
+            self.settings.value('status_backend', 'auto')))
+        self.status_backend = None
+        self.status_error = None
+        self.executor = CommandExecutor(self)
+        # Bulk actions get their own capped pool, so status polls keep running
+        self.action_timeout = self.settings.value('action_timeout', 60, type=int)
+        self.bulk_executor = CommandExecutor(
+            self, max_threads=self.settings.value('bulk_concurrency', 8, type=int))
+        self.poll_pending = False
+        self.pending_actions = {}
+        # File and wg-quick operations, replaced by the helper when not root
+        self.ops = LocalTunnelOps(self.config_dir)
+        self.helper_starting = False
+        self.config_cache = ConfigCache(self.ops)
+        self.overlap_analyzer = OverlapAnalyzer(self.config_cache)
+        self.shown_info = None
+        self.throughput = ThroughputTracker()
+        self.health = HealthMonitor(stale_after=self.settings.value('stale_after', 180, type=int),
+                                    backoff=self.settings.value('restart_backoff', 60, type=int))
+        self.auto_restart = self.settings.value('auto_restart', False, type=bool)
+        self.traffic = None
+        self.tunnel_model = TunnelListModel(self)
+        self.log_model = LogModel(self.settings.value('log_limit', 5000, type=int), self)
+        self.log_mirror = None
+        log_mirror = self.settings.value('log_mirror', 'off')
+        if log_mirror != 'off':
+            try:
+                self.log_mirror = open_log_mirror(log_mirror, self.settings.value('log_file', None))
+            except OSError as e:
+                print(f"Log mirror disabled: {e}", file=sys.stderr)
+        self.config_watcher = None
+        
+        # Refresh cadence follows what is on screen (see update_schedule)
+        self.scheduler = RefreshScheduler(self.refresh_status, self)
+        
+        # Link events trigger a refresh, wg-quick causes a burst of them
+        self.link_refresh = QTimer()
+        self.link_refresh.setSingleShot(True)
+        self.link_refresh.setInterval(100)
+        self.link_refresh.timeout.connect(self.refresh_status)
+        self.link_monitor = LinkMonitor(self)
+        self.link_monitor.link_changed.connect(self.on_link_changed)
+        
+        # Traffic is written in batches, at most once a minute
+        self.traffic_flush = QTimer()
+        self.traffic_flush.setSingleShot(True)
+        self.traffic_flush.setInterval(60000)
+        self.traffic_flush.timeout.connect(self.flush_traffic)
+        # Month totals only change when the buffered traffic is written
+        self.month_stats = {}
+        
+        # AllowedIPs overlaps are analyzed in the background when configs or
+        # the tunnel list change, the info pane only shows the last result
+        self.overlap_refresh = QTimer()
+        self.overlap_refresh.setSingleShot(True)
+        self.overlap_refresh.setInterval(200)
+        self.overlap_refresh.timeout.connect(self.analyze_overlaps)
+        self.overlap_pending = False
+        self.config_cache.listeners.append(lambda _tunnel_name: self.overlap_refresh.start())
+        for signal in (self.tunnel_model.rowsInserted, self.tunnel_model.rowsRemoved,
+                       self.tunnel_model.modelReset):
+            signal.connect(lambda *_args: self.overlap_refresh.start())
+        
+        # Optional metrics export, filled from the regular status polls
+        self.metrics = None
+        self.metrics_server = None
+        self.last_spawns = spawn_count()
+        self.lag_expected = 0.0
+        self.lag_probe = QTimer()
+        self.lag_probe.setInterval(1000)
+        self.lag_probe.setTimerType(Qt.PreciseTimer)
+        self.lag_probe.timeout.connect(self.probe_lag)
+        
+        # System tray, the widgets only exist while the window is shown
+        self.tray = None
+        self.tray_menu = None
+        self.tray_state = None
+        self.tray_entries = None
+        self.tray_actions = {}
+        # The tray menu lists active and recently toggled tunnels only
+        self.tray_limit = self.settings.value('tray_limit', 10, type=int)
+        self.recent_tunnels = self.settings.value('tray_recent', [], type=list)
+        self.tray_icons = None
+        self.quitting = False
+        self.ui_built = False
+        self.kept_selection = None
+        
+        # Only what the first paint needs, the rest follows in finish_startup
+        self.startup = {}
+        self.setWindowTitle('WireGUI')
+        self.setGeometry(100, 100, 700, 650)
         self.apply_theme()
+        if not hidden:
+            self.build_ui()
+        if hidden or self.settings.value('tray', False, type=bool):
+            self.set_tray_enabled(True)
+        QTimer.singleShot(0, self.finish_startup)
+        
+    def finish_startup(self):
+        """Load tunnels and start polling, runs once the window is up"""
+        self.mark_startup('window')
+        for error in self.theme_errors:
+            self.log(f"✗ Theme not loaded: {error}")
+        if self.settings.value('traffic_accounting', True, type=bool):
+            import sqlite3  # not needed before the window is up
+            try:
+                self.traffic = TrafficStore()
+            except (OSError, sqlite3.Error) as e:
+                print(f"Traffic accounting disabled: {e}", file=sys.stderr)
         self.load_tunnels()
+        self.mark_startup('tunnels')
+        self.watch_config_dir()
+        if self.link_monitor.available:
+            self.log(f"Watching link changes via {self.link_monitor.source}")
+        self.start_metrics(self.settings.value('metrics', 'off'))
+        self.refresh_status()
+        if os.geteuid() != 0 and self.settings.value('use_helper', True, type=bool):
+            self.connect_helper()
+            
+    def mark_startup(self, phase):
+        """Record when a startup phase was reached, logged once status is known"""
+        if phase in self.startup:
+            return
+        self.startup[phase] = time.monotonic() - STARTED
+        if self.metrics:
+            self.metrics.record_startup(phase, self.startup[phase])
+        if phase == 'status':
+            self.log("Started in {:.0f} ms ({})".format(
+                self.startup[phase] * 1000,
+                ', '.join(f"{name} {seconds * 1000:.0f} ms"
+                          for name, seconds in self.startup.items())))
+        
+    def start_metrics(self, kind):
+        """Serve metrics over HTTP on localhost ('http') or a Unix socket ('unix')"""
+        if kind not in ('http', 'unix'):
+            return
+        address = (self.settings.value('metrics_port', 9586, type=int) if kind == 'http'
+                   else metrics_socket_path())
+        self.metrics = Metrics()
+        self.metrics_server = MetricsServer(self.metrics, address)
+        try:
+            self.metrics_server.start()
+        except OSError as e:
+            self.log(f"✗ Metrics not available: {e}")
+            self.metrics = self.metrics_server = None
+            return
+        self.lag_expected = time.monotonic() + self.lag_probe.interval() / 1000
+        self.lag_probe.start()
+        for phase, seconds in self.startup.items():
+            self.metrics.record_startup(phase, seconds)
+        self.log(f"✓ Metrics at {self.metrics_server.url()}")
+        
+    def probe_lag(self):
+        """The probe timer fired, record how late it was"""
+        now = time.monotonic()
+        self.metrics.record_lag(max(0.0, now - self.lag_expected))
+        self.lag_expected = now + self.lag_probe.interval() / 1000
+        
+    def connect_helper(self):
+        """Start (or reuse) the privileged helper, asks for the password once"""
+        if self.helper_starting:
+            return
+        self.helper_starting = True
+        self.log("Starting privileged helper…")
+        self.executor.submit(start_helper, callback=self.on_helper_started)
+        
+    def on_helper_started(self, client, error):
+        self.helper_starting = False
+        if error is not None:
+            self.log(f"✗ Privileged helper not available: {error}")
+            return
+        if isinstance(self.ops, HelperClient):
+            self.ops.release()
+        self.ops = client
+        self.config_cache.ops = client
+        self.config_cache.invalidate()
+        # A lost helper is restarted, never silently replaced by a local
+        # backend that cannot read the interfaces
+        self.status.backend = DaemonBackend(client, name='helper', local_fallback=False)
+        self.log("✓ Privileged helper connected")
+        self.load_tunnels()
+        self.refresh_status()
         
-        # Update status every second for timer and stats
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.refresh_status)
-        self.timer.start(1000)
+    def build_ui(self):
+        """Create the widgets, also again after tear_down_ui"""
+        if self.ui_built:
+            return
+        self.initUI()
+        self.ui_built = True
+        self.shown_info = None
+        if self.kept_selection:
+            self.select_tunnel(self.kept_selection)
+            self.kept_selection = None
+        self.log_view.scrollToBottom()
+        
+    def tear_down_ui(self):
+        """Drop all widgets while the window lives in the tray
+        
+        The models (tunnels, log) stay, so build_ui shows the same state again.
+        """
+        if not self.ui_built:
+            return
+        self.kept_selection = self.selected_tunnel()
+        self.ui_built = False
+        self.takeCentralWidget().deleteLater()
+        # After the deferred delete has run
+        QTimer.singleShot(1000, release_memory)
         
     def initUI(self):
-        self.setWindowTitle('WireGUI')
-        self.setGeometry(100, 100, 700, 550)
-        
         # Central widget
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
@@ -261,6 +844,7 @@ class WireGuardGUI(QMainWindow):
         
         # Tabs
         self.tabs = QTabWidget()
+        self.tabs.currentChanged.connect(self.update_schedule)
         main_layout.addWidget(self.tabs)
         
         # Tab 1: Tunnels
@@ -269,9 +853,14 @@ class WireGuardGUI(QMainWindow):
         tunnels_tab.setLayout(tunnels_layout)
         
         # Left sidebar with tunnel list
-        self.tunnel_list = QListWidget()
+        self.tunnel_list = QListView()
         self.tunnel_list.setMaximumWidth(200)
-        self.tunnel_list.itemClicked.connect(self.on_tunnel_selected)
+        self.tunnel_list.setUniformItemSizes(True)
+        self.tunnel_list.setModel(self.tunnel_model)
+        self.tunnel_list.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.tunnel_list.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.tunnel_list.customContextMenuRequested.connect(self.show_bulk_menu)
+        self.tunnel_list.selectionModel().currentRowChanged.connect(self.on_current_row_changed)
         tunnels_layout.addWidget(self.tunnel_list)
         
         # Right panel with tunnel info
@@ -301,8 +890,9 @@ class WireGuardGUI(QMainWindow):
         # Status indicator
         status_row = QHBoxLayout()
         self.status_dot = QLabel('●')
+        self.status_dot.setObjectName('status_dot')
         self.status_dot.setFont(QFont('Arial', 16))
-        self.status_dot.setStyleSheet("color: #666666;")
+        set_style_state(self.status_dot, 'unknown')
         status_row.addWidget(self.status_dot)
         
         self.status_label = QLabel('Disconnected')
@@ -323,6 +913,11 @@ class WireGuardGUI(QMainWindow):
         
         right_layout.addWidget(status_widget)
         
+        # Per-peer rates of the selected tunnel
+        self.peer_rates = PeerRatesWidget()
+        self.peer_rates.hide()
+        right_layout.addWidget(self.peer_rates)
+        
         # Button layout for Edit and Toggle
         button_layout = QHBoxLayout()
         
@@ -333,8 +928,16 @@ class WireGuardGUI(QMainWindow):
         self.edit_btn.setMinimumHeight(40)
         button_layout.addWidget(self.edit_btn)
         
+        # History button
+        self.history_btn = QPushButton('History')
+        self.history_btn.setEnabled(False)
+        self.history_btn.clicked.connect(self.show_config_history)
+        self.history_btn.setMinimumHeight(40)
+        button_layout.addWidget(self.history_btn)
+        
         # Activate/Deactivate button
         self.toggle_btn = QPushButton('Activate')
+        self.toggle_btn.setObjectName('toggle')
         self.toggle_btn.setEnabled(False)
         self.toggle_btn.clicked.connect(self.toggle_tunnel)
         self.toggle_btn.setMinimumHeight(40)
@@ -351,9 +954,35 @@ class WireGuardGUI(QMainWindow):
         log_layout = QVBoxLayout()
         log_tab.setLayout(log_layout)
         
-        self.log_text = QTextEdit()
-        self.log_text.setReadOnly(True)
-        log_layout.addWidget(self.log_text)
+        # Filter and search
+        filter_layout = QHBoxLayout()
+        self.log_level_combo = QComboBox()
+        for label, level in (('All messages', 'info'), ('Warnings and errors', 'warning'),
+                             ('Errors only', 'error')):
+            self.log_level_combo.addItem(label, level)
+        self.log_level_combo.currentIndexChanged.connect(
+            lambda _index: self.log_filter.set_min_level(self.log_level_combo.currentData()))
+        filter_layout.addWidget(self.log_level_combo)
+        self.log_search = QLineEdit()
+        self.log_search.setPlaceholderText('Search log (message or tunnel)…')
+        self.log_search.textChanged.connect(lambda text: self.log_filter.set_search(text))
+        filter_layout.addWidget(self.log_search)
+        log_layout.addLayout(filter_layout)
+        
+        # Only the visible rows are ever laid out or painted
+        self.log_filter = LogFilterModel(central_widget)
+        self.log_filter.setSourceModel(self.log_model)
+        self.log_view = QListView()
+        self.log_view.setModel(self.log_filter)
+        self.log_view.setUniformItemSizes(True)
+        self.log_view.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.log_view.setFont(QFont('Monospace', 9))
+        log_layout.addWidget(self.log_view)
+        # Scrolling forces a layout, do it once per burst of messages
+        self.log_scroll = QTimer(central_widget)
+        self.log_scroll.setSingleShot(True)
+        self.log_scroll.setInterval(0)
+        self.log_scroll.timeout.connect(self.log_view.scrollToBottom)
         
         self.tabs.addTab(log_tab, "Log")
         
@@ -378,6 +1007,22 @@ class WireGuardGUI(QMainWindow):
         refresh_btn.clicked.connect(self.refresh_status)
         toolbar_layout.addWidget(refresh_btn)
         
+        # Bulk actions on all selected tunnels (Ctrl/Shift+click)
+        self.bulk_menu = QMenu(central_widget)
+        self.bulk_menu.addAction('Activate selected', lambda: self.bulk_action('up'))
+        self.bulk_menu.addAction('Deactivate selected', lambda: self.bulk_action('down'))
+        self.bulk_menu.addAction('Restart selected', lambda: self.bulk_action('restart'))
+        bulk_btn = QPushButton('Selected')
+        bulk_btn.setMenu(self.bulk_menu)
+        toolbar_layout.addWidget(bulk_btn)
+        
+        # Profiles: named tunnel sets to switch between
+        self.profile_menu = QMenu(central_widget)
+        self.profile_menu.aboutToShow.connect(self.build_profile_menu)
+        profile_btn = QPushButton('Profiles')
+        profile_btn.setMenu(self.profile_menu)
+        toolbar_layout.addWidget(profile_btn)
+        
         toolbar_layout.addStretch()
         
         # Settings button (right-aligned)
@@ -387,22 +1032,137 @@ class WireGuardGUI(QMainWindow):
         
         main_layout.addWidget(toolbar)
     
+    def set_tray_enabled(self, enabled):
+        """Show or remove the tray icon, with it closing the window keeps WireGUI running"""
+        app = QApplication.instance()
+        if not enabled:
+            if self.tray:
+                self.tray.hide()
+                self.tray.deleteLater()
+                self.tray_menu.deleteLater()
+                self.tray = self.tray_menu = None
+                self.tray_entries = None
+                self.tray_actions = {}
+            app.setQuitOnLastWindowClosed(True)
+            return
+        if self.tray:
+            return
+        if not QSystemTrayIcon.isSystemTrayAvailable():
+            self.log("⚠ No system tray available, closing the window quits WireGUI")
+            return
+        if self.tray_icons is None:
+            self.tray_icons = (tray_icon('#666666'), tray_icon('#28a745'))
+        self.tray = QSystemTrayIcon(self.tray_icons[0], self)
+        self.tray_menu = QMenu()
+        self.tray.setContextMenu(self.tray_menu)
+        self.tray.activated.connect(self.on_tray_activated)
+        self.update_tray(force=True)
+        self.tray.show()
+        app.setQuitOnLastWindowClosed(False)
+        
+    def update_tray(self, force=False):
+        """Update tray icon, tooltip and menu, only when tunnel states changed
+        
+        The menu holds the active and the recently toggled tunnels, at most
+        tray_limit of them, the window has the full list. It is only rebuilt
+        when that selection changes, otherwise the entries are updated.
+        """
+        if not self.tray:
+            return
+        active = sorted(self.tunnel_model.active_names)
+        state = (tuple(active), tuple(sorted(self.pending_actions)))
+        recent = [name for name in self.recent_tunnels
+                  if name not in self.tunnel_model.active_names and self.has_tunnel(name)]
+        shown = (active + recent)[:self.tray_limit]
+        entries = (tuple(sorted(shown)), max(len(active) - self.tray_limit, 0),
+                   bool(self.tunnel_model.names))
+        if state == self.tray_state and entries == self.tray_entries and not force:
+            return
+        self.tray_state = state
+        self.tray.setIcon(self.tray_icons[bool(active)])
+        if len(active) > 3:
+            self.tray.setToolTip(f"WireGUI: {', '.join(active[:3])} and {len(active) - 3} more active")
+        else:
+            self.tray.setToolTip(f"WireGUI: {', '.join(active)} active" if active
+                                 else "WireGUI: no tunnel active")
+        if entries != self.tray_entries or force:
+            self.tray_entries = entries
+            self.build_tray_menu(*entries)
+        for name, action in self.tray_actions.items():
+            action.setChecked(name in self.tunnel_model.active_names)
+            action.setEnabled(name not in self.pending_actions)
+            
+    def build_tray_menu(self, names, more_active, any_tunnels):
+        """Fill the tray menu (here, not on aboutToShow: not every tray host sends that)"""
+        self.tray_menu.clear()
+        self.tray_actions = {}
+        for name in names:
+            action = self.tray_menu.addAction(name, lambda name=name: self.toggle_tunnel_by_name(name))
+            action.setCheckable(True)
+            self.tray_actions[name] = action
+        if more_active:
+            self.tray_menu.addAction(f"… and {more_active} more active").setEnabled(False)
+        if not names:
+            self.tray_menu.addAction('No active tunnels' if any_tunnels
+                                     else 'No tunnels').setEnabled(False)
+        profiles = self.profiles()
+        if profiles:
+            profile_menu = self.tray_menu.addMenu('Profiles')
+            for name in sorted(profiles):
+                profile_menu.addAction(name, lambda name=name: self.switch_profile(name))
+        self.tray_menu.addSeparator()
+        self.tray_menu.addAction('Show WireGUI', self.show_window)
+        self.tray_menu.addAction('Quit', self.quit)
+        
+    def on_tray_activated(self, reason):
+        if reason != QSystemTrayIcon.Trigger:
+            return
+        if self.isVisible() and not self.isMinimized():
+            self.hide_to_tray()
+        else:
+            self.show_window()
+            
+    def show_window(self):
+        """Bring the window back (from the tray), building the widgets if needed"""
+        self.build_ui()
+        self.showNormal()
+        self.raise_()
+        self.activateWindow()
+        
+    def hide_to_tray(self):
+        self.hide()
+        self.tear_down_ui()
+        self.update_schedule()
+        
+    def quit(self):
+        """Really quit, closing the window only hides it while the tray icon is shown"""
+        self.quitting = True
+        self.close()
+        QApplication.instance().quit()
+        
     def open_settings(self):
         """Open settings dialog"""
-        dialog = SettingsDialog(self.theme, self.auto_start, self)
+        from wiregui_dialogs import SettingsDialog
+        dialog = SettingsDialog(self.theme, self.auto_start, self, tray=self.tray is not None,
+                                themes=self.themes)
         
         if dialog.exec_() == QDialog.Accepted:
-            new_theme, new_auto_start = dialog.get_settings()
+            new_theme, new_auto_start, new_tray = dialog.get_settings()
             
             # Save settings
             self.settings.setValue('theme', new_theme)
             self.settings.setValue('auto_start', new_auto_start)
+            self.settings.setValue('tray', new_tray)
+            
+            if new_tray != (self.tray is not None):
+                self.set_tray_enabled(new_tray)
+                self.log("System tray icon enabled" if self.tray else "System tray icon disabled")
             
             # Apply theme if changed
             if new_theme != self.theme:
                 self.theme = new_theme
                 self.apply_theme()
-                self.log(f"Theme changed to {new_theme} mode")
+                self.log(f"Theme changed to {self.themes[new_theme].label}")
                 
             # Handle auto-start
             if new_auto_start != self.auto_start:
@@ -414,163 +1174,132 @@ class WireGuardGUI(QMainWindow):
                     self.log("Auto-start disabled")
                     
     def apply_theme(self):
-        """Apply the current theme"""
-        if self.theme == "dark":
-            self.apply_dark_theme()
-        else:
-            self.apply_light_theme()
-            
-    def apply_dark_theme(self):
-        """Apply dark theme to the main window"""
-        self.setStyleSheet("""
-            QMainWindow {
-                background-color: #1e1e1e;
-            }
-            QWidget {
-                background-color: #2b2b2b;
-                color: #ffffff;
-            }
-            QListWidget {
-                background-color: #252526;
-                border: 1px solid #3e3e3e;
-                color: #cccccc;
-            }
-            QListWidget::item:selected {
-                background-color: #ff5c3c;
-                color: white;
-            }
-            QListWidget::item:hover {
-                background-color: #3e3e3e;
-            }
-            QTextEdit {
-                background-color: #1e1e1e;
-                color: #d4d4d4;
-                border: 1px solid #3e3e3e;
-            }
-            QLabel {
-                color: #ffffff;
-            }
-            QPushButton {
-                background-color: #3c3c3c;
-                color: #ffffff;
-                border: 1px solid #555555;
-                padding: 8px;
-                border-radius: 3px;
-            }
-            QPushButton:hover {
-                background-color: #4a4a4a;
-            }
-            QPushButton:disabled {
-                background-color: #2b2b2b;
-                color: #666666;
-            }
-            QTabWidget::pane {
-                border: 1px solid #3e3e3e;
-                background-color: #2b2b2b;
-            }
-            QTabBar::tab {
-                background-color: #2b2b2b;
-                color: #cccccc;
-                padding: 8px 20px;
-                border: 1px solid #3e3e3e;
-            }
-            QTabBar::tab:selected {
-                background-color: #ff5c3c;
-                color: white;
-            }
-            QTabBar::tab:hover {
-                background-color: #3c3c3c;
-            }
-        """)
-    
-    def apply_light_theme(self):
-        """Apply light theme to the main window"""
-        self.setStyleSheet("""
-            QMainWindow {
-                background-color: #ffffff;
-            }
-            QWidget {
-                background-color: #f5f5f5;
-                color: #000000;
-            }
-            QListWidget {
-                background-color: #ffffff;
-                border: 1px solid #cccccc;
-                color: #000000;
-            }
-            QListWidget::item:selected {
-                background-color: #ff5c3c;
-                color: white;
-            }
-            QListWidget::item:hover {
-                background-color: #e0e0e0;
-            }
-            QTextEdit {
-                background-color: #ffffff;
-                color: #000000;
-                border: 1px solid #cccccc;
-            }
-            QLabel {
-                color: #000000;
-            }
-            QPushButton {
-                background-color: #ff5c3c;
-                color: #ffffff;
-                border: none;
-                padding: 8px;
-                border-radius: 3px;
-            }
-            QPushButton:hover {
-                background-color: #ff7659;
-            }
-            QPushButton:disabled {
-                background-color: #cccccc;
-                color: #666666;
-            }
-            QTabWidget::pane {
-                border: 1px solid #cccccc;
-                background-color: #f5f5f5;
-            }
-            QTabBar::tab {
-                background-color: #e0e0e0;
-                color: #000000;
-                padding: 8px 20px;
-                border: 1px solid #cccccc;
-            }
-            QTabBar::tab:selected {
-                background-color: #ff5c3c;
-                color: white;
-            }
-            QTabBar::tab:hover {
-                background-color: #d0d0d0;
-            }
-        """)
-        
-    def load_tunnels(self):
-        """Load all WireGuard configurations"""
-        self.tunnel_list.clear()
-        
-        if not os.path.exists(self.config_dir):
-            self.log("Warning: /etc/wireguard directory not found")
-            return
-            
+        """Apply the current theme, its stylesheet is compiled only once"""
+        theme = self.themes[self.theme]
+        if self.styleSheet() != theme.stylesheet:
+            self.setStyleSheet(theme.stylesheet)
+        colors = theme.colors
+        self.tunnel_model.set_colors(QColor(colors['tunnel_active']),
+                                     QColor(colors['tunnel_inactive']),
+                                     QColor(colors['tunnel_stale']))
+        
+    def dialog_theme(self):
+        """'dark' or 'light', what the dialogs style themselves after"""
+        return 'dark' if self.themes[self.theme].dark else 'light'
+        
+    def load_tunnels(self, quiet=False):
+        """Load all WireGuard configurations
+        
+        The list is updated with the difference to the directory listing, so
+        the selection and the state of unchanged rows are kept.
+        """
         try:
-            files = os.listdir(self.config_dir)
-            conf_files = [f[:-5] for f in files if f.endswith('.conf')]
+            conf_files = set(self.ops.list())
             
-            for tunnel_name in sorted(conf_files):
-                self.tunnel_list.addItem(tunnel_name)
+            if not self.tunnel_model.names:
+                self.tunnel_model.set_names(conf_files)
+                self.tunnel_model.update_status(self.status.interfaces)
+            else:
+                for tunnel_name in set(self.tunnel_model.names) - conf_files:
+                    self.remove_tunnel_item(tunnel_name)
+                for tunnel_name in conf_files:
+                    self.add_tunnel_item(tunnel_name)
                 
-            self.log(f"Loaded: {len(conf_files)} tunnel(s)")
+            if not quiet:
+                self.log(f"Loaded: {len(conf_files)} tunnel(s)")
+        except FileNotFoundError:
+            self.log(f"Warning: {self.config_dir} directory not found")
         except PermissionError:
-            self.log("Error: No access to /etc/wireguard (permissions required)")
+            self.log(f"Error: No access to {self.config_dir} (permissions required)")
+        except OSError as e:
+            self.log(f"✗ Could not list tunnels: {e}")
             
-    def on_tunnel_selected(self, item):
+    def watch_config_dir(self):
+        """Follow changes of the config directory, e.g. from Ansible or Puppet"""
+        if not os.path.isdir(self.config_dir):
+            return
+        self.config_watcher = ConfigDirWatcher(
+            self.config_dir, self, self.settings.value('config_rescan_interval', 30, type=int))
+        self.config_watcher.added.connect(self.on_config_added)
+        self.config_watcher.removed.connect(self.on_config_removed)
+        self.config_watcher.renamed.connect(self.on_config_renamed)
+        self.config_watcher.changed.connect(self.on_config_changed)
+        if self.config_watcher.rescan_timer:
+            self.log(f"⚠ Cannot watch {self.config_dir} ({self.config_watcher.error}), "
+                     f"rescanning it every {self.config_watcher.rescan_timer.interval() // 1000} s")
+            self.config_watcher.rescan_needed.connect(lambda: self.load_tunnels(quiet=True))
+        else:
+            self.config_watcher.rescan_needed.connect(self.load_tunnels)
+        
+    def add_tunnel_item(self, tunnel_name):
+        """Insert a tunnel at its sorted position, returns False if listed already"""
+        if not self.tunnel_model.insert(tunnel_name):
+            return False
+        self.tunnel_model.update_status(self.status.interfaces)
+        return True
+        
+    def remove_tunnel_item(self, tunnel_name):
+        """Remove a tunnel from the list, returns False if it was not listed"""
+        was_selected = self.selected_tunnel() == tunnel_name
+        if not self.tunnel_model.remove(tunnel_name):
+            return False
+        self.config_cache.invalidate(tunnel_name)
+        if was_selected:
+            self.tunnel_list.setCurrentIndex(QModelIndex())
+            self.clear_tunnel_info()
+        return True
+        
+    def select_tunnel(self, tunnel_name):
+        """Select a tunnel in the list and show it"""
+        if not self.ui_built:
+            self.kept_selection = tunnel_name
+            return
+        row = self.tunnel_model.row_of(tunnel_name)
+        if row >= 0:
+            self.tunnel_list.setCurrentIndex(self.tunnel_model.index(row))
+            self.on_tunnel_selected(tunnel_name)
+            
+    def selected_tunnel(self):
+        """Name of the current tunnel, or None"""
+        if not self.ui_built:
+            return None
+        index = self.tunnel_list.currentIndex()
+        if not index.isValid():
+            return None
+        return self.tunnel_model.name_at(index.row())
+            
+    def on_config_added(self, tunnel_name):
+        if self.add_tunnel_item(tunnel_name):
+            self.log(f"Tunnel {tunnel_name} appeared in {self.config_dir}", tunnel=tunnel_name)
+            
+    def on_config_removed(self, tunnel_name):
+        if self.remove_tunnel_item(tunnel_name):
+            self.log(f"Tunnel {tunnel_name} disappeared from {self.config_dir}", tunnel=tunnel_name)
+            
+    def on_config_renamed(self, old_name, new_name):
+        was_selected = self.selected_tunnel() == old_name
+        self.remove_tunnel_item(old_name)
+        if self.add_tunnel_item(new_name):
+            self.log(f"Tunnel {old_name} renamed to {new_name} in {self.config_dir}")
+        if was_selected:
+            self.select_tunnel(new_name)
+            
+    def on_config_changed(self, tunnel_name):
+        self.config_cache.invalidate(tunnel_name)
+        if self.selected_tunnel() == tunnel_name:
+            self.show_tunnel_info(tunnel_name)
+
+    def on_current_row_changed(self, current, previous):
+        if current.isValid():
+            self.on_tunnel_selected(self.tunnel_model.name_at(current.row()))
+            
+    def on_tunnel_selected(self, tunnel_name):
         """When a tunnel is selected"""
-        tunnel_name = item.text()
-        self.show_tunnel_info(tunnel_name)
         self.toggle_btn.setEnabled(True)
         self.edit_btn.setEnabled(True)
+        self.history_btn.setEnabled(True)
+        self.show_tunnel_info(tunnel_name)
+        self.update_schedule()
         
     def show_tunnel_info(self, tunnel_name):
         """Show information about the tunnel - FULL CONFIG"""
@@ -581,103 +1310,169 @@ class WireGuardGUI(QMainWindow):
         
         if is_active:
             self.toggle_btn.setText('Deactivate')
-            self.toggle_btn.setStyleSheet("""
-                QPushButton {
-                    background-color: #dc3545;
-                    color: white;
-                    border: none;
-                    padding: 8px;
-                    border-radius: 3px;
-                }
-                QPushButton:hover {
-                    background-color: #c82333;
-                }
-            """)
+            set_style_state(self.toggle_btn, 'deactivate')
             status_text = ""
             
-            # Update status indicator
-            self.status_dot.setStyleSheet("color: #4caf50;")  # Green
-            self.status_label.setText("Connected")
+            # Update status indicator, amber while peers do not handshake
+            health = self.health.tunnels.get(tunnel_name)
+            if health and health.state != 'healthy':
+                set_style_state(self.status_dot, 'stale')
+                self.status_label.setText(
+                    f"Connected, {len(health.stale_peers)} of {health.peers} peer(s) "
+                    f"without handshake for over {format_age(self.health.stale_after)}")
+                status_text += self.describe_stale_peers(health) + "\n\n"
+            else:
+                set_style_state(self.status_dot, 'connected')
+                self.status_label.setText("Connected")
             
             # Get connection time and data
-            if self.connection_start_time is None:
-                self.connection_start_time = time.time()
-                
-            elapsed = int(time.time() - self.connection_start_time)
-            self.timer_label.setText(f"Connected for: {str(timedelta(seconds=elapsed))}")
+            since = self.uptime.since(tunnel_name)
+            if since is None:
+                self.timer_label.setText("")
+            else:
+                started, exact = since
+                elapsed = timedelta(seconds=int(max(time.time() - started, 0)))
+                # Already up when first seen: we only know the lower bound
+                self.timer_label.setText(f"Connected for: {'' if exact else 'at least '}{elapsed}")
             
             # Get transfer statistics
             transfer_stats = self.get_transfer_stats(tunnel_name)
             self.transfer_label.setText(transfer_stats)
+            self.peer_rates.show_rates(self.throughput.rates(tunnel_name))
+            self.peer_rates.show()
             
         else:
             self.toggle_btn.setText('Activate')
-            self.toggle_btn.setStyleSheet("""
-                QPushButton {
-                    background-color: #ff5c3c;
-                    color: white;
-                    border: none;
-                    padding: 8px;
-                    border-radius: 3px;
-                }
-                QPushButton:hover {
-                    background-color: #ff7659;
-                }
-            """)
+            set_style_state(self.toggle_btn, 'activate')
             status_text = ""
             
             # Update status indicator
-            self.status_dot.setStyleSheet("color: #dc3545;")  # Red
+            set_style_state(self.status_dot, 'disconnected')
             self.status_label.setText("Disconnected")
             self.timer_label.setText("")
-            self.transfer_label.setText("")
-            self.connection_start_time = None
+            self.transfer_label.setText(self.get_month_stats(tunnel_name).strip())
+            self.peer_rates.hide()
+            
+        # A wg-quick call for this tunnel is still running
+        pending = self.pending_actions.get(tunnel_name)
+        self.toggle_btn.setEnabled(pending is None)
+        self.edit_btn.setEnabled(pending is None)
+        if pending:
+            progress = {'up': 'Activating…', 'down': 'Deactivating…',
+                        'restart': 'Restarting…'}.get(pending, 'Working…')
+            self.toggle_btn.setText(progress)
+            self.status_label.setText(progress)
+            
+        # Routing overlaps with other configs, analyzed in the background on changes
+        overlaps = self.overlap_analyzer.overlaps(tunnel_name)
+        if overlaps:
+            status_text += self.describe_overlaps(tunnel_name, overlaps) + "\n\n"
             
         # Read config file and show EVERYTHING
-        config_path = f"{self.config_dir}/{tunnel_name}.conf"
-        
         try:
-            with open(config_path, 'r') as f:
-                full_config = f.read()
-                
+            full_config, _sections = self.config_cache.get(tunnel_name)
+            
             # Show status + full config
-            self.info_text.setText(status_text + full_config)
+            info = status_text + full_config
         except Exception as e:
-            self.info_text.setText(f"{status_text}Could not read config: {e}")
+            info = f"{status_text}Could not read config: {e}"
+            
+        # Only redraw (and lose the scroll position) when something changed
+        if info != self.shown_info:
+            self.shown_info = info
+            self.info_text.setText(info)
+    
+    def describe_stale_peers(self, health):
+        """Text block listing the peers of a tunnel without recent handshakes"""
+        now = time.time()
+        lines = ["⚠ No recent handshake:"]
+        for peer in health.stale_peers[:5]:
+            if peer['latest_handshake']:
+                age = timedelta(seconds=int(now - peer['latest_handshake']))
+                lines.append(f"  {peer['public_key'][:8]}… ({peer['endpoint']}), last {age} ago")
+            else:
+                lines.append(f"  {peer['public_key'][:8]}… ({peer['endpoint']}), never")
+        if len(health.stale_peers) > 5:
+            lines.append(f"  … and {len(health.stale_peers) - 5} more")
+        return '\n'.join(lines)
+    
+    def describe_overlaps(self, tunnel_name, overlaps, limit=5):
+        """Text block listing AllowedIPs overlaps of a tunnel"""
+        lines = [f"⚠ AllowedIPs overlap with other tunnels ({len(overlaps)}):"]
+        lines += [f"  {overlap.describe(tunnel_name)}" for overlap in overlaps[:limit]]
+        if len(overlaps) > limit:
+            lines.append(f"  … and {len(overlaps) - limit} more")
+        return '\n'.join(lines)
+    
+    def active_overlaps(self, tunnel_name, others=()):
+        """Overlaps of a tunnel with the active tunnels (and others)"""
+        among = {n for n in self.tunnel_model.names if self.is_tunnel_active(n)} | set(others)
+        among.discard(tunnel_name)
+        return self.overlap_analyzer.overlaps(tunnel_name, among)
     
     def get_transfer_stats(self, tunnel_name):
-        """Get data transfer statistics"""
+        """Get data transfer statistics from the last status poll"""
+        received, sent = self.status.transfer(tunnel_name)
+        return (f"↓ Download: {format_bytes(received)}\n"
+                f"↑ Upload: {format_bytes(sent)}" + self.get_month_stats(tunnel_name))
+    
+    def get_month_stats(self, tunnel_name):
+        """Recorded traffic of this calendar month, also for inactive tunnels"""
+        if not self.traffic:
+            return ""
+        month = time.strftime('%Y-%m')
+        cached = self.month_stats.get(tunnel_name)
+        if cached and cached[0] == month:
+            return cached[1]
+        import sqlite3
         try:
-            result = subprocess.run(['wg', 'show', tunnel_name, 'transfer'],
-                                  capture_output=True, text=True)
-            if result.returncode == 0:
-                lines = result.stdout.strip().split('\n')
-                if lines:
-                    parts = lines[0].split('\t')
-                    if len(parts) >= 3:
-                        received = self.format_bytes(int(parts[1]))
-                        sent = self.format_bytes(int(parts[2]))
-                        return f"↓ Download: {received}\n↑ Upload: {sent}"
-        except:
-            pass
-        return "↓ Download: 0 B\n↑ Upload: 0 B"
+            received, sent = self.traffic.month_total(tunnel_name)
+        except sqlite3.Error:
+            return ""
+        text = ""
+        if received or sent:
+            text = f"\nThis month: ↓ {format_bytes(received)} ↑ {format_bytes(sent)}"
+        self.month_stats[tunnel_name] = (month, text)
+        return text
     
-    def format_bytes(self, bytes_val):
-        """Format bytes to human readable"""
-        for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
-            if bytes_val < 1024.0:
-                return f"{bytes_val:.2f} {unit}"
-            bytes_val /= 1024.0
-        return f"{bytes_val:.2f} PB"
+    def flush_traffic(self):
+        """Write buffered traffic counters to the accounting store"""
+        if not self.traffic:
+            return
+        import sqlite3
+        try:
+            self.traffic.flush()
+        except sqlite3.Error as e:
+            self.log(f"✗ Could not save traffic statistics: {e}")
+        self.month_stats.clear()
+        
+    def analyze_overlaps(self):
+        """Recompute the AllowedIPs overlaps in the background"""
+        if self.overlap_pending:
+            self.overlap_refresh.start()  # again once the running analysis is done
+            return
+        self.overlap_pending = True
+        self.executor.submit(self.overlap_analyzer.analyze, list(self.tunnel_model.names),
+                             callback=self.on_overlaps_analyzed)
+        
+    def on_overlaps_analyzed(self, current, error):
+        self.overlap_pending = False
+        if error is not None:
+            self.log(f"✗ Could not check AllowedIPs overlaps: {error}")
+        elif not current:
+            self.overlap_refresh.start()
+        tunnel_name = self.selected_tunnel()
+        if tunnel_name:
+            self.show_tunnel_info(tunnel_name)
     
     def edit_tunnel_config(self):
         """Open editor to edit tunnel configuration and name"""
-        current_item = self.tunnel_list.currentItem()
-        if not current_item:
+        tunnel_name = self.selected_tunnel()
+        if not tunnel_name:
+            return
+
+        if tunnel_name in self.pending_actions:
             return
-            
-        tunnel_name = current_item.text()
-        config_path = f"{self.config_dir}/{tunnel_name}.conf"
         
         # Check if tunnel is active
         if self.is_tunnel_active(tunnel_name):
@@ -689,27 +1484,33 @@ class WireGuardGUI(QMainWindow):
                                          QMessageBox.No)
             
             if reply == QMessageBox.Yes:
-                result = subprocess.run(['wg-quick', 'down', tunnel_name],
-                                      capture_output=True, text=True)
-                if result.returncode == 0:
-                    self.log(f"✓ {tunnel_name} deactivated for editing")
-                    self.refresh_status()
-                else:
-                    QMessageBox.warning(self, "Error", f"Could not deactivate:\n{result.stderr}")
-                    return
-            else:
-                return
+                self.run_tunnel_action(tunnel_name, 'down',
+                                       lambda result: self.on_deactivated_for_edit(tunnel_name, result))
+            return
+        
+        self.open_config_editor(tunnel_name)
         
+    def on_deactivated_for_edit(self, tunnel_name, result):
+        """Continue editing once the tunnel went down"""
+        if result.returncode == 0:
+            self.log(f"✓ {tunnel_name} deactivated for editing", tunnel=tunnel_name)
+            self.refresh_status()
+            self.open_config_editor(tunnel_name)
+        else:
+            QMessageBox.warning(self, "Error", f"Could not deactivate:\n{result.stderr}")
+            
+    def open_config_editor(self, tunnel_name):
+        """Open the editor dialog for an inactive tunnel"""
         # Read current configuration
         try:
-            with open(config_path, 'r') as f:
-                current_config = f.read()
+            current_config, _sections = self.config_cache.get(tunnel_name)
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Could not read configuration:\n{e}")
             return
         
         # Open editor dialog
-        dialog = ConfigEditorDialog(tunnel_name, current_config, self.theme, self)
+        from wiregui_dialogs import ConfigEditorDialog
+        dialog = ConfigEditorDialog(tunnel_name, current_config, self.dialog_theme(), self)
         
         if dialog.exec_() == QDialog.Accepted:
             new_config = dialog.get_config()
@@ -717,102 +1518,304 @@ class WireGuardGUI(QMainWindow):
             
             # Check if name changed
             name_changed = new_name != tunnel_name
-            new_config_path = f"{self.config_dir}/{new_name}.conf"
             
-            if name_changed and os.path.exists(new_config_path):
-                QMessageBox.warning(self, "Error", f"A tunnel named '{new_name}' already exists!")
-                return
-            
-            # Make backup
-            backup_path = f"{config_path}.backup"
             try:
-                import shutil
-                shutil.copy(config_path, backup_path)
+                if name_changed and self.ops.exists(new_name):
+                    QMessageBox.warning(self, "Error", f"A tunnel named '{new_name}' already exists!")
+                    return
                 
-                # Write new configuration
-                with open(new_config_path, 'w') as f:
-                    f.write(new_config)
+                # Written atomically, the old version stays in the history
+                if name_changed:
+                    self.ops.rename(tunnel_name, new_name, new_config)
+                    self.config_cache.invalidate(tunnel_name)
+                else:
+                    self.ops.write(new_name, new_config)
+                self.config_cache.invalidate(new_name)
                 
-                # If name changed, delete old file
                 if name_changed:
-                    os.remove(config_path)
-                    if os.path.exists(backup_path):
-                        os.remove(backup_path)
                     self.log(f"✓ Tunnel renamed from {tunnel_name} to {new_name}")
                     
                 self.log(f"✓ Configuration of {new_name} saved")
                 
-                # Refresh the list and select the tunnel
-                self.load_tunnels()
-                for i in range(self.tunnel_list.count()):
-                    if self.tunnel_list.item(i).text() == new_name:
-                        self.tunnel_list.setCurrentRow(i)
-                        self.on_tunnel_selected(self.tunnel_list.item(i))
-                        break
+                # Update the list and select the tunnel
+                if name_changed:
+                    self.remove_tunnel_item(tunnel_name)
+                    self.add_tunnel_item(new_name)
+                self.select_tunnel(new_name)
                 
             except PermissionError:
                 self.log(f"✗ No write permissions")
                 QMessageBox.critical(self, "Error", 
-                                   "No write permissions.\n\nStart the application with sudo!")
+                                   "No write permissions.\n\nAllow the privileged helper or start the application with sudo!")
             except Exception as e:
                 self.log(f"✗ Error saving: {e}")
                 QMessageBox.critical(self, "Error", f"Could not save:\n{e}")
+
+    def show_config_history(self):
+        """Compare the selected tunnel with saved versions and restore one"""
+        tunnel_name = self.selected_tunnel()
+        if not tunnel_name:
+            return
+        try:
+            versions = self.ops.versions(tunnel_name)
+            current_config, _config = self.config_cache.get(tunnel_name)
+        except (OSError, ValueError) as e:
+            QMessageBox.critical(self, "Error", f"Could not read the history:\n{e}")
+            return
+        
+        from wiregui_dialogs import ConfigHistoryDialog
+        dialog = ConfigHistoryDialog(tunnel_name, versions, current_config,
+                                     lambda digest: self.ops.read_version(tunnel_name, digest),
+                                     self.dialog_theme(), self)
+        if dialog.exec_() == QDialog.Accepted and dialog.get_config() is not None:
+            try:
+                self.ops.write(tunnel_name, dialog.get_config())
+            except (OSError, ValueError) as e:
+                self.log(f"✗ Error restoring {tunnel_name}: {e}", tunnel=tunnel_name)
+                QMessageBox.critical(self, "Error", f"Could not restore:\n{e}")
+                return
+            self.config_cache.invalidate(tunnel_name)
+            self.log(f"✓ Earlier configuration of {tunnel_name} restored", tunnel=tunnel_name)
+            if self.is_tunnel_active(tunnel_name):
+                self.log(f"Restart {tunnel_name} to apply the restored configuration", tunnel=tunnel_name)
+            self.show_tunnel_info(tunnel_name)
             
     def is_tunnel_active(self, tunnel_name):
-        """Check if a tunnel is active"""
+        """Check if a tunnel is active (from the shared status snapshot)"""
+        return self.status.is_active(tunnel_name)
+            
+    def run_tunnel_action(self, tunnel_name, action, callback, executor=None):
+        """Run `wg-quick <action> <tunnel>` in the background (via the helper if any)
+        
+        action is 'up', 'down' or 'restart', each attempt is killed after
+        the action_timeout setting.
+        """
+        self.pending_actions[tunnel_name] = action
+        started = time.monotonic()
+        
+        def finished(result, error):
+            self.pending_actions.pop(tunnel_name, None)
+            if error is not None:
+                result = subprocess.CompletedProcess(['wg-quick', action, tunnel_name],
+                                                     1, '', str(error))
+            if self.metrics:
+                self.metrics.record_toggle(tunnel_name, action, time.monotonic() - started,
+                                           result.returncode == 0)
+            callback(result)
+            
+        (executor or self.executor).submit(getattr(self.ops, action), tunnel_name,
+                                           self.action_timeout, callback=finished)
+        self.update_status_view()
+        
+    def profiles(self):
+        """Saved profiles as {name: [tunnel names]}"""
+        self.settings.beginGroup('profiles')
         try:
-            result = subprocess.run(['wg', 'show', tunnel_name], 
-                                  capture_output=True, text=True)
-            return result.returncode == 0
-        except:
-            return False
+            return {name: self.settings.value(name, [], type=list)
+                    for name in self.settings.childKeys()}
+        finally:
+            self.settings.endGroup()
+            
+    def build_profile_menu(self):
+        """Fill the profile menu, it is rebuilt each time it opens"""
+        self.profile_menu.clear()
+        profiles = self.profiles()
+        for name in sorted(profiles):
+            self.profile_menu.addAction(f"Switch to {name} ({len(profiles[name])})",
+                                        lambda name=name: self.switch_profile(name))
+        if profiles:
+            self.profile_menu.addSeparator()
+        save_action = self.profile_menu.addAction('Save selection as profile…',
+                                                  self.save_profile)
+        save_action.setEnabled(bool(self.selected_tunnels()))
+        if profiles:
+            delete_menu = self.profile_menu.addMenu('Delete profile')
+            for name in sorted(profiles):
+                delete_menu.addAction(name, lambda name=name: self.delete_profile(name))
+                
+    def save_profile(self):
+        """Store the selected tunnels as a named profile"""
+        tunnel_names = self.selected_tunnels()
+        name, ok = QInputDialog.getText(self, 'Save Profile', 'Profile name:')
+        name = name.strip()
+        if not (ok and name and tunnel_names):
+            return
+        if '/' in name or '\\' in name:
+            QMessageBox.warning(self, "Error", "Profile names cannot contain / or \\")
+            return
+        self.settings.setValue(f'profiles/{name}', tunnel_names)
+        self.log(f"✓ Profile {name} saved: {', '.join(tunnel_names)}")
+        self.update_tray(force=True)
+        
+    def delete_profile(self, name):
+        self.settings.remove(f'profiles/{name}')
+        self.log(f"✓ Profile {name} deleted")
+        self.update_tray(force=True)
+        
+    def switch_profile(self, name):
+        """Make exactly the tunnels of a profile active
+        
+        Only the difference is applied: unwanted tunnels go down in parallel,
+        then missing ones come up in parallel. Tunnels in both sets stay up.
+        """
+        target = [n for n in self.profiles().get(name, []) if self.has_tunnel(n)]
+        active = [n for n in self.tunnel_model.names if self.is_tunnel_active(n)]
+        to_down, to_up = plan_switch(active, target)
+        if not to_down and not to_up:
+            self.log(f"Profile {name} is already active")
+            return
+        kept = len(set(active) & set(target))
+        self.log_overlaps(target, active=False)
+        self.log(f"Switching to profile {name}: {len(to_down)} down, {len(to_up)} up, "
+                 f"{kept} unchanged")
+        
+        def downs_finished(failed_down):
+            self.bulk_action('up', to_up, check_overlaps=False,
+                             done=lambda failed_up: ups_finished(failed_down + failed_up))
             
+        def ups_finished(failed):
+            if failed:
+                self.log(f"✗ Profile {name} switched with errors: {', '.join(sorted(failed))}")
+            else:
+                self.log(f"✓ Profile {name} active")
+                
+        # Down first: the old set may hold routes or addresses the new one needs
+        self.bulk_action('down', to_down, done=downs_finished)
+        
+    def log_overlaps(self, tunnel_names, active=True):
+        """Warn about overlaps among tunnels about to be up together"""
+        reported = set()
+        for tunnel_name in tunnel_names:
+            if active:
+                overlaps = self.active_overlaps(tunnel_name, tunnel_names)
+            else:
+                overlaps = self.overlap_analyzer.overlaps(
+                    tunnel_name, set(tunnel_names) - {tunnel_name})
+            for overlap in overlaps:
+                if id(overlap) not in reported:
+                    reported.add(id(overlap))
+                    self.log(f"⚠ {tunnel_name}: {overlap.describe(tunnel_name)}", tunnel=tunnel_name)
+                    
+    def selected_tunnels(self):
+        """Names of all selected tunnels, in list order"""
+        if not self.ui_built:
+            return []
+        rows = sorted(index.row() for index in self.tunnel_list.selectionModel().selectedRows())
+        return [self.tunnel_model.name_at(row) for row in rows]
+    
+    def show_bulk_menu(self, pos):
+        if self.selected_tunnels():
+            self.bulk_menu.exec_(self.tunnel_list.viewport().mapToGlobal(pos))
+            
+    def bulk_action(self, action, tunnel_names=None, done=None, check_overlaps=True):
+        """Run up/down/restart on many tunnels in parallel
+        
+        At most bulk_concurrency actions run at a time, so the total time is
+        close to the slowest tunnel. Each result is logged when it arrives,
+        done(failed_names) is called at the end.
+        """
+        if tunnel_names is None:
+            tunnel_names = self.selected_tunnels()
+        if action == 'up':
+            tunnel_names = [n for n in tunnel_names if not self.is_tunnel_active(n)]
+        elif action == 'down':
+            tunnel_names = [n for n in tunnel_names if self.is_tunnel_active(n)]
+        tunnel_names = [n for n in tunnel_names if n not in self.pending_actions]
+        if not tunnel_names:
+            if done:
+                done([])
+            else:
+                self.log(f"Nothing to {action}")
+            return
+        
+        if action == 'up' and check_overlaps:
+            self.log_overlaps(tunnel_names)
+            
+        started = time.monotonic()
+        remaining = set(tunnel_names)
+        failed = []
+        self.log(f"Running {action} on {len(tunnel_names)} tunnel(s)…")
+        
+        def finished(tunnel_name, result):
+            remaining.discard(tunnel_name)
+            elapsed = time.monotonic() - started
+            if result.returncode == 0:
+                self.log(f"✓ {tunnel_name} {action} ({elapsed:.1f} s)", tunnel=tunnel_name)
+            else:
+                failed.append(tunnel_name)
+                self.log(f"✗ {tunnel_name} {action} failed: {result.stderr.strip()}", tunnel=tunnel_name)
+            if not remaining:
+                ok = len(tunnel_names) - len(failed)
+                self.log(f"{'✓' if not failed else '✗'} {action}: {ok}/{len(tunnel_names)} "
+                         f"succeeded in {elapsed:.1f} s")
+                self.refresh_status()
+                if done:
+                    done(failed)
+                
+        for tunnel_name in tunnel_names:
+            self.run_tunnel_action(tunnel_name, action,
+                                   lambda result, n=tunnel_name: finished(n, result),
+                                   executor=self.bulk_executor)
+        
     def toggle_tunnel(self):
         """Activate or deactivate the selected tunnel"""
-        current_item = self.tunnel_list.currentItem()
-        if not current_item:
-            return
+        tunnel_name = self.selected_tunnel()
+        if tunnel_name:
+            self.toggle_tunnel_by_name(tunnel_name)
             
-        tunnel_name = current_item.text()
-        is_active = self.is_tunnel_active(tunnel_name)
+    def toggle_tunnel_by_name(self, tunnel_name):
+        """Activate or deactivate a tunnel, also used by the tray menu"""
+        if tunnel_name in self.pending_actions:
+            return
+        self.recent_tunnels = ([tunnel_name] +
+                               [name for name in self.recent_tunnels if name != tunnel_name])[:5]
+        self.settings.setValue('tray_recent', self.recent_tunnels)
+        action = 'down' if self.is_tunnel_active(tunnel_name) else 'up'
+        if action == 'up':
+            overlaps = self.active_overlaps(tunnel_name)
+            if overlaps:
+                reply = QMessageBox.question(self, 'Routing overlap',
+                                             self.describe_overlaps(tunnel_name, overlaps, 10) +
+                                             "\n\nTraffic may go through the wrong tunnel. "
+                                             "Activate anyway?",
+                                             QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+                if reply != QMessageBox.Yes:
+                    return
+        self.run_tunnel_action(tunnel_name, action,
+                               lambda result: self.on_toggle_finished(tunnel_name, action, result))
         
-        try:
-            if is_active:
-                # Deactivate
-                result = subprocess.run(['wg-quick', 'down', tunnel_name],
-                                      capture_output=True, text=True)
-                if result.returncode == 0:
-                    self.log(f"✓ {tunnel_name} deactivated")
-                    self.connection_start_time = None
-                else:
-                    self.log(f"✗ Error deactivating {tunnel_name}: {result.stderr}")
-                    QMessageBox.warning(self, "Error", f"Could not deactivate:\n{result.stderr}")
+    def on_toggle_finished(self, tunnel_name, action, result):
+        """Report the outcome of a toggle"""
+        if action == 'down':
+            if result.returncode == 0:
+                self.log(f"✓ {tunnel_name} deactivated", tunnel=tunnel_name)
             else:
-                # Activate
-                result = subprocess.run(['wg-quick', 'up', tunnel_name],
-                                      capture_output=True, text=True)
-                if result.returncode == 0:
-                    self.log(f"✓ {tunnel_name} activated")
-                    self.connection_start_time = time.time()
-                else:
-                    self.log(f"✗ Error activating {tunnel_name}: {result.stderr}")
-                    QMessageBox.warning(self, "Error", f"Could not activate:\n{result.stderr}")
-                    
-            self.refresh_status()
-        except Exception as e:
-            self.log(f"✗ Error: {e}")
-            QMessageBox.critical(self, "Error", f"Something went wrong:\n{e}")
+                self.log(f"✗ Error deactivating {tunnel_name}: {result.stderr}", tunnel=tunnel_name)
+                QMessageBox.warning(self, "Error", f"Could not deactivate:\n{result.stderr}")
+        else:
+            if result.returncode == 0:
+                self.log(f"✓ {tunnel_name} activated", tunnel=tunnel_name)
+            else:
+                self.log(f"✗ Error activating {tunnel_name}: {result.stderr}", tunnel=tunnel_name)
+                QMessageBox.warning(self, "Error", f"Could not activate:\n{result.stderr}")
+                
+        self.refresh_status()
             
     def create_empty_tunnel(self):
         """Create a new empty tunnel configuration"""
         name, ok = QInputDialog.getText(self, 'New Tunnel', 'Tunnel name:')
         
         if ok and name:
-            config_path = f"{self.config_dir}/{name}.conf"
-            
             # IMPORTANT: Check if file already exists
-            if os.path.exists(config_path):
-                QMessageBox.warning(self, "Error", "This tunnel already exists! The existing configuration will NOT be overwritten.")
+            try:
+                if self.ops.exists(name):
+                    QMessageBox.warning(self, "Error", "This tunnel already exists! The existing configuration will NOT be overwritten.")
+                    return
+            except ValueError:
+                QMessageBox.warning(self, "Error", "Invalid tunnel name. Use up to 15 letters, digits or _=+.-")
+                return
+            except OSError as e:
+                QMessageBox.critical(self, "Error", f"Could not check the tunnel:\n{e}")
                 return
                 
             template = """[Interface]
@@ -828,49 +1831,74 @@ AllowedIPs = 0.0.0.0/0
             
             try:
                 # Only write if file does NOT exist
-                if not os.path.exists(config_path):
-                    with open(config_path, 'w') as f:
-                        f.write(template)
+                if not self.ops.exists(name):
+                    self.ops.write(name, template)
+                    self.config_cache.invalidate(name)
                     self.log(f"✓ Tunnel {name} created")
-                    self.load_tunnels()
+                    self.add_tunnel_item(name)
                     
                     # Select the new tunnel
-                    for i in range(self.tunnel_list.count()):
-                        if self.tunnel_list.item(i).text() == name:
-                            self.tunnel_list.setCurrentRow(i)
-                            self.on_tunnel_selected(self.tunnel_list.item(i))
-                            break
+                    self.select_tunnel(name)
                 else:
                     self.log(f"✗ Tunnel {name} already exists, not overwritten")
                     QMessageBox.warning(self, "Error", "File already exists!")
             except PermissionError:
                 self.log(f"✗ No permissions to create {name}")
                 QMessageBox.critical(self, "Error", "No write permissions. Run as root or with sudo.")
+            except OSError as e:
+                self.log(f"✗ Error creating {name}: {e}")
+                QMessageBox.critical(self, "Error", f"Could not create:\n{e}")
                 
     def import_tunnel(self):
-        """Import a tunnel configuration file"""
-        file_path, _ = QFileDialog.getOpenFileName(self, 'Import Tunnel', 
-                                                    '', 'WireGuard Config (*.conf)')
+        """Import one or more tunnel configuration files"""
+        from wiregui_dialogs import confirm_invalid_config
+        file_paths, _ = QFileDialog.getOpenFileNames(self, 'Import Tunnel', 
+                                                     '', 'WireGuard Config (*.conf)')
         
-        if file_path:
+        configs = {}
+        for file_path in file_paths:
             tunnel_name = os.path.basename(file_path)[:-5]
-            dest_path = f"{self.config_dir}/{tunnel_name}.conf"
             
             # Check if already exists
-            if os.path.exists(dest_path):
+            try:
+                exists = self.ops.exists(tunnel_name)
+            except ValueError:
+                QMessageBox.warning(self, "Error", f"'{tunnel_name}' is not a valid tunnel name. "
+                                    "Rename the file to up to 15 letters, digits or _=+.-")
+                continue
+            except OSError as e:
+                QMessageBox.critical(self, "Error", f"Could not import:\n{e}")
+                return
+            if exists:
                 reply = QMessageBox.question(self, 'File exists',
                                              f'Tunnel "{tunnel_name}" already exists.\n\n'
                                              'Do you want to overwrite it?',
                                              QMessageBox.Yes | QMessageBox.No,
                                              QMessageBox.No)
                 if reply == QMessageBox.No:
-                    return
+                    continue
+            
+            # The source is read as the user, only the write needs privileges
+            try:
+                with open(file_path, 'r') as f:
+                    config = f.read()
+            except OSError as e:
+                QMessageBox.critical(self, "Error", f"Could not read {file_path}:\n{e}")
+                continue
+            errors = config_errors(validate_config(config))
+            if errors and not confirm_invalid_config(self, errors,
+                                                     f"Import {tunnel_name} anyway?"):
+                continue
+            configs[tunnel_name] = config
             
+        if configs:
             try:
-                import shutil
-                shutil.copy(file_path, dest_path)
-                self.log(f"✓ Tunnel {tunnel_name} imported")
-                self.load_tunnels()
+                # All files in one batch, the directory is synced once
+                self.ops.write_many(configs)
+                for tunnel_name in configs:
+                    self.config_cache.invalidate(tunnel_name)
+                    self.log(f"✓ Tunnel {tunnel_name} imported", tunnel=tunnel_name)
+                    self.add_tunnel_item(tunnel_name)
             except PermissionError:
                 self.log(f"✗ No permissions to import")
                 QMessageBox.critical(self, "Error", "No write permissions. Run as root or with sudo.")
@@ -880,82 +1908,253 @@ AllowedIPs = 0.0.0.0/0
                 
     def delete_tunnel(self):
         """Delete the selected tunnel"""
-        current_item = self.tunnel_list.currentItem()
-        if not current_item:
+        tunnel_name = self.selected_tunnel()
+        if not tunnel_name:
             QMessageBox.warning(self, "No selection", "Select a tunnel first")
             return
-            
-        tunnel_name = current_item.text()
-        
+
         reply = QMessageBox.question(self, 'Delete',
                                      f'Are you sure you want to delete "{tunnel_name}"?',
                                      QMessageBox.Yes | QMessageBox.No,
                                      QMessageBox.No)
         
         if reply == QMessageBox.Yes:
+            if tunnel_name in self.pending_actions:
+                return
             # First deactivate if active
             if self.is_tunnel_active(tunnel_name):
-                subprocess.run(['wg-quick', 'down', tunnel_name])
-                
-            config_path = f"{self.config_dir}/{tunnel_name}.conf"
-            try:
-                os.remove(config_path)
-                self.log(f"✓ Tunnel {tunnel_name} deleted")
-                self.load_tunnels()
-                self.info_label.setText("Select a tunnel")
-                self.info_text.clear()
-                self.toggle_btn.setEnabled(False)
-                self.edit_btn.setEnabled(False)
-                self.status_dot.setStyleSheet("color: #666666;")
-                self.status_label.setText("Disconnected")
-                self.timer_label.setText("")
-                self.transfer_label.setText("")
-            except PermissionError:
-                self.log(f"✗ No permissions to delete")
-                QMessageBox.critical(self, "Error", "No permissions to delete. Run as root or with sudo.")
-            except Exception as e:
-                self.log(f"✗ Error: {e}")
-                QMessageBox.critical(self, "Error", f"Could not delete:\n{e}")
+                self.run_tunnel_action(tunnel_name, 'down',
+                                       lambda result: self.on_deactivated_for_delete(tunnel_name, result))
+            else:
+                self.remove_tunnel_config(tunnel_name)
                 
+    def on_deactivated_for_delete(self, tunnel_name, result):
+        """Delete the config once the tunnel went down, keep it if that failed"""
+        if result.returncode != 0:
+            self.log(f"✗ {tunnel_name} not deleted, could not deactivate it: {result.stderr}",
+                     tunnel=tunnel_name)
+            QMessageBox.warning(self, "Error", f"Could not deactivate:\n{result.stderr}")
+            return
+        self.log(f"✓ {tunnel_name} deactivated", tunnel=tunnel_name)
+        self.remove_tunnel_config(tunnel_name)
+        self.refresh_status()
+
+    def remove_tunnel_config(self, tunnel_name):
+        """Delete the configuration file of an inactive tunnel"""
+        try:
+            self.ops.delete(tunnel_name)
+            self.config_cache.invalidate(tunnel_name)
+            self.log(f"✓ Tunnel {tunnel_name} deleted", tunnel=tunnel_name)
+            self.remove_tunnel_item(tunnel_name)
+            self.clear_tunnel_info()
+        except PermissionError:
+            self.log(f"✗ No permissions to delete")
+            QMessageBox.critical(self, "Error", "No permissions to delete. Run as root or with sudo.")
+        except Exception as e:
+            self.log(f"✗ Error: {e}")
+            QMessageBox.critical(self, "Error", f"Could not delete:\n{e}")
+            
+    def clear_tunnel_info(self):
+        """Reset the info pane when no tunnel is selected"""
+        if not self.ui_built:
+            return
+        self.info_label.setText("Select a tunnel")
+        self.info_text.clear()
+        self.shown_info = None
+        self.toggle_btn.setEnabled(False)
+        self.edit_btn.setEnabled(False)
+        self.history_btn.setEnabled(False)
+        set_style_state(self.status_dot, 'unknown')
+        self.status_label.setText("Disconnected")
+        self.timer_label.setText("")
+        self.transfer_label.setText("")
+        self.peer_rates.hide()
+        
     def refresh_status(self):
-        """Refresh the status of the selected tunnel"""
-        current_item = self.tunnel_list.currentItem()
-        if current_item:
-            self.show_tunnel_info(current_item.text())
-            
-        # Update colors in the list
-        for i in range(self.tunnel_list.count()):
-            item = self.tunnel_list.item(i)
-            tunnel_name = item.text()
-            if self.is_tunnel_active(tunnel_name):
-                item.setForeground(QColor(255, 92, 60))  # Orange #ff5c3c
+        """Poll the tunnel status in the background, the view follows when done"""
+        # One `wg` call per tick, shared by the info pane and the list
+        if self.poll_pending:
+            return
+        self.poll_pending = True
+        self.executor.submit(self.status.poll, callback=self.on_status_polled)
+        
+    def on_status_polled(self, interfaces, error):
+        """A background status poll completed"""
+        self.poll_pending = False
+        self.mark_startup('status')
+        if self.status.backend.name != self.status_backend:
+            # Counters may not line up between backends, start over
+            self.throughput.reset()
+            self.status_backend = self.status.backend.name
+            self.log(f"Status backend: {self.status_backend}")
+        if self.status.error:
+            # Keep showing the last snapshot, nothing went down because of it
+            if self.status.error != self.status_error:
+                self.log(f"⚠ Status poll failed: {self.status.error}")
+                if self.status.lost and self.status.backend.name == 'helper':
+                    # Once per outage, a cancelled password prompt is not repeated
+                    self.connect_helper()
+            self.status_error = self.status.error
+            if self.metrics:
+                self.metrics.record_poll_error()
+            self.update_schedule()
+            return
+        if self.status_error:
+            self.log("✓ Status polls working again")
+            self.status_error = None
+        deltas = self.throughput.update(interfaces)
+        if self.traffic and deltas:
+            for tunnel_name, (rx, tx) in deltas.items():
+                self.traffic.add(tunnel_name, rx, tx)
+            if not self.traffic_flush.isActive():
+                self.traffic_flush.start()
+        self.uptime.update(interfaces)
+        if self.metrics:
+            spawns = spawn_count()
+            self.metrics.record_poll(interfaces, self.tunnel_model.names,
+                                     self.status.duration, spawns - self.last_spawns)
+            self.last_spawns = spawns
+        self.check_health(interfaces)
+        self.update_status_view()
+        
+    def check_health(self, interfaces):
+        """Report handshake health changes and restart stale tunnels if enabled"""
+        for tunnel_name, old, new in self.health.update(interfaces):
+            self.tunnel_model.set_health(tunnel_name, new or 'healthy')
+            if new is None:
+                continue  # went down
+            if new == 'healthy':
+                self.log(f"✓ {tunnel_name}: peers handshaking again", tunnel=tunnel_name)
             else:
-                if self.theme == "dark":
-                    item.setForeground(QColor(204, 204, 204))  # Light gray
-                else:
-                    item.setForeground(QColor(0, 0, 0))  # Black
+                health = self.health.tunnels[tunnel_name]
+                self.log(f"⚠ {tunnel_name}: {len(health.stale_peers)} of {health.peers} "
+                         f"peer(s) without handshake for over {format_age(self.health.stale_after)}",
+                         tunnel=tunnel_name)
+        if not self.auto_restart:
+            return
+        for tunnel_name in self.health.due_restarts():
+            if tunnel_name in self.pending_actions or not self.has_tunnel(tunnel_name):
+                continue
+            delay = self.health.restarted(tunnel_name)
+            self.log(f"⚠ Restarting stale tunnel {tunnel_name} "
+                     f"(next attempt in {delay} s at the earliest)", tunnel=tunnel_name)
+            self.run_tunnel_action(tunnel_name, 'restart',
+                                   lambda result, n=tunnel_name: self.on_health_restart(n, result))
+            
+    def on_health_restart(self, tunnel_name, result):
+        if result.returncode == 0:
+            self.log(f"✓ {tunnel_name} restarted", tunnel=tunnel_name)
+        else:
+            self.log(f"✗ Restarting {tunnel_name} failed: {result.stderr.strip()}",
+                     tunnel=tunnel_name)
+        self.refresh_status()
+        
+    def update_status_view(self):
+        """Update the info pane and list colours from the status snapshot"""
+        tunnel_name = self.selected_tunnel()
+        if tunnel_name:
+            self.show_tunnel_info(tunnel_name)
+            
+        # Update colors in the list, only changed rows are repainted
+        self.tunnel_model.update_status(self.status.interfaces)
+        self.update_tray()
+        self.update_schedule()
+        
+    def on_link_changed(self, name, present):
+        """A network interface appeared, disappeared or changed"""
+        if name and (self.has_tunnel(name) or name in self.status.interfaces):
+            self.uptime.link_event(name, present)
+        if not name or name in self.status.interfaces or self.has_tunnel(name):
+            self.link_refresh.start()
+            
+    def has_tunnel(self, tunnel_name):
+        """Check if a tunnel is in the list"""
+        return self.tunnel_model.row_of(tunnel_name) >= 0
+        
+    def update_schedule(self):
+        """Pick the refresh cadence from what the user can see
+        
+        Fast while a tunnel is shown on the Tunnels tab of the focused window,
+        backing off while minimized, hidden, unfocused or on another tab. With
+        a link monitor, state changes arrive as events and a shown inactive
+        tunnel needs no polling at all, unless handshakes of active
+        tunnels are being watched.
+        """
+        tunnel_name = self.selected_tunnel()
+        watching = (self.isVisible() and not self.isMinimized() and
+                    self.isActiveWindow() and self.tabs.currentIndex() == 0 and
+                    tunnel_name is not None)
+        if not watching:
+            # In the tray, link events report state changes, polls are only
+            # needed for the handshake health
+            if (self.isHidden() and self.link_monitor.available and
+                    not (self.health.stale_after and self.status.interfaces)):
+                self.scheduler.set_mode('off')
+            else:
+                self.scheduler.set_mode('idle')
+        elif (not self.link_monitor.available or
+              self.is_tunnel_active(tunnel_name)):
+            self.scheduler.set_mode('fast')
+        elif self.health.stale_after and self.status.interfaces:
+            # Active tunnels still need polls for the handshake health
+            self.scheduler.set_mode('idle')
+        else:
+            self.scheduler.set_mode('off')
+            
+    def changeEvent(self, event):
+        if event.type() in (QEvent.WindowStateChange, QEvent.ActivationChange):
+            self.update_schedule()
+        super().changeEvent(event)
+        
+    def closeEvent(self, event):
+        if self.tray and not self.quitting:
+            event.ignore()
+            self.hide_to_tray()
+            return
+        if self.traffic:
+            self.flush_traffic()
+        if self.metrics_server:
+            self.metrics_server.stop()
+        super().closeEvent(event)
+        
+    def showEvent(self, event):
+        self.build_ui()
+        super().showEvent(event)
+        self.update_schedule()
+        
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.update_schedule()
                 
-    def log(self, message):
-        """Add message to log"""
-        from datetime import datetime
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        self.log_text.append(f"[{timestamp}] {message}")
+    def log(self, message, level=None, tunnel=None):
+        """Add message to log, the level defaults to what its ✓/✗/⚠ prefix says"""
+        record = LogRecord(message, level or log_level(message), tunnel)
+        if self.ui_built:
+            scrollbar = self.log_view.verticalScrollBar()
+            follow = self.log_scroll.isActive() or scrollbar.value() == scrollbar.maximum()
+        else:
+            follow = False  # build_ui scrolls to the end
+        self.log_model.append(record)
+        if follow:
+            self.log_scroll.start()
+        if self.log_mirror:
+            self.log_mirror.write(record)
 
 def main():
     app = QApplication(sys.argv)
     
-    # Check if WireGuard is installed
-    try:
-        result = subprocess.run(['which', 'wg'], capture_output=True)
-        if result.returncode != 0:
-            QMessageBox.critical(None, "Error", 
-                               "WireGuard not found!\n\nInstall with:\nsudo apt install wireguard")
-            sys.exit(1)
-    except:
-        pass
-        
-    gui = WireGuardGUI()
-    gui.show()
+    # Check if WireGuard is installed (a PATH lookup, no process)
+    search_path = os.environ.get('PATH', os.defpath).split(os.pathsep)
+    if not any(os.access(os.path.join(directory, 'wg'), os.X_OK) for directory in search_path):
+        QMessageBox.critical(None, "Error", 
+                           "WireGuard not found!\n\nInstall with:\nsudo apt install wireguard")
+        sys.exit(1)
+        
+    # `wiregui --tray` (e.g. from autostart) starts with just the tray icon
+    hidden = '--tray' in sys.argv[1:]
+    gui = WireGuardGUI(hidden=hidden)
+    if not (hidden and gui.tray):
+        gui.show_window()
     sys.exit(app.exec_())
 
 if __name__ == '__main__':
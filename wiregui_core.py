@@ -0,0 +1,2448 @@
+"""GUI-free core of WireGUI: tunnel status, accounting, CLI and daemon
+
+Nothing in here imports Qt, so `wiregui status/up/down/list` and the
+daemon start fast. Modules only some paths need (sqlite3, ipaddress,
+socketserver, zlib, ...) are imported where they are used. wiregui.py
+builds the GUI on top of this module.
+"""
+import sys
+import os
+import errno
+import subprocess
+import time
+import struct
+import socket
+import base64
+import json
+import re
+import threading
+import signal
+from array import array
+from contextlib import contextmanager
+from datetime import datetime
+
+CONFIG_DIR = "/etc/wireguard"
+
+# Netlink constants from linux/netlink.h, linux/rtnetlink.h and linux/wireguard.h
+NETLINK_ROUTE = 0
+NETLINK_GENERIC = 16
+NLM_F_REQUEST = 0x1
+NLM_F_DUMP = 0x300
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+NLA_TYPE_MASK = 0x3fff
+RTMGRP_LINK = 0x1
+RTM_NEWLINK = 16
+RTM_DELLINK = 17
+RTM_GETLINK = 18
+IFLA_IFNAME = 3
+IFLA_LINKINFO = 18
+IFLA_INFO_KIND = 1
+GENL_ID_CTRL = 0x10
+CTRL_CMD_GETFAMILY = 3
+CTRL_ATTR_FAMILY_ID = 1
+CTRL_ATTR_FAMILY_NAME = 2
+WG_CMD_GET_DEVICE = 0
+WG_GENL_VERSION = 1
+WGDEVICE_A_IFNAME = 2
+WGDEVICE_A_PUBLIC_KEY = 4
+WGDEVICE_A_LISTEN_PORT = 6
+WGDEVICE_A_FWMARK = 7
+WGDEVICE_A_PEERS = 8
+WGPEER_A_PUBLIC_KEY = 1
+WGPEER_A_ENDPOINT = 4
+WGPEER_A_PERSISTENT_KEEPALIVE_INTERVAL = 5
+WGPEER_A_LAST_HANDSHAKE_TIME = 6
+WGPEER_A_RX_BYTES = 7
+WGPEER_A_TX_BYTES = 8
+WGPEER_A_ALLOWEDIPS = 9
+WGALLOWEDIP_A_FAMILY = 1
+WGALLOWEDIP_A_IPADDR = 2
+WGALLOWEDIP_A_CIDR_MASK = 3
+
+def nl_message(msg_type, flags, seq, payload):
+    """Build a netlink message"""
+    return struct.pack('=IHHII', 16 + len(payload), msg_type, flags, seq, 0) + payload
+
+def nl_attr(attr_type, payload):
+    """Build a netlink attribute, padded to 4 bytes"""
+    length = 4 + len(payload)
+    return struct.pack('=HH', length, attr_type) + payload + b'\0' * (-length % 4)
+
+def iter_nl_messages(data):
+    """Yield (type, flags, payload) for each netlink message in a buffer"""
+    offset = 0
+    while offset + 16 <= len(data):
+        length, msg_type, flags, _seq, _pid = struct.unpack_from('=IHHII', data, offset)
+        if length < 16:
+            break
+        yield msg_type, flags, data[offset + 16:offset + length]
+        offset += (length + 3) & ~3
+
+def iter_nl_attrs(data, offset=0):
+    """Yield (type, payload) for each netlink attribute in a buffer"""
+    while offset + 4 <= len(data):
+        length, attr_type = struct.unpack_from('=HH', data, offset)
+        if length < 4:
+            break
+        yield attr_type & NLA_TYPE_MASK, data[offset + 4:offset + length]
+        offset += (length + 3) & ~3
+
+def nl_string(payload):
+    return payload.rstrip(b'\0').decode('utf-8', 'replace')
+
+def parse_link_message(payload):
+    """Parse an RTM_NEWLINK/RTM_DELLINK payload into (ifindex, name, kind)"""
+    _family, _type, ifindex, _flags, _change = struct.unpack_from('=BxHiII', payload)
+    attrs = dict(iter_nl_attrs(payload, 16))
+    kind = ''
+    if IFLA_LINKINFO in attrs:
+        kind = nl_string(dict(iter_nl_attrs(attrs[IFLA_LINKINFO])).get(IFLA_INFO_KIND, b''))
+    return ifindex, nl_string(attrs.get(IFLA_IFNAME, b'')), kind
+
+def format_sockaddr(data):
+    """Format a sockaddr_in/sockaddr_in6 the way `wg` prints endpoints"""
+    if len(data) < 8:
+        return None
+    family, = struct.unpack_from('=H', data)
+    port, = struct.unpack_from('!H', data, 2)
+    if family == socket.AF_INET:
+        return f"{socket.inet_ntop(socket.AF_INET, data[4:8])}:{port}"
+    if family == socket.AF_INET6 and len(data) >= 24:
+        return f"[{socket.inet_ntop(socket.AF_INET6, data[8:24])}]:{port}"
+    return None
+
+def parse_wg_device_messages(payloads, interfaces=None, name=None):
+    """Parse WG_CMD_GET_DEVICE replies into the same snapshot as parse_wg_dump
+    
+    Large devices are split over several messages: only the first carries
+    the device attributes (and its name), the others only peers, and a peer
+    continued in the next message repeats its public key with the remaining
+    allowed IPs. All messages belong to the requested interface name, or to
+    the name in the first message if none is given.
+    """
+    if interfaces is None:
+        interfaces = {}
+    for payload in payloads:
+        attrs = dict(iter_nl_attrs(payload, 4))  # skip the genlmsghdr
+        name = name or nl_string(attrs.get(WGDEVICE_A_IFNAME, b''))
+        if not name:
+            continue
+        iface = interfaces.setdefault(name, {'public_key': '', 'listen_port': 0,
+                                             'fwmark': 'off', 'peers': []})
+        if WGDEVICE_A_PUBLIC_KEY in attrs:
+            iface['public_key'] = base64.b64encode(attrs[WGDEVICE_A_PUBLIC_KEY]).decode()
+        if WGDEVICE_A_LISTEN_PORT in attrs:
+            iface['listen_port'], = struct.unpack('=H', attrs[WGDEVICE_A_LISTEN_PORT])
+        if WGDEVICE_A_FWMARK in attrs:
+            fwmark, = struct.unpack('=I', attrs[WGDEVICE_A_FWMARK])
+            iface['fwmark'] = f"0x{fwmark:x}" if fwmark else 'off'
+            
+        for _index, peer_data in iter_nl_attrs(attrs.get(WGDEVICE_A_PEERS, b'')):
+            peer_attrs = dict(iter_nl_attrs(peer_data))
+            public_key = base64.b64encode(peer_attrs.get(WGPEER_A_PUBLIC_KEY, b'')).decode()
+            allowed_ips = []
+            for _index, ip_data in iter_nl_attrs(peer_attrs.get(WGPEER_A_ALLOWEDIPS, b'')):
+                ip_attrs = dict(iter_nl_attrs(ip_data))
+                family, = struct.unpack('=H', ip_attrs[WGALLOWEDIP_A_FAMILY])
+                address = socket.inet_ntop(family, ip_attrs[WGALLOWEDIP_A_IPADDR])
+                allowed_ips.append(f"{address}/{ip_attrs[WGALLOWEDIP_A_CIDR_MASK][0]}")
+                
+            peers = iface['peers']
+            if peers and peers[-1]['public_key'] == public_key and len(peer_attrs) <= 2:
+                peers[-1]['allowed_ips'].extend(allowed_ips)
+                continue
+                
+            handshake = 0
+            if WGPEER_A_LAST_HANDSHAKE_TIME in peer_attrs:
+                handshake, _nsec = struct.unpack('=qq', peer_attrs[WGPEER_A_LAST_HANDSHAKE_TIME])
+            keepalive = 0
+            if WGPEER_A_PERSISTENT_KEEPALIVE_INTERVAL in peer_attrs:
+                keepalive, = struct.unpack('=H', peer_attrs[WGPEER_A_PERSISTENT_KEEPALIVE_INTERVAL])
+            peers.append({
+                'public_key': public_key,
+                'endpoint': format_sockaddr(peer_attrs.get(WGPEER_A_ENDPOINT, b'')),
+                'allowed_ips': allowed_ips,
+                'latest_handshake': handshake,
+                'rx': struct.unpack('=Q', peer_attrs[WGPEER_A_RX_BYTES])[0] if WGPEER_A_RX_BYTES in peer_attrs else 0,
+                'tx': struct.unpack('=Q', peer_attrs[WGPEER_A_TX_BYTES])[0] if WGPEER_A_TX_BYTES in peer_attrs else 0,
+                'keepalive': keepalive,
+            })
+    return interfaces
+
+def parse_wg_dump(output):
+    """Parse `wg show all dump` output into a per-interface/per-peer snapshot"""
+    interfaces = {}
+    for line in output.splitlines():
+        parts = line.split('\t')
+        if len(parts) == 5:
+            # <interface> <private-key> <public-key> <listen-port> <fwmark>
+            name, _private_key, public_key, listen_port, fwmark = parts
+            interfaces[name] = {
+                'public_key': public_key,
+                'listen_port': int(listen_port) if listen_port.isdigit() else 0,
+                'fwmark': fwmark,
+                'peers': [],
+            }
+        elif len(parts) == 9:
+            # <interface> <public-key> <preshared-key> <endpoint> <allowed-ips>
+            # <latest-handshake> <transfer-rx> <transfer-tx> <persistent-keepalive>
+            name = parts[0]
+            if name not in interfaces:
+                continue
+            interfaces[name]['peers'].append({
+                'public_key': parts[1],
+                'endpoint': None if parts[3] == '(none)' else parts[3],
+                'allowed_ips': [] if parts[4] == '(none)' else parts[4].split(','),
+                'latest_handshake': int(parts[5]),
+                'rx': int(parts[6]),
+                'tx': int(parts[7]),
+                'keepalive': int(parts[8]) if parts[8].isdigit() else 0,
+            })
+    return interfaces
+
+class ConfigLine:
+    """One line of a config, kept verbatim so the file round-trips"""
+    __slots__ = ('text', 'kind', 'key', 'value')
+    
+    def __init__(self, text):
+        self.text = text
+        content = text.split('#', 1)[0].strip()
+        self.key = self.value = None
+        if not content:
+            self.kind = 'blank'
+        elif content.startswith('[') and content.endswith(']'):
+            self.kind = 'section'
+            self.value = content[1:-1].strip()
+        elif '=' in content:
+            self.kind = 'pair'
+            key, value = content.split('=', 1)
+            self.key, self.value = key.strip(), value.strip()
+        else:
+            self.kind = 'invalid'
+            
+    @property
+    def comment(self):
+        """Trailing '# ...' of the line, or ''"""
+        return self.text[self.text.index('#'):] if '#' in self.text else ''
+
+class ConfigSection:
+    """A [Interface] or [Peer] block with the lines up to the next header
+    
+    Lines before the first header form a section named None.
+    """
+    __slots__ = ('name', 'lines')
+    
+    def __init__(self, lines):
+        self.lines = lines
+        self.name = lines[0].value if lines and lines[0].kind == 'section' else None
+        
+    def get(self, key, default=None):
+        """Value of the last `key = ...` line (keys are case-insensitive)"""
+        key = key.lower()
+        for line in reversed(self.lines):
+            if line.kind == 'pair' and line.key.lower() == key:
+                return line.value
+        return default
+    
+    def get_list(self, key):
+        """Comma separated values of all `key = ...` lines (Address, AllowedIPs, DNS)"""
+        key = key.lower()
+        return [item.strip() for line in self.lines
+                if line.kind == 'pair' and line.key.lower() == key
+                for item in line.value.split(',') if item.strip()]
+    
+    def set(self, key, value):
+        """Change the last `key = ...` line, or add one after the last non-blank line
+        
+        Comments and CRLF line endings are kept.
+        """
+        for line in reversed(self.lines):
+            if line.kind == 'pair' and line.key.lower() == key.lower():
+                cr = '\r' if line.text.endswith('\r') else ''
+                comment = line.comment.rstrip('\r')
+                line.text = f"{line.key} = {value}" + (f" {comment}" if comment else '') + cr
+                line.value = value
+                return
+        cr = '\r' if self.lines[0].text.endswith('\r') else ''
+        index = len(self.lines)
+        while index > 1 and self.lines[index - 1].kind == 'blank':
+            index -= 1
+        self.lines.insert(index, ConfigLine(f"{key} = {value}{cr}"))
+
+class WgConfig:
+    """Parsed wg-quick config, to_text() returns the original text unless changed"""
+    def __init__(self, sections):
+        self.sections = sections
+        
+    @property
+    def interface(self):
+        for section in self.sections:
+            if section.name == 'Interface':
+                return section
+        return None
+    
+    @property
+    def peers(self):
+        return [section for section in self.sections if section.name == 'Peer']
+    
+    def to_text(self):
+        return '\n'.join(line.text for section in self.sections for line in section.lines)
+
+SECTION_START = re.compile(r'\n[ \t]*\[')
+
+def split_config_sections(text):
+    """Split config text into per-section chunks, '\\n'.join() gives the text back"""
+    chunks = []
+    start = 0
+    for match in SECTION_START.finditer(text):
+        chunks.append(text[start:match.start()])
+        start = match.start() + 1
+    chunks.append(text[start:])
+    return chunks
+
+def parse_config(text):
+    """Parse a wg-quick config into a WgConfig (never raises, see validate_config)"""
+    return WgConfig([ConfigSection([ConfigLine(line) for line in chunk.split('\n')])
+                     for chunk in split_config_sections(text)])
+
+class ConfigIssue:
+    """A problem found in a config, line numbers start at 1"""
+    __slots__ = ('line', 'severity', 'message')
+    
+    def __init__(self, line, severity, message):
+        self.line = line
+        self.severity = severity
+        self.message = message
+        
+    def __str__(self):
+        return f"line {self.line}: {self.message}"
+    
+    def __repr__(self):
+        return f"ConfigIssue({self.line}, {self.severity!r}, {self.message!r})"
+
+HOSTNAME = re.compile(r'^(?=.{1,253}$)([a-zA-Z0-9_]([a-zA-Z0-9_-]{0,61}[a-zA-Z0-9_])?\.)*'
+                      r'[a-zA-Z0-9_]([a-zA-Z0-9_-]{0,61}[a-zA-Z0-9_])?\.?$')
+
+def check_key(value):
+    """Error message for a bad base64 Curve25519 key, or None"""
+    if len(value) != 44:
+        return "key must be 44 base64 characters"
+    try:
+        if len(base64.b64decode(value, validate=True)) == 32:
+            return None
+    except ValueError:
+        pass
+    return "key is not valid base64 of 32 bytes"
+
+def check_port(value):
+    if not value.isdigit() or not 0 <= int(value) <= 65535:
+        return "port must be a number from 0 to 65535"
+    return None
+
+def check_endpoint(value):
+    """Error message for a bad host:port, or None"""
+    import ipaddress
+    if value.startswith('['):
+        host, sep, port = value[1:].partition(']:')
+        if not sep:
+            return "IPv6 endpoint must look like [address]:port"
+        try:
+            ipaddress.IPv6Address(host)
+        except ValueError:
+            return f"invalid IPv6 address {host!r}"
+    else:
+        host, sep, port = value.rpartition(':')
+        if not sep or not host:
+            return "endpoint must be host:port"
+        if ':' in host:
+            return "IPv6 endpoints need brackets: [address]:port"
+        if not HOSTNAME.match(host):
+            return f"invalid host {host!r}"
+    if not port.isdigit() or not 1 <= int(port) <= 65535:
+        return "endpoint port must be a number from 1 to 65535"
+    return None
+
+def check_number(low, high):
+    def check(value):
+        if not value.isdigit() or not low <= int(value) <= high:
+            return f"must be a number from {low} to {high}"
+        return None
+    return check
+
+def check_keepalive(value):
+    return None if value == 'off' else check_number(0, 65535)(value)
+
+def check_dns(value):
+    import ipaddress
+    for item in (i.strip() for i in value.split(',')):
+        try:
+            ipaddress.ip_address(item)
+        except ValueError:
+            if not HOSTNAME.match(item):
+                return f"invalid DNS server or search domain {item!r}"
+    return None
+
+def check_addresses(value):
+    import ipaddress
+    for item in (i.strip() for i in value.split(',')):
+        try:
+            ipaddress.ip_interface(item)
+        except ValueError:
+            return f"invalid address {item!r}"
+    return None
+
+def check_allowed_ips(value):
+    import ipaddress
+    for item in (i.strip() for i in value.split(',') if i.strip()):
+        try:
+            ipaddress.ip_network(item)
+        except ValueError:
+            try:
+                network = ipaddress.ip_network(item, strict=False)
+            except ValueError:
+                return f"invalid CIDR {item!r}"
+            return f"{item} has host bits set, did you mean {network}?"
+    return None
+
+def check_any(value):
+    return None
+
+# Known keys per section: lowercase key -> (validator, may repeat)
+CONFIG_KEYS = {
+    'Interface': {
+        'privatekey': (check_key, False),
+        'address': (check_addresses, True),
+        'listenport': (check_port, False),
+        'dns': (check_dns, True),
+        'mtu': (check_number(576, 65535), False),
+        'table': (check_any, False),
+        'fwmark': (check_any, False),
+        'saveconfig': (check_any, False),
+        'preup': (check_any, True),
+        'postup': (check_any, True),
+        'predown': (check_any, True),
+        'postdown': (check_any, True),
+    },
+    'Peer': {
+        'publickey': (check_key, False),
+        'presharedkey': (check_key, False),
+        'allowedips': (check_allowed_ips, True),
+        'endpoint': (check_endpoint, False),
+        'persistentkeepalive': (check_keepalive, False),
+    },
+}
+REQUIRED_KEYS = {'Interface': ('PrivateKey',), 'Peer': ('PublicKey',)}
+
+def validate_section(chunk):
+    """Check one section on its own
+    
+    Returns (name, issues, public_key, allowed_ips) with line numbers
+    relative to the section and networks normalized; cross-section checks
+    use the last two.
+    """
+    import ipaddress
+    section = ConfigSection([ConfigLine(line) for line in chunk.split('\n')])
+    issues = []
+    keys = CONFIG_KEYS.get(section.name)
+    if section.name is not None and keys is None:
+        issues.append(ConfigIssue(0, 'error', f"unknown section [{section.name}]"))
+    seen = set()
+    allowed_ips = []
+    for number, line in enumerate(section.lines):
+        if line.kind == 'invalid':
+            issues.append(ConfigIssue(number, 'error', "expected 'Key = Value' or '[Section]'"))
+        elif line.kind == 'pair':
+            if section.name is None:
+                issues.append(ConfigIssue(number, 'error', f"{line.key} is outside of a section"))
+                continue
+            if keys is None:
+                continue
+            key = line.key.lower()
+            if key not in keys:
+                issues.append(ConfigIssue(number, 'warning',
+                                          f"unknown key {line.key} in [{section.name}]"))
+                continue
+            check, repeatable = keys[key]
+            if key in seen and not repeatable:
+                issues.append(ConfigIssue(number, 'error', f"{line.key} is set twice"))
+            seen.add(key)
+            message = check(line.value)
+            if message:
+                issues.append(ConfigIssue(number, 'error', f"{line.key}: {message}"))
+            elif key == 'allowedips':
+                allowed_ips.extend((str(ipaddress.ip_network(item.strip())), number)
+                                   for item in line.value.split(',') if item.strip())
+    for key in REQUIRED_KEYS.get(section.name, ()):
+        if key.lower() not in seen:
+            issues.append(ConfigIssue(0, 'error', f"[{section.name}] needs {key}"))
+    return section.name, issues, section.get('PublicKey'), allowed_ips
+
+class ConfigValidator:
+    """Validates config text, re-checking only sections that changed
+    
+    Results are cached by section text, so while typing only the edited
+    section is parsed again; the cross-peer checks are dictionary lookups.
+    """
+    MAX_CACHED = 4096
+    
+    def __init__(self):
+        self.cache = {}
+        
+    def validate(self, text):
+        """Return a list of ConfigIssue sorted by line"""
+        issues = []
+        interfaces = 0
+        public_keys = {}
+        networks = {}
+        line = 1
+        if len(self.cache) > self.MAX_CACHED:
+            self.cache.clear()
+        for chunk in split_config_sections(text):
+            result = self.cache.get(chunk)
+            if result is None:
+                result = self.cache[chunk] = validate_section(chunk)
+            name, section_issues, public_key, allowed_ips = result
+            issues.extend(ConfigIssue(line + i.line, i.severity, i.message)
+                          for i in section_issues)
+            if name == 'Interface':
+                interfaces += 1
+                if interfaces == 2:
+                    issues.append(ConfigIssue(line, 'error', "more than one [Interface]"))
+            elif name == 'Peer':
+                if public_key:
+                    if public_key in public_keys:
+                        issues.append(ConfigIssue(line, 'error', "PublicKey also used by "
+                                                  f"the peer on line {public_keys[public_key]}"))
+                    public_keys.setdefault(public_key, line)
+                for network, number in allowed_ips:
+                    first = networks.setdefault(network, line + number)
+                    if first != line + number:
+                        issues.append(ConfigIssue(line + number, 'error',
+                                                  f"AllowedIPs {network} is also routed to "
+                                                  f"the peer on line {first}"))
+            line += chunk.count('\n') + 1
+        if not interfaces:
+            issues.append(ConfigIssue(1, 'error', "missing [Interface] section"))
+        issues.sort(key=lambda issue: issue.line)
+        return issues
+
+def validate_config(text):
+    """List of ConfigIssue for a config text, empty when it is fine"""
+    return ConfigValidator().validate(text)
+
+def config_errors(issues):
+    return [issue for issue in issues if issue.severity == 'error']
+
+# Commands wg-quick runs as root on up/down, lowercase key -> name
+HOOK_KEYS = {'preup': 'PreUp', 'postup': 'PostUp', 'predown': 'PreDown', 'postdown': 'PostDown'}
+
+def config_hooks(text):
+    """The hook commands of a config as [(lowercase key, command)]"""
+    return [(line.key.lower(), line.value) for line in map(ConfigLine, text.split('\n'))
+            if line.kind == 'pair' and line.key.lower() in HOOK_KEYS]
+
+class ConfigCache:
+    """Config text and parsed config per tunnel, re-read only when stat() changes
+    
+    Files are accessed through a tunnel ops object (LocalTunnelOps or
+    HelperClient), so the cache works the same with or without root.
+    """
+    def __init__(self, ops):
+        self.ops = ops
+        self.entries = {}
+        # Called with the tunnel (None: all) whenever a config may have changed
+        self.listeners = []
+        
+    def get(self, tunnel_name):
+        """Return (text, WgConfig) of a tunnel config, raises OSError like open()"""
+        signature = self.ops.stat(tunnel_name)
+        entry = self.entries.get(tunnel_name)
+        if entry is None or entry[0] != signature:
+            if entry is not None:
+                self.notify(tunnel_name)
+            text = self.ops.read(tunnel_name)
+            entry = (signature, text, parse_config(text))
+            self.entries[tunnel_name] = entry
+        return entry[1], entry[2]
+    
+    def invalidate(self, tunnel_name=None):
+        """Forget a tunnel (or everything), e.g. after WireGUI wrote it"""
+        if tunnel_name is None:
+            self.entries.clear()
+        else:
+            self.entries.pop(tunnel_name, None)
+        self.notify(tunnel_name)
+        
+    def notify(self, tunnel_name):
+        for listener in self.listeners:
+            listener(tunnel_name)
+
+class Overlap:
+    """Two tunnels route overlapping AllowedIPs
+    
+    network (of tunnel/peer) equals or lies inside other_network; with
+    both tunnels up the more specific route wins, equal routes collide.
+    """
+    __slots__ = ('tunnel', 'peer', 'network', 'other_tunnel', 'other_peer', 'other_network')
+    
+    def __init__(self, tunnel, peer, network, other_tunnel, other_peer, other_network):
+        self.tunnel = tunnel
+        self.peer = peer
+        self.network = network
+        self.other_tunnel = other_tunnel
+        self.other_peer = other_peer
+        self.other_network = other_network
+        
+    @property
+    def same(self):
+        return self.network == self.other_network
+    
+    def describe(self, tunnel_name):
+        """One line seen from tunnel_name, which is one of the two tunnels"""
+        if self.same:
+            other = self.other_tunnel if tunnel_name == self.tunnel else self.tunnel
+            return f"{self.network} is also routed by {other}"
+        if tunnel_name == self.tunnel:
+            return (f"{self.network} takes traffic of {self.other_network} "
+                    f"from {self.other_tunnel} while both are up")
+        return (f"{self.network} of {self.tunnel} shadows part of {self.other_network} "
+                f"while both are up")
+
+class PrefixTrie:
+    """Binary trie of IP prefixes, one per address family
+    
+    A node is [child0, child1, owners]; finding everything that covers a
+    prefix walks at most 32 (or 128) nodes, independent of how many
+    prefixes are stored.
+    """
+    def __init__(self):
+        self.roots = {4: [None, None, []], 6: [None, None, []]}
+        
+    @staticmethod
+    def path(network):
+        """Prefix bits as a string of '0'/'1', the walk from the root"""
+        return format(int(network.network_address),
+                      f'0{network.max_prefixlen}b')[:network.prefixlen]
+    
+    def insert(self, network, owner):
+        node = self.roots[network.version]
+        for bit in self.path(network):
+            child = node[bit == '1']
+            if child is None:
+                child = node[bit == '1'] = [None, None, []]
+            node = child
+        node[2].append((network, owner))
+        
+    def covering(self, network):
+        """(network, owner) of all stored prefixes equal to or containing network"""
+        node = self.roots[network.version]
+        found = list(node[2])
+        for bit in self.path(network):
+            node = node[bit == '1']
+            if node is None:
+                break
+            if node[2]:
+                found.extend(node[2])
+        return found
+
+def config_prefixes(tunnel_name, config):
+    """(network, tunnel, peer) for every AllowedIPs entry of a WgConfig"""
+    import ipaddress
+    for number, peer in enumerate(config.peers, 1):
+        public_key = peer.get('PublicKey')
+        label = f"{public_key[:8]}…" if public_key else f"peer {number}"
+        for item in peer.get_list('AllowedIPs'):
+            try:
+                network = ipaddress.ip_network(item, strict=False)
+            except ValueError:
+                continue  # reported by the validator
+            yield network, tunnel_name, label
+
+def find_overlaps(prefixes):
+    """Overlaps between different tunnels among (network, tunnel, peer) entries
+    
+    Every prefix is inserted into a PrefixTrie, then each one looks up the
+    prefixes covering it: O(n * address bits) instead of comparing all pairs.
+    Each overlapping pair is reported once.
+    """
+    prefixes = list(prefixes)
+    trie = PrefixTrie()
+    for network, tunnel, peer in prefixes:
+        trie.insert(network, (tunnel, peer))
+    overlaps = []
+    seen = set()
+    for network, tunnel, peer in prefixes:
+        for other_network, (other_tunnel, other_peer) in trie.covering(network):
+            if other_tunnel == tunnel:
+                continue
+            # One report per pair of tunnels and prefixes, equal prefixes
+            # are found from both sides
+            if other_network == network:
+                key = (network, *sorted((tunnel, other_tunnel)))
+            else:
+                key = (network, tunnel, other_network, other_tunnel)
+            if key in seen:
+                continue
+            seen.add(key)
+            overlaps.append(Overlap(tunnel, peer, network, other_tunnel, other_peer,
+                                    other_network))
+    return overlaps
+
+class OverlapAnalyzer:
+    """AllowedIPs overlaps between all tunnels, kept up to date from config changes
+    
+    The prefixes of every config are read once and again only after the
+    ConfigCache reported that config as changed. analyze() does that file
+    access (through the helper, if any), so the GUI runs it in the
+    background after changes; overlaps() only looks up the last result.
+    """
+    def __init__(self, cache):
+        self.cache = cache
+        self.lock = threading.Lock()
+        self.prefixes = {}  # tunnel -> [(network, tunnel, peer)]
+        self.version = 0
+        self.changed = {}  # tunnel -> version when it was last invalidated
+        self.invalidated_all = 0  # version of the last invalidate(None)
+        self.by_tunnel = {}
+        cache.listeners.append(self.invalidate)
+        
+    def invalidate(self, tunnel_name=None):
+        """A config changed (None: maybe all of them)"""
+        with self.lock:
+            self.version += 1
+            if tunnel_name is None:
+                self.prefixes.clear()
+                self.invalidated_all = self.version
+            else:
+                self.prefixes.pop(tunnel_name, None)
+                self.changed[tunnel_name] = self.version
+                
+    def analyze(self, tunnel_names):
+        """Recompute the overlaps of the given tunnels, reads only changed configs
+        
+        Safe to run in a worker thread. Returns False if a config changed
+        while it ran, then it should be run again.
+        """
+        with self.lock:
+            version = self.version
+            missing = [name for name in tunnel_names if name not in self.prefixes]
+        read = {}
+        for tunnel_name in missing:
+            try:
+                config = parse_config(self.cache.ops.read(tunnel_name))
+            except (OSError, ValueError):
+                config = parse_config('')
+            read[tunnel_name] = list(config_prefixes(tunnel_name, config))
+        with self.lock:
+            for tunnel_name, prefixes in read.items():
+                # Not if it changed again since it was read
+                if max(self.changed.get(tunnel_name, 0), self.invalidated_all) <= version:
+                    self.prefixes[tunnel_name] = prefixes
+            for tunnel_name in self.prefixes.keys() - set(tunnel_names):
+                del self.prefixes[tunnel_name]
+            prefixes = [prefix for tunnel_name in tunnel_names
+                        for prefix in self.prefixes.get(tunnel_name, ())]
+            current = self.version == version
+        by_tunnel = {}
+        for overlap in find_overlaps(prefixes):
+            by_tunnel.setdefault(overlap.tunnel, []).append(overlap)
+            by_tunnel.setdefault(overlap.other_tunnel, []).append(overlap)
+        self.by_tunnel = by_tunnel
+        return current
+    
+    def overlaps(self, tunnel_name, among=None):
+        """Overlaps of one tunnel (last analysis), optionally only with the tunnels in among"""
+        result = self.by_tunnel.get(tunnel_name, [])
+        if among is not None:
+            result = [o for o in result
+                      if (o.other_tunnel if o.tunnel == tunnel_name else o.tunnel) in among]
+        return result
+
+def format_bytes(bytes_val):
+    """Format bytes to human readable"""
+    for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
+        if bytes_val < 1024.0:
+            return f"{bytes_val:.2f} {unit}"
+        bytes_val /= 1024.0
+    return f"{bytes_val:.2f} PB"
+
+class RingBuffer:
+    """Fixed-size history of floats in a preallocated array"""
+    def __init__(self, size):
+        self.size = size
+        self.data = array('d', bytes(8 * size))
+        self.next = 0
+        self.count = 0
+        
+    def append(self, value):
+        self.data[self.next] = value
+        self.next = (self.next + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+        
+    def values(self):
+        """Stored values, oldest first"""
+        start = (self.next - self.count) % self.size
+        if start + self.count <= self.size:
+            return self.data[start:start + self.count].tolist()
+        return (self.data[start:] + self.data[:self.next]).tolist()
+    
+    def last(self):
+        return self.data[self.next - 1] if self.count else 0.0
+
+class PeerRate:
+    """Last counters and rate history of one peer"""
+    __slots__ = ('endpoint', 'last_time', 'last_rx', 'last_tx', 'rx_rates', 'tx_rates')
+    
+    def __init__(self, history):
+        self.endpoint = None
+        self.last_time = None
+        self.last_rx = 0
+        self.last_tx = 0
+        self.rx_rates = RingBuffer(history)
+        self.tx_rates = RingBuffer(history)
+
+class ThroughputTracker:
+    """Per-interface, per-peer rx/tx rates (bytes/s) from successive snapshots
+    
+    The first sighting of a peer is only its baseline, whatever its counters
+    hold is history from before we saw it. A counter that went backwards
+    means the interface was restarted, the new value then counts as the
+    delta. Peers and interfaces that disappear are dropped, so memory is
+    bounded by what is currently up.
+    """
+    def __init__(self, history=120):
+        self.history = history
+        self.peers = {}
+        
+    def reset(self):
+        """Forget all baselines, e.g. when the status backend changed"""
+        self.peers.clear()
+        
+    def update(self, interfaces, now=None):
+        """Take a snapshot, returns {interface: (rx_delta, tx_delta)} in bytes"""
+        now = time.monotonic() if now is None else now
+        seen = set()
+        deltas = {}
+        for iface, info in interfaces.items():
+            iface_rx = iface_tx = 0
+            for peer in info['peers']:
+                key = (iface, peer['public_key'])
+                seen.add(key)
+                state = self.peers.get(key)
+                if state is None:
+                    state = self.peers[key] = PeerRate(self.history)
+                state.endpoint = peer['endpoint']
+                if state.last_time is not None and now > state.last_time:
+                    elapsed = now - state.last_time
+                    rx_delta = peer['rx'] - state.last_rx
+                    tx_delta = peer['tx'] - state.last_tx
+                    # Counter reset: the interface was restarted
+                    if rx_delta < 0:
+                        rx_delta = peer['rx']
+                    if tx_delta < 0:
+                        tx_delta = peer['tx']
+                    state.rx_rates.append(rx_delta / elapsed)
+                    state.tx_rates.append(tx_delta / elapsed)
+                    iface_rx += rx_delta
+                    iface_tx += tx_delta
+                state.last_time = now
+                state.last_rx = peer['rx']
+                state.last_tx = peer['tx']
+            if iface_rx or iface_tx:
+                deltas[iface] = (iface_rx, iface_tx)
+        for key in self.peers.keys() - seen:
+            del self.peers[key]
+        return deltas
+        
+    def rates(self, iface):
+        """[(public_key, PeerRate)] of an interface, busiest peer first"""
+        peers = [(key[1], state) for key, state in self.peers.items() if key[0] == iface]
+        peers.sort(key=lambda item: item[1].rx_rates.last() + item[1].tx_rates.last(),
+                   reverse=True)
+        return peers
+
+# WireGuard starts a new handshake when sending over an older session
+REKEY_AFTER_TIME = 120
+
+class TunnelHealth:
+    """Handshake state of one active tunnel"""
+    __slots__ = ('name', 'up_since', 'stale_peers', 'peers', 'state', 'sent')
+    
+    def __init__(self, name, now):
+        self.name = name
+        self.up_since = now
+        self.stale_peers = []
+        self.peers = 0
+        self.state = 'healthy'
+        # public key -> (handshake, tx once that session needed a rekey)
+        self.sent = {}
+
+class HealthMonitor:
+    """Flags tunnels whose peers stopped handshaking, and paces restarts
+    
+    Only peers with an Endpoint are judged: WireGuard re-handshakes every
+    2 minutes while traffic flows, so a handshake older than stale_after
+    (or none at all stale_after seconds after the tunnel came up) means
+    the peer is unreachable. That holds for peers with a persistent
+    keepalive; one without is left alone while idle and only judged once
+    it sent over a session old enough to need a new handshake. A tunnel
+    is 'stale' when all judged peers are, 'degraded' when some are.
+    
+    Restarts of a tunnel are spaced with exponential backoff (backoff,
+    2 * backoff, ... up to max_backoff) and all tunnels together get at
+    most max_restarts per restart_window seconds.
+    """
+    def __init__(self, stale_after=180, backoff=60, max_backoff=3600,
+                 max_restarts=5, restart_window=600):
+        self.stale_after = stale_after
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_restarts = max_restarts
+        self.restart_window = restart_window
+        self.tunnels = {}
+        # name -> (attempts, next allowed restart), kept while the
+        # interface is gone during a restart, cleared once healthy
+        self.backoffs = {}
+        self.restart_times = []
+        
+    def update(self, interfaces, now=None):
+        """Judge a status snapshot, returns [(name, old_state, new_state)] for changes
+        
+        new_state is None for unhealthy tunnels that went down.
+        """
+        now = time.time() if now is None else now
+        changes = []
+        for name in self.tunnels.keys() - interfaces.keys():
+            state = self.tunnels.pop(name).state
+            if state != 'healthy':
+                changes.append((name, state, None))
+        if not self.stale_after:
+            return changes
+        for name, iface in interfaces.items():
+            health = self.tunnels.get(name)
+            if health is None:
+                health = self.tunnels[name] = TunnelHealth(name, now)
+            judged = [peer for peer in iface['peers'] if peer['endpoint']]
+            health.peers = len(judged)
+            health.stale_peers = [peer for peer in judged
+                                  if self.peer_stale(peer, health, now)]
+            for key in health.sent.keys() - {peer['public_key'] for peer in judged}:
+                del health.sent[key]
+            if not health.stale_peers:
+                state = 'healthy'
+                # Only a real handshake proves a restart helped, not the grace period
+                if all(peer['latest_handshake'] for peer in judged):
+                    self.backoffs.pop(name, None)
+            elif len(health.stale_peers) == len(judged):
+                state = 'stale'
+            else:
+                state = 'degraded'
+            if state != health.state:
+                changes.append((name, health.state, state))
+                health.state = state
+        return changes
+    
+    def peer_stale(self, peer, health, now):
+        handshake = peer['latest_handshake']
+        if not peer['keepalive']:
+            # An idle peer never handshakes, only traffic that needed a
+            # rekey must have brought a new handshake by now
+            mark = health.sent.get(peer['public_key'])
+            if mark is None or mark[0] != handshake:
+                if handshake and now - handshake < REKEY_AFTER_TIME:
+                    return False
+                mark = health.sent[peer['public_key']] = (handshake, peer['tx'])
+            if peer['tx'] <= mark[1]:
+                return False
+        if handshake:
+            return now - handshake > self.stale_after
+        return now - health.up_since > self.stale_after
+    
+    def state(self, name):
+        health = self.tunnels.get(name)
+        return health.state if health else None
+    
+    def due_restarts(self, now=None):
+        """Stale tunnels whose backoff has passed, within the global limit"""
+        now = time.time() if now is None else now
+        self.restart_times = [t for t in self.restart_times if now - t < self.restart_window]
+        budget = self.max_restarts - len(self.restart_times)
+        due = [health.name for health in self.tunnels.values()
+               if health.state == 'stale' and now >= self.backoffs.get(health.name, (0, 0))[1]]
+        return sorted(due)[:max(budget, 0)]
+    
+    def restarted(self, name, now=None):
+        """Note a restart: start the backoff and a fresh grace period"""
+        now = time.time() if now is None else now
+        self.restart_times.append(now)
+        attempts = self.backoffs.get(name, (0, 0))[0] + 1
+        delay = min(self.backoff * 2 ** (attempts - 1), self.max_backoff)
+        self.backoffs[name] = (attempts, now + delay)
+        if name in self.tunnels:
+            self.tunnels[name].up_since = now
+        return delay
+
+def state_dir():
+    """Per-user state directory of WireGUI (XDG_STATE_HOME)"""
+    base = os.environ.get('XDG_STATE_HOME') or os.path.expanduser('~/.local/state')
+    return os.path.join(base, 'wiregui')
+
+def interface_index(name):
+    """Kernel ifindex of an interface, or None if it does not exist"""
+    try:
+        return socket.if_nametoindex(name)
+    except OSError:
+        return None
+
+class UptimeTracker:
+    """When each active tunnel came up, kept per interface instance
+    
+    Records are keyed by (name, ifindex): the kernel hands out a new index
+    every time wg-quick creates the interface, so a known key means the
+    same interface is still up, also across GUI restarts (the records are
+    saved as JSON). An interface that was already up when first seen gets
+    the time it was seen and exact=False; one seen appearing (link event
+    or between two polls) is exact.
+    """
+    def __init__(self, path=None, ifindex=interface_index):
+        self.path = path or os.path.join(state_dir(), 'uptime.json')
+        self.ifindex = ifindex
+        self.records = {}
+        self.polled = False
+        try:
+            with open(self.path, 'r') as f:
+                self.records = {name: (int(index), float(since), bool(exact))
+                                for name, (index, since, exact) in json.load(f).items()}
+        except (OSError, ValueError, TypeError):
+            pass
+        
+    def update(self, interfaces, now=None):
+        """Apply the snapshot of a successful status poll
+        
+        A tunnel missing from it is only forgotten once its interface is
+        gone or was recreated, a partial snapshot keeps its start time.
+        """
+        now = time.time() if now is None else now
+        changed = False
+        for name in self.records.keys() - interfaces.keys():
+            if self.ifindex(name) != self.records[name][0]:
+                del self.records[name]
+                changed = True
+        for name in interfaces:
+            changed |= self.seen(name, now, exact=self.polled)
+        self.polled = True
+        if changed:
+            self.save()
+            
+    def link_event(self, name, present, now=None):
+        """An interface appeared or disappeared (rtnetlink / ip monitor)"""
+        now = time.time() if now is None else now
+        if present:
+            changed = self.seen(name, now, exact=True)
+        else:
+            changed = self.records.pop(name, None) is not None
+        if changed:
+            self.save()
+            
+    def seen(self, name, now, exact):
+        index = self.ifindex(name)
+        record = self.records.get(name)
+        if index is None or (record and record[0] == index):
+            return False
+        self.records[name] = (index, now, exact)
+        return True
+    
+    def since(self, name):
+        """(start time, exact) of an active tunnel, or None"""
+        record = self.records.get(name)
+        return (record[1], record[2]) if record else None
+    
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), mode=0o700, exist_ok=True)
+            atomic_write(self.path, json.dumps(self.records))
+        except OSError:
+            pass  # uptime is a convenience, never fail a status update for it
+
+def data_dir():
+    """Per-user data directory of WireGUI (XDG_DATA_HOME)"""
+    base = os.environ.get('XDG_DATA_HOME') or os.path.expanduser('~/.local/share')
+    return os.path.join(base, 'wiregui')
+
+class TrafficStore:
+    """Persistent per-tunnel traffic totals in SQLite (WAL)
+    
+    Byte deltas are buffered in memory and written once per flush() into
+    minute, hour and day buckets. Minute buckets are kept for two days and
+    hour buckets for 90 days, day buckets forever. Day buckets start at
+    local midnight, so month totals match the calendar.
+    """
+    RETENTION = {60: 2 * 86400, 3600: 90 * 86400}
+    
+    def __init__(self, path=None):
+        self.path = path or os.path.join(data_dir(), 'traffic.db')
+        import sqlite3  # only with traffic accounting
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.execute("PRAGMA synchronous = NORMAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS traffic (
+                tunnel TEXT NOT NULL,
+                resolution INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                rx INTEGER NOT NULL,
+                tx INTEGER NOT NULL,
+                PRIMARY KEY (tunnel, resolution, bucket)
+            ) WITHOUT ROWID""")
+        self.db.commit()
+        self.pending = {}
+        self.last_compaction = 0
+        
+    @staticmethod
+    def day_start(timestamp):
+        """Local midnight of the day containing timestamp"""
+        return int(datetime.fromtimestamp(timestamp).replace(
+            hour=0, minute=0, second=0, microsecond=0).timestamp())
+    
+    def add(self, tunnel, rx, tx, now=None):
+        """Buffer transferred bytes, nothing is written until flush()"""
+        now = int(time.time() if now is None else now)
+        key = (tunnel, now - now % 60)
+        counts = self.pending.setdefault(key, [0, 0])
+        counts[0] += rx
+        counts[1] += tx
+        
+    def flush(self, now=None):
+        """Write the buffered deltas in one transaction and apply retention"""
+        now = int(time.time() if now is None else now)
+        if self.pending:
+            rows = []
+            for (tunnel, minute), (rx, tx) in self.pending.items():
+                rows.append((tunnel, 60, minute, rx, tx))
+                rows.append((tunnel, 3600, minute - minute % 3600, rx, tx))
+                rows.append((tunnel, 86400, self.day_start(minute), rx, tx))
+            with self.db:
+                self.db.executemany("""
+                    INSERT INTO traffic (tunnel, resolution, bucket, rx, tx)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (tunnel, resolution, bucket)
+                    DO UPDATE SET rx = rx + excluded.rx, tx = tx + excluded.tx""", rows)
+            self.pending = {}
+        if now - self.last_compaction >= 3600:
+            self.compact(now)
+            
+    def compact(self, now=None):
+        """Drop expired fine-grained buckets and give the space back"""
+        now = int(time.time() if now is None else now)
+        with self.db:
+            for resolution, keep in self.RETENTION.items():
+                self.db.execute("DELETE FROM traffic WHERE resolution = ? AND bucket < ?",
+                                (resolution, now - keep))
+        self.db.execute("PRAGMA incremental_vacuum")
+        self.last_compaction = now
+        
+    def total(self, tunnel, since, now=None):
+        """(rx, tx) of a tunnel since a timestamp, to day precision"""
+        rx, tx = self.db.execute("""
+            SELECT COALESCE(SUM(rx), 0), COALESCE(SUM(tx), 0) FROM traffic
+            WHERE tunnel = ? AND resolution = 86400 AND bucket >= ?""",
+            (tunnel, self.day_start(since))).fetchone()
+        for (pending_tunnel, minute), counts in self.pending.items():
+            if pending_tunnel == tunnel and minute >= since:
+                rx += counts[0]
+                tx += counts[1]
+        return rx, tx
+    
+    def month_total(self, tunnel, now=None):
+        """(rx, tx) of a tunnel in the current calendar month"""
+        now = time.time() if now is None else now
+        month_start = datetime.fromtimestamp(now).replace(
+            day=1, hour=0, minute=0, second=0, microsecond=0).timestamp()
+        return self.total(tunnel, month_start)
+    
+    def close(self):
+        self.flush()
+        self.db.close()
+
+LOG_LEVELS = ('debug', 'info', 'warning', 'error')
+
+class LogRecord:
+    """One log entry"""
+    __slots__ = ('time', 'level', 'tunnel', 'message')
+    
+    def __init__(self, message, level='info', tunnel=None, timestamp=None):
+        self.time = time.time() if timestamp is None else timestamp
+        self.level = level
+        self.tunnel = tunnel
+        self.message = message
+        
+    def format(self):
+        return f"[{datetime.fromtimestamp(self.time):%H:%M:%S}] {self.message}"
+
+def log_level(message):
+    """Level of a message from its ✓/✗/⚠ prefix"""
+    if message.startswith('✗'):
+        return 'error'
+    if message.startswith('⚠'):
+        return 'warning'
+    return 'info'
+
+class LogBuffer:
+    """Fixed-size ring of LogRecords, the oldest is dropped when full
+    
+    Indexing is O(1) from the oldest (0) to the newest (len - 1) record.
+    """
+    def __init__(self, capacity=5000):
+        self.items = [None] * capacity
+        self.start = 0
+        self.count = 0
+        
+    def __len__(self):
+        return self.count
+    
+    def __getitem__(self, index):
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        return self.items[(self.start + index) % len(self.items)]
+    
+    @property
+    def full(self):
+        return self.count == len(self.items)
+    
+    def drop_oldest(self):
+        self.items[self.start] = None
+        self.start = (self.start + 1) % len(self.items)
+        self.count -= 1
+        
+    def append(self, record):
+        """Add a record, dropping the oldest one when full"""
+        if self.full:
+            self.drop_oldest()
+        self.items[(self.start + self.count) % len(self.items)] = record
+        self.count += 1
+
+class RotatingFileMirror:
+    """Copies log records to a size-limited file with a few rotated backups"""
+    def __init__(self, path, max_bytes=1 << 20, backups=3):
+        import logging.handlers  # only with a file mirror, slow to import
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.make_record = logging.makeLogRecord
+        self.handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes,
+                                                            backupCount=backups,
+                                                            encoding='utf-8')
+        self.handler.setFormatter(logging.Formatter('%(message)s'))
+        
+    def write(self, record):
+        tunnel = f" [{record.tunnel}]" if record.tunnel else ''
+        line = (f"{datetime.fromtimestamp(record.time):%Y-%m-%d %H:%M:%S} "
+                f"{record.level.upper()}{tunnel} {record.message}")
+        self.handler.emit(self.make_record({'msg': line}))
+        
+    def close(self):
+        self.handler.close()
+
+class JournalMirror:
+    """Sends log records to journald over its native socket protocol"""
+    SOCKET = '/run/systemd/journal/socket'
+    PRIORITIES = {'debug': 7, 'info': 6, 'warning': 4, 'error': 3}
+    
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.connect(self.SOCKET)
+        
+    @staticmethod
+    def field(name, value):
+        value = value.encode()
+        if b'\n' in value:
+            # Multi-line values are sent as name, 64-bit length, raw bytes
+            return name.encode() + b'\n' + struct.pack('<Q', len(value)) + value + b'\n'
+        return name.encode() + b'=' + value + b'\n'
+    
+    def write(self, record):
+        fields = [self.field('MESSAGE', record.message),
+                  self.field('PRIORITY', str(self.PRIORITIES.get(record.level, 6))),
+                  self.field('SYSLOG_IDENTIFIER', 'wiregui')]
+        if record.tunnel:
+            fields.append(self.field('WIREGUI_TUNNEL', record.tunnel))
+        try:
+            self.sock.send(b''.join(fields))
+        except OSError:
+            pass  # journald busy or restarting, the GUI log still has it
+        
+    def close(self):
+        self.sock.close()
+
+def open_log_mirror(kind, path=None):
+    """Mirror for 'file' or 'journald', None for 'off'; raises OSError"""
+    if kind == 'file':
+        return RotatingFileMirror(path or os.path.join(data_dir(), 'wiregui.log'))
+    if kind == 'journald':
+        return JournalMirror()
+    return None
+
+_spawns = 0
+_spawns_lock = threading.Lock()
+
+def spawn_count():
+    """Number of processes started through run_command so far"""
+    return _spawns
+
+def run_command(args, timeout=None):
+    """Run a command and return its CompletedProcess, never raises
+    
+    A command still running after timeout seconds is killed and reported
+    with returncode 124, like timeout(1) does.
+    """
+    global _spawns
+    with _spawns_lock:
+        _spawns += 1
+    try:
+        return subprocess.run(args, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return subprocess.CompletedProcess(args, 124, '', f"timed out after {timeout:g} s")
+    except Exception as e:
+        return subprocess.CompletedProcess(args, 1, '', str(e))
+
+class WgDumpBackend:
+    """Status backend that runs `wg show all dump`"""
+    name = 'wg'
+    
+    def __init__(self, runner=run_command):
+        self.runner = runner
+        
+    def poll(self):
+        result = self.runner(['wg', 'show', 'all', 'dump'])
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip() or f"wg exited with {result.returncode}")
+        return parse_wg_dump(result.stdout)
+    
+    def fallback(self):
+        return None
+
+class NetlinkBackend:
+    """Status backend that asks the kernel directly over (generic) netlink
+    
+    Interfaces are found with an RTM_GETLINK dump, then every WireGuard
+    interface is read with WG_CMD_GET_DEVICE. No process is spawned. The
+    sockets can be injected to replay recorded replies.
+    """
+    name = 'netlink'
+    
+    def __init__(self, route_socket=None, genl_socket=None):
+        self.route = route_socket or self.open_socket(NETLINK_ROUTE)
+        self.genl = genl_socket or self.open_socket(NETLINK_GENERIC)
+        self.family_id = None
+        self.seq = 0
+        
+    @staticmethod
+    def open_socket(protocol):
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, protocol)
+        sock.bind((0, 0))
+        sock.settimeout(2)
+        return sock
+        
+    def request(self, sock, msg_type, flags, payload):
+        """Send a request and collect the reply payloads as (type, payload)"""
+        self.seq += 1
+        sock.send(nl_message(msg_type, flags | NLM_F_REQUEST, self.seq, payload))
+        replies = []
+        while True:
+            data = sock.recv(65536)
+            for reply_type, _flags, reply in iter_nl_messages(data):
+                if reply_type == NLMSG_DONE:
+                    return replies
+                if reply_type == NLMSG_ERROR:
+                    error = -struct.unpack_from('=i', reply)[0]
+                    if error:
+                        raise OSError(error, os.strerror(error))
+                    return replies
+                replies.append((reply_type, reply))
+            if not flags & NLM_F_DUMP:
+                return replies
+                
+    def wireguard_links(self):
+        """Names of all WireGuard interfaces"""
+        replies = self.request(self.route, RTM_GETLINK, NLM_F_DUMP,
+                               struct.pack('=BxHiII', socket.AF_UNSPEC, 0, 0, 0, 0))
+        links = []
+        for reply_type, payload in replies:
+            if reply_type == RTM_NEWLINK:
+                _ifindex, name, kind = parse_link_message(payload)
+                if kind == 'wireguard':
+                    links.append(name)
+        return links
+        
+    def resolve_family(self):
+        """Look up the id of the "wireguard" generic netlink family"""
+        payload = (struct.pack('=BBH', CTRL_CMD_GETFAMILY, 1, 0) +
+                   nl_attr(CTRL_ATTR_FAMILY_NAME, b'wireguard\0'))
+        replies = self.request(self.genl, GENL_ID_CTRL, 0, payload)
+        attrs = dict(iter_nl_attrs(replies[0][1], 4))
+        return struct.unpack('=H', attrs[CTRL_ATTR_FAMILY_ID])[0]
+        
+    def poll(self):
+        links = self.wireguard_links()
+        if not links:
+            # The wireguard module may not even be loaded yet
+            return {}
+        if self.family_id is None:
+            self.family_id = self.resolve_family()
+        interfaces = {}
+        for name in links:
+            payload = (struct.pack('=BBH', WG_CMD_GET_DEVICE, WG_GENL_VERSION, 0) +
+                       nl_attr(WGDEVICE_A_IFNAME, name.encode() + b'\0'))
+            try:
+                replies = self.request(self.genl, self.family_id, NLM_F_DUMP, payload)
+            except OSError as e:
+                if e.errno in (errno.ENOENT, errno.ENODEV):
+                    continue  # removed since the link dump
+                raise
+            parse_wg_device_messages([reply for _type, reply in replies], interfaces, name)
+        return interfaces
+    
+    def fallback(self):
+        return WgDumpBackend()
+
+class DaemonBackend:
+    """Status backend that asks a running `wiregui daemon` (or helper) for its snapshot
+    
+    Without local_fallback a lost daemon is reported instead of replaced,
+    e.g. for the helper, which is restarted rather than polled around.
+    """
+    def __init__(self, client=None, name='daemon', local_fallback=True):
+        self.client = client or DaemonClient()
+        self.name = name
+        self.local_fallback = local_fallback
+        
+    def poll(self):
+        reply = self.client.request('status')
+        if reply.get('error'):
+            # The daemon is fine, its own poll failed
+            raise RuntimeError(reply['error'])
+        return reply['interfaces']
+    
+    def fallback(self):
+        return select_status_backend('local') if self.local_fallback else None
+
+def select_status_backend(preference='auto'):
+    """Pick a status backend
+    
+    'wg' forces the CLI, 'local' skips the daemon, otherwise a running daemon
+    is used first, then netlink when available, then the wg CLI.
+    """
+    if preference not in ('wg', 'local'):
+        client = DaemonClient()
+        if client.available():
+            return DaemonBackend(client)
+    if preference != 'wg':
+        try:
+            return NetlinkBackend()
+        except (OSError, AttributeError):
+            pass  # no AF_NETLINK here
+    return WgDumpBackend()
+
+class StatusPoller:
+    """Shared snapshot of all WireGuard interfaces, one backend query per poll
+    
+    A failed poll keeps the last snapshot and sets error, so a backend
+    hiccup is not mistaken for all tunnels going down. lost is also set
+    when the backend could not be reached and has no fallback (e.g. the
+    helper is gone).
+    """
+    def __init__(self, backend=None):
+        self.backend = backend or WgDumpBackend()
+        self.interfaces = {}
+        self.error = None
+        self.lost = False
+        self.duration = 0.0
+        
+    def poll(self):
+        """Refresh the snapshot and return it, duration is how long that took"""
+        started = time.monotonic()
+        try:
+            interfaces = self.backend.poll()
+        except OSError as e:
+            # Daemon gone, or netlink refused (e.g. EPERM without CAP_NET_ADMIN)
+            fallback = self.backend.fallback()
+            if fallback is not None:
+                self.backend = fallback
+                return self.poll()
+            self.error = str(e) or type(e).__name__
+            self.lost = True
+        except Exception as e:
+            self.error = str(e) or type(e).__name__
+            self.lost = False
+        else:
+            self.interfaces = interfaces
+            self.error = None
+            self.lost = False
+        self.duration = time.monotonic() - started
+        return self.interfaces
+    
+    def is_active(self, tunnel_name):
+        """Check if a tunnel was up at the last poll"""
+        return tunnel_name in self.interfaces
+    
+    def transfer(self, tunnel_name):
+        """Total (received, sent) bytes over all peers of a tunnel"""
+        peers = self.interfaces.get(tunnel_name, {}).get('peers', [])
+        return (sum(peer['rx'] for peer in peers),
+                sum(peer['tx'] for peer in peers))
+
+# Interface names wg-quick accepts (IFNAMSIZ - 1 characters) except "." and
+# "..", which the kernel refuses; \Z because $ also matches before a "\n"
+TUNNEL_NAME = re.compile(r'^(?!\.\.?\Z)[a-zA-Z0-9_=+.-]{1,15}\Z')
+
+def list_tunnels(config_dir=CONFIG_DIR):
+    """Sorted names of all configs in the config directory"""
+    return sorted(f[:-5] for f in os.listdir(config_dir) if f.endswith('.conf'))
+
+def check_tunnel_name(tunnel_name):
+    """Raise ValueError unless wg-quick would accept the name"""
+    if not isinstance(tunnel_name, str) or not TUNNEL_NAME.match(tunnel_name):
+        raise ValueError(f"invalid tunnel name: {tunnel_name!r}")
+    return tunnel_name
+
+def plan_switch(active, target):
+    """Minimal (to_down, to_up) to go from the active to the target tunnel set
+    
+    Tunnels in both sets are left alone, so their connections survive.
+    """
+    active, target = set(active), set(target)
+    return sorted(active - target), sorted(target - active)
+
+def restart_tunnel(ops, tunnel_name, timeout=None):
+    """Take a tunnel down (if it is up) and up again, returns the up result"""
+    down = ops.down(tunnel_name, timeout)
+    if down.returncode != 0 and 'is not a WireGuard interface' not in down.stderr:
+        return down
+    return ops.up(tunnel_name, timeout)
+
+def fsync_dir(path):
+    """Make renames and deletes in a directory durable"""
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def atomic_write(path, data, mode=0o600):
+    """Replace a file with data (str or bytes) so readers see old or new, never half
+    
+    Writes a temp file next to it, fsyncs and renames it over the target.
+    The caller fsyncs the directory (fsync_dir) to make the rename durable,
+    once for a whole batch of writes.
+    """
+    import tempfile  # not needed on the startup path
+    directory, name = os.path.split(path)
+    # The temp name must not end in .conf, or it would show up as a tunnel
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{name}.", suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            os.fchmod(f.fileno(), mode)
+            f.write(data.encode() if isinstance(data, str) else data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+class ConfigHistory:
+    """Content-addressed history of config versions
+    
+    <config_dir>/.wiregui-history/objects/<sha256> holds each distinct
+    version once, zlib-compressed; <name>.log lists "<unix time> <sha256>"
+    per saved version, oldest first. Everything is root-only (0700/0600).
+    """
+    DIRNAME = '.wiregui-history'
+    MAX_VERSIONS = 100
+    DIGEST = re.compile(r'^[0-9a-f]{64}$')
+    
+    def __init__(self, config_dir=CONFIG_DIR):
+        self.path = os.path.join(config_dir, self.DIRNAME)
+        self.objects = os.path.join(self.path, 'objects')
+        self.lock = threading.Lock()
+        
+    def log_path(self, tunnel_name):
+        return os.path.join(self.path, f"{check_tunnel_name(tunnel_name)}.log")
+    
+    def versions(self, tunnel_name):
+        """[(timestamp, digest), ...] of a tunnel, newest first"""
+        try:
+            with open(self.log_path(tunnel_name), 'r') as f:
+                entries = [line.split() for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+        return [(float(timestamp), digest) for timestamp, digest in reversed(entries)]
+    
+    def load(self, digest):
+        """Text of a version"""
+        import zlib
+        if not self.DIGEST.match(digest):
+            raise ValueError(f"invalid version: {digest!r}")
+        with open(os.path.join(self.objects, digest), 'rb') as f:
+            return zlib.decompress(f.read()).decode()
+        
+    def record(self, tunnel_name, text):
+        """Add a version unless it equals the newest one
+        
+        Returns the directories that need an fsync (see fsync_dir).
+        """
+        import hashlib
+        import zlib
+        digest = hashlib.sha256(text.encode()).hexdigest()
+        with self.lock:
+            versions = self.versions(tunnel_name)
+            if versions and versions[0][1] == digest:
+                return set()
+            if not os.path.isdir(self.objects):
+                os.makedirs(self.path, mode=0o700, exist_ok=True)
+                os.chmod(self.path, 0o700)  # makedirs mode is subject to the umask
+                os.makedirs(self.objects, mode=0o700, exist_ok=True)
+            dirty = set()
+            object_path = os.path.join(self.objects, digest)
+            if not os.path.exists(object_path):
+                atomic_write(object_path, zlib.compress(text.encode(), 9))
+                dirty.add(self.objects)
+            entries = [(timestamp, d) for timestamp, d in reversed(versions)]
+            entries.append((time.time(), digest))
+            dropped = entries[:-self.MAX_VERSIONS]
+            entries = entries[-self.MAX_VERSIONS:]
+            atomic_write(self.log_path(tunnel_name),
+                         ''.join(f"{timestamp:.3f} {d}\n" for timestamp, d in entries))
+            dirty.add(self.path)
+            if dropped:
+                dirty |= self.collect_garbage()
+            return dirty
+        
+    def collect_garbage(self):
+        """Delete objects no log refers to any more"""
+        used = set()
+        for name in os.listdir(self.path):
+            if name.endswith('.log'):
+                with open(os.path.join(self.path, name), 'r') as f:
+                    used.update(line.split()[1] for line in f if line.strip())
+        unused = set(os.listdir(self.objects)) - used
+        for digest in unused:
+            os.remove(os.path.join(self.objects, digest))
+        return {self.objects} if unused else set()
+
+class LocalTunnelOps:
+    """Tunnel and config operations done in this process (needs root)
+    
+    Config writes are atomic and every written or deleted version is kept
+    in a ConfigHistory.
+    """
+    name = 'direct'
+    
+    def __init__(self, config_dir=CONFIG_DIR):
+        self.config_dir = config_dir
+        self.history = ConfigHistory(config_dir)
+        self.local = threading.local()
+        
+    def path(self, tunnel_name):
+        return os.path.join(self.config_dir, f"{check_tunnel_name(tunnel_name)}.conf")
+    
+    def list(self):
+        return list_tunnels(self.config_dir)
+    
+    def stat(self, tunnel_name):
+        """Change signature of a config: (mtime_ns, size, inode)"""
+        st = os.stat(self.path(tunnel_name))
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+    
+    def exists(self, tunnel_name):
+        try:
+            self.stat(tunnel_name)
+            return True
+        except FileNotFoundError:
+            return False
+        
+    def read(self, tunnel_name):
+        with open(self.path(tunnel_name), 'r') as f:
+            return f.read()
+        
+    @contextmanager
+    def batch(self):
+        """Group writes and deletes, directories are fsynced once at the end"""
+        if getattr(self.local, 'dirty', None) is not None:
+            yield  # nested, the outer batch syncs
+            return
+        self.local.dirty = set()
+        try:
+            yield
+        finally:
+            dirty, self.local.dirty = self.local.dirty, None
+            for directory in dirty:
+                fsync_dir(directory)
+                
+    def sync(self, directories):
+        if getattr(self.local, 'dirty', None) is not None:
+            self.local.dirty |= directories
+        else:
+            for directory in directories:
+                fsync_dir(directory)
+                
+    def keep_version(self, tunnel_name, path):
+        """Record the current file in the history (it may have been edited by hand)"""
+        try:
+            with open(path, 'r') as f:
+                return self.history.record(tunnel_name, f.read())
+        except FileNotFoundError:
+            return set()
+        
+    def write(self, tunnel_name, text):
+        """Atomically write a config (mode 0600), keeping old and new in the history"""
+        path = self.path(tunnel_name)
+        dirty = self.keep_version(tunnel_name, path)
+        atomic_write(path, text)
+        dirty |= self.history.record(tunnel_name, text)
+        self.sync(dirty | {self.config_dir})
+        
+    def write_many(self, configs):
+        """Write {name: text} with a single fsync per directory"""
+        with self.batch():
+            for tunnel_name, text in configs.items():
+                self.write(tunnel_name, text)
+                
+    def rename(self, tunnel_name, new_name, text):
+        """Save a config under a new name and delete the old one"""
+        self.path(new_name)
+        with self.batch():
+            self.write(new_name, text)
+            self.delete(tunnel_name)
+            
+    def delete(self, tunnel_name):
+        """Delete a config, its last version stays in the history"""
+        path = self.path(tunnel_name)
+        dirty = self.keep_version(tunnel_name, path)
+        os.remove(path)
+        # Left over from older versions, which kept a single backup
+        if os.path.exists(f"{path}.backup"):
+            os.remove(f"{path}.backup")
+        self.sync(dirty | {self.config_dir})
+        
+    def versions(self, tunnel_name):
+        """Saved versions of a tunnel: [(timestamp, digest), ...], newest first"""
+        return self.history.versions(tunnel_name)
+    
+    def read_version(self, tunnel_name, digest):
+        if digest not in (d for _timestamp, d in self.versions(tunnel_name)):
+            raise ValueError(f"{tunnel_name} has no version {digest!r}")
+        return self.history.load(digest)
+            
+    def up(self, tunnel_name, timeout=None):
+        return run_command(['wg-quick', 'up', check_tunnel_name(tunnel_name)], timeout)
+    
+    def down(self, tunnel_name, timeout=None):
+        return run_command(['wg-quick', 'down', check_tunnel_name(tunnel_name)], timeout)
+    
+    def restart(self, tunnel_name, timeout=None):
+        return restart_tunnel(self, tunnel_name, timeout)
+
+def runtime_dir():
+    """Per-user runtime directory (XDG_RUNTIME_DIR)"""
+    return os.environ.get('XDG_RUNTIME_DIR') or f"/tmp/wiregui-{os.getuid()}"
+
+def daemon_socket_path():
+    return os.path.join(runtime_dir(), 'wiregui.sock')
+
+class DaemonClient:
+    """JSON-lines client for `wiregui daemon`, keeps one connection per thread
+    
+    Separate connections let a slow request (e.g. `up` through the helper)
+    run while other threads keep polling status.
+    """
+    def __init__(self, path=None, timeout=2):
+        self.path = path or daemon_socket_path()
+        self.timeout = timeout
+        self.local = threading.local()
+        
+    def available(self):
+        """Check if a daemon answers on the socket"""
+        if not os.path.exists(self.path):
+            return False
+        try:
+            self.request('ping')
+            return True
+        except OSError:
+            return False
+        
+    def request(self, cmd, **params):
+        """Send one request and return the reply, raises OSError on failure"""
+        local = self.local
+        try:
+            if getattr(local, 'sock', None) is None:
+                local.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                local.sock.settimeout(self.timeout)
+                local.sock.connect(self.path)
+                local.reader = local.sock.makefile('rb')
+            # A request with its own timeout (up/down) may take that long to answer
+            local.sock.settimeout(max(self.timeout, (params.get('timeout') or 0) + 5))
+            local.sock.sendall(json.dumps(dict(params, cmd=cmd)).encode() + b'\n')
+            line = local.reader.readline()
+            if not line:
+                raise ConnectionResetError("connection closed by the server")
+            reply = json.loads(line)
+        except (OSError, ValueError) as e:
+            self.close()
+            raise e if isinstance(e, OSError) else OSError(str(e))
+        if not reply.get('ok', False) and 'error' in reply:
+            # OSError(errno, ...) becomes FileNotFoundError, PermissionError, ...
+            if reply.get('errno'):
+                raise OSError(reply['errno'], reply['error'])
+            raise OSError(reply['error'])
+        return reply
+    
+    def close(self):
+        """Close the connection of the calling thread"""
+        if getattr(self.local, 'sock', None) is not None:
+            self.local.sock.close()
+        self.local.sock = None
+        self.local.reader = None
+
+class StatusDaemon:
+    """Long-lived status service for the GUI, scripts and monitoring
+    
+    Answers JSON-lines requests on a Unix socket (mode 0600). The status
+    snapshot is refreshed on demand when older than max_age seconds, so an
+    idle daemon does no work at all.
+    """
+    def __init__(self, path=None, config_dir=CONFIG_DIR, max_age=1.0, backend=None):
+        self.path = path or daemon_socket_path()
+        self.config_dir = config_dir
+        self.max_age = max_age
+        self.poller = StatusPoller(backend or select_status_backend('local'))
+        self.updated = 0.0
+        self.lock = threading.Lock()
+        
+    def snapshot(self, fresh=False):
+        with self.lock:
+            if fresh or time.monotonic() - self.updated > self.max_age:
+                self.poller.poll()
+                self.updated = time.monotonic()
+            return self.poller.interfaces
+        
+    def handle(self, request):
+        """Answer one request dict"""
+        cmd = request.get('cmd')
+        if cmd == 'ping':
+            return {'ok': True, 'pid': os.getpid()}
+        if cmd == 'status':
+            return {'ok': True, 'interfaces': self.snapshot(),
+                    'backend': self.poller.backend.name, 'error': self.poller.error}
+        if cmd == 'list':
+            interfaces = self.snapshot()
+            return {'ok': True, 'tunnels': [{'name': name, 'active': name in interfaces}
+                                            for name in list_tunnels(self.config_dir)]}
+        if cmd in ('up', 'down'):
+            name = request.get('name', '')
+            if not isinstance(name, str) or not TUNNEL_NAME.match(name):
+                return {'ok': False, 'error': f"invalid tunnel name: {name!r}"}
+            timeout = request.get('timeout')
+            if timeout is not None and not isinstance(timeout, (int, float)):
+                return {'ok': False, 'error': f"invalid timeout: {timeout!r}"}
+            result = run_command(['wg-quick', cmd, name], timeout)
+            self.snapshot(fresh=True)
+            return {'ok': result.returncode == 0, 'returncode': result.returncode,
+                    'stdout': result.stdout, 'stderr': result.stderr}
+        return {'ok': False, 'error': f"unknown command: {cmd!r}"}
+    
+    def allow_peer(self, connection):
+        """Whether to serve a connection, the socket mode already limits access"""
+        return True
+    
+    def secure_socket(self):
+        """Hook to adjust the listening socket after bind"""
+        
+    def serve_forever(self, idle_timeout=None):
+        """Serve until interrupted, or until idle_timeout seconds without clients"""
+        import socketserver
+        daemon = self
+        clients = [0]
+        
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                if not daemon.allow_peer(self.connection):
+                    return
+                clients[0] += 1
+                try:
+                    for line in self.rfile:
+                        try:
+                            reply = daemon.handle(json.loads(line))
+                        except OSError as e:
+                            reply = {'ok': False, 'error': e.strerror or str(e), 'errno': e.errno}
+                        except Exception as e:
+                            reply = {'ok': False, 'error': str(e)}
+                        self.wfile.write(json.dumps(reply).encode() + b'\n')
+                        self.wfile.flush()
+                finally:
+                    clients[0] -= 1
+                    
+        os.makedirs(os.path.dirname(self.path), mode=0o700, exist_ok=True)
+        if os.path.exists(self.path):
+            if DaemonClient(self.path).available():
+                raise OSError(f"already listening on {self.path}")
+            os.remove(self.path)
+        old_umask = os.umask(0o177)
+        try:
+            server = socketserver.ThreadingUnixStreamServer(self.path, Handler)
+        finally:
+            os.umask(old_umask)
+        server.daemon_threads = True
+        self.secure_socket()
+        try:
+            if idle_timeout is None:
+                server.serve_forever()
+            else:
+                server.timeout = idle_timeout
+                timed_out = [False]
+                server.handle_timeout = lambda: timed_out.__setitem__(0, True)
+                while True:
+                    timed_out[0] = False
+                    server.handle_request()
+                    if timed_out[0] and clients[0] == 0:
+                        break
+        finally:
+            server.server_close()
+            os.remove(self.path)
+
+def helper_socket_path(uid=None):
+    """Socket of the privileged helper serving one user"""
+    return f"/run/wiregui/helper-{os.getuid() if uid is None else uid}.sock"
+
+class PrivilegedHelper(StatusDaemon):
+    """Root helper that serves one user a narrow whitelist of operations
+    
+    Started once through pkexec, it answers on a socket only that user can
+    open (also checked with SO_PEERCRED). Besides the status requests of
+    StatusDaemon it allows exactly: stat, read, write, rename and delete of
+    <config_dir>/<name>.conf for valid tunnel names, reading their history,
+    and up/down. Written configs may not add PreUp/PostUp/PreDown/PostDown
+    commands, which wg-quick would run as root. The GUI holds a connection open while it runs (see
+    HelperClient.keep_alive), the helper exits once no client has been
+    connected for idle_timeout seconds.
+    """
+    MAX_CONFIG_SIZE = 1 << 20
+    
+    def __init__(self, uid, config_dir=CONFIG_DIR, path=None):
+        super().__init__(path=path or helper_socket_path(uid), config_dir=config_dir)
+        self.uid = uid
+        self.ops = LocalTunnelOps(config_dir)
+        
+    def allow_peer(self, connection):
+        creds = connection.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED,
+                                      struct.calcsize('3i'))
+        _pid, uid, _gid = struct.unpack('3i', creds)
+        return uid in (self.uid, 0)
+    
+    def secure_socket(self):
+        os.chmod(os.path.dirname(self.path), 0o755)
+        os.chown(self.path, self.uid, -1)
+        
+    def handle(self, request):
+        cmd = request.get('cmd')
+        name = request.get('name')
+        if cmd == 'stat':
+            return {'ok': True, 'signature': self.ops.stat(name)}
+        if cmd == 'read':
+            return {'ok': True, 'text': self.ops.read(name)}
+        if cmd in ('write', 'rename'):
+            text = request.get('text')
+            if not self.valid_text(text):
+                return {'ok': False, 'error': "invalid config text"}
+            self.check_hooks(name, text)
+            if cmd == 'write':
+                self.ops.write(name, text)
+            else:
+                self.ops.rename(name, request.get('new_name'), text)
+            return {'ok': True}
+        if cmd == 'write_many':
+            configs = request.get('configs')
+            if not isinstance(configs, dict) or not all(map(self.valid_text, configs.values())):
+                return {'ok': False, 'error': "invalid config text"}
+            for tunnel_name, text in configs.items():
+                check_tunnel_name(tunnel_name)
+                self.check_hooks(tunnel_name, text)
+            self.ops.write_many(configs)
+            return {'ok': True}
+        if cmd == 'delete':
+            self.ops.delete(name)
+            return {'ok': True}
+        if cmd == 'versions':
+            return {'ok': True, 'versions': self.ops.versions(name)}
+        if cmd == 'read_version':
+            return {'ok': True, 'text': self.ops.read_version(name, request.get('digest'))}
+        return super().handle(request)
+    
+    def valid_text(self, text):
+        return isinstance(text, str) and len(text) <= self.MAX_CONFIG_SIZE
+    
+    def check_hooks(self, tunnel_name, text):
+        """Raise ValueError unless every hook in text is already in the file
+        
+        wg-quick runs hooks as root, so the user may keep or drop the ones
+        root put there but not add or change any.
+        """
+        try:
+            allowed = config_hooks(self.ops.read(tunnel_name))
+        except FileNotFoundError:
+            allowed = []
+        for hook in config_hooks(text):
+            if hook not in allowed:
+                raise ValueError(f"{HOOK_KEYS[hook[0]]} commands run as root, they can only "
+                                 f"be added or changed by editing the file as root")
+            allowed.remove(hook)
+
+class HelperClient(DaemonClient):
+    """Tunnel and config operations through the privileged helper
+    
+    Same interface as LocalTunnelOps, so the GUI does not care which one
+    it uses.
+    """
+    name = 'helper'
+    
+    def __init__(self, path=None, timeout=120):
+        # wg-quick up can take long (DNS, PostUp hooks)
+        super().__init__(path or helper_socket_path(), timeout)
+        self.held = None
+        
+    def keep_alive(self):
+        """Hold an idle connection until release(), so the helper does not exit
+        
+        The per-thread connections come and go with the threads of a pool,
+        this one lasts as long as the client is in use.
+        """
+        held = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            held.connect(self.path)
+        except OSError:
+            held.close()
+            raise
+        self.release()
+        self.held = held
+        
+    def release(self):
+        """Close the connection of keep_alive(), the helper may exit when idle"""
+        if self.held is not None:
+            self.held.close()
+            self.held = None
+        
+    def request(self, cmd, **params):
+        # Same ValueError for bad names as LocalTunnelOps, without a round trip
+        for key in ('name', 'new_name'):
+            if key in params:
+                check_tunnel_name(params[key])
+        return super().request(cmd, **params)
+    
+    def list(self):
+        return [tunnel['name'] for tunnel in self.request('list')['tunnels']]
+    
+    def stat(self, tunnel_name):
+        return tuple(self.request('stat', name=tunnel_name)['signature'])
+    
+    def exists(self, tunnel_name):
+        try:
+            self.stat(tunnel_name)
+            return True
+        except FileNotFoundError:
+            return False
+        
+    def read(self, tunnel_name):
+        return self.request('read', name=tunnel_name)['text']
+    
+    def write(self, tunnel_name, text):
+        self.request('write', name=tunnel_name, text=text)
+        
+    def write_many(self, configs):
+        self.request('write_many', configs=configs)
+        
+    def rename(self, tunnel_name, new_name, text):
+        self.request('rename', name=tunnel_name, new_name=new_name, text=text)
+        
+    def versions(self, tunnel_name):
+        return [tuple(version) for version in self.request('versions', name=tunnel_name)['versions']]
+    
+    def read_version(self, tunnel_name, digest):
+        return self.request('read_version', name=tunnel_name, digest=digest)['text']
+        
+    def delete(self, tunnel_name):
+        self.request('delete', name=tunnel_name)
+        
+    def up(self, tunnel_name, timeout=None):
+        return self.tunnel_action('up', tunnel_name, timeout)
+    
+    def down(self, tunnel_name, timeout=None):
+        return self.tunnel_action('down', tunnel_name, timeout)
+    
+    def restart(self, tunnel_name, timeout=None):
+        return restart_tunnel(self, tunnel_name, timeout)
+    
+    def tunnel_action(self, action, tunnel_name, timeout=None):
+        args = ['wg-quick', action, tunnel_name]
+        try:
+            reply = self.request(action, name=tunnel_name, timeout=timeout)
+        except OSError as e:
+            return subprocess.CompletedProcess(args, 1, '', str(e))
+        return subprocess.CompletedProcess(args, reply.get('returncode', 1),
+                                           reply.get('stdout', ''),
+                                           reply.get('stderr', reply.get('error', '')))
+
+def start_helper(timeout=120):
+    """Connect to the helper, starting it through pkexec if needed
+    
+    Blocks until the helper answers (the user may take a while to type the
+    password), so call it off the GUI thread. Raises OSError on failure.
+    The returned client keeps the helper alive until it is released.
+    """
+    client = HelperClient()
+    if client.available():
+        client.keep_alive()
+        return client
+    process = subprocess.Popen(['pkexec', sys.executable, os.path.abspath(__file__),
+                                'helper'], stdin=subprocess.DEVNULL,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if client.available():
+            client.keep_alive()
+            return client
+        if process.poll() is not None:
+            stderr = process.stderr.read().decode(errors='replace').strip()
+            raise OSError(f"pkexec failed ({process.returncode}): {stderr}")
+        time.sleep(0.2)
+    raise OSError("timed out waiting for the helper")
+
+def metrics_socket_path():
+    return os.path.join(runtime_dir(), 'wiregui-metrics.sock')
+
+def metric_labels(**labels):
+    """Prometheus label set, values escaped"""
+    return '{' + ','.join(
+        '%s="%s"' % (key, str(value).replace('\\', '\\\\').replace('"', '\\"')
+                     .replace('\n', '\\n'))
+        for key, value in labels.items()) + '}'
+
+class Metrics:
+    """Prometheus text exposition of the last status poll and internal timings
+    
+    Fed by the caller after each poll and tunnel action. A scrape only
+    renders what is stored, it never queries WireGuard itself.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.interfaces = {}
+        self.tunnels = []
+        self.polls = 0
+        self.poll_seconds = 0.0
+        self.last_poll = 0.0
+        self.poll_spawns = 0
+        self.poll_errors = 0
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.toggles = {}  # (tunnel, action) -> [count, failures, seconds, last]
+        self.startup = {}
+        
+    def record_poll(self, interfaces, tunnels, duration, spawns):
+        """A status poll finished, spawns is the number of processes since the last one"""
+        with self.lock:
+            self.interfaces = interfaces
+            self.tunnels = list(tunnels)
+            self.polls += 1
+            self.poll_seconds += duration
+            self.last_poll = duration
+            self.poll_spawns = spawns
+            
+    def record_poll_error(self):
+        """A status poll failed, the last snapshot stays exported"""
+        with self.lock:
+            self.poll_errors += 1
+            
+    def record_toggle(self, tunnel_name, action, seconds, ok):
+        with self.lock:
+            toggle = self.toggles.setdefault((tunnel_name, action), [0, 0, 0.0, 0.0])
+            toggle[0] += 1
+            toggle[1] += 0 if ok else 1
+            toggle[2] += seconds
+            toggle[3] = seconds
+            
+    def record_startup(self, phase, seconds):
+        """When a startup phase was reached, in seconds after the GUI started loading"""
+        with self.lock:
+            self.startup[phase] = seconds
+            
+    def record_lag(self, seconds):
+        """How late a timer of the event loop fired"""
+        with self.lock:
+            self.lag = seconds
+            self.max_lag = max(self.max_lag, seconds)
+            
+    def render(self, now=None):
+        """The metrics in the Prometheus text format"""
+        now = time.time() if now is None else now
+        lines = []
+        
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, labels, value in samples:
+                lines.append(f"{name}{suffix}{labels} {value:.6g}"
+                             if isinstance(value, float) else f"{name}{suffix}{labels} {value}")
+                
+        with self.lock:
+            interfaces = self.interfaces
+            tunnels = sorted(set(self.tunnels) | set(interfaces))
+            transfer, handshakes = [], []
+            for name in sorted(interfaces):
+                peers = interfaces[name].get('peers', [])
+                labels = metric_labels(tunnel=name)
+                transfer.append((labels, sum(p['rx'] for p in peers), sum(p['tx'] for p in peers)))
+                latest = max((p['latest_handshake'] for p in peers), default=0)
+                if latest:
+                    handshakes.append(('', labels, max(0.0, now - latest)))
+            metric('wiregui_tunnel_up', 'gauge', "Whether the tunnel interface is up",
+                   [('', metric_labels(tunnel=name), int(name in interfaces)) for name in tunnels])
+            metric('wiregui_tunnel_peers', 'gauge', "Peers configured on the interface",
+                   [('', metric_labels(tunnel=name), len(interfaces[name].get('peers', [])))
+                    for name in sorted(interfaces)])
+            metric('wiregui_tunnel_receive_bytes_total', 'counter',
+                   "Bytes received over all peers", [('', l, rx) for l, rx, _tx in transfer])
+            metric('wiregui_tunnel_transmit_bytes_total', 'counter',
+                   "Bytes sent over all peers", [('', l, tx) for l, _rx, tx in transfer])
+            metric('wiregui_tunnel_last_handshake_age_seconds', 'gauge',
+                   "Seconds since the most recent handshake of any peer", handshakes)
+            toggles = sorted(self.toggles.items())
+            metric('wiregui_toggle_duration_seconds', 'summary',
+                   "Time taken by wg-quick up/down/restart",
+                   [sample for (name, action), (count, _failed, total, _last) in toggles
+                    for sample in (('_count', metric_labels(tunnel=name, action=action), count),
+                                   ('_sum', metric_labels(tunnel=name, action=action), total))])
+            metric('wiregui_toggle_last_duration_seconds', 'gauge',
+                   "Time taken by the last wg-quick up/down/restart",
+                   [('', metric_labels(tunnel=name, action=action), last)
+                    for (name, action), (_count, _failed, _total, last) in toggles])
+            metric('wiregui_toggle_failures_total', 'counter', "Failed wg-quick up/down/restart",
+                   [('', metric_labels(tunnel=name, action=action), failed)
+                    for (name, action), (_count, failed, _total, _last) in toggles])
+            metric('wiregui_poll_duration_seconds', 'summary', "Time taken by status polls",
+                   [('_count', '', self.polls), ('_sum', '', self.poll_seconds)])
+            metric('wiregui_poll_errors_total', 'counter', "Status polls that failed",
+                   [('', '', self.poll_errors)])
+            metric('wiregui_poll_last_duration_seconds', 'gauge',
+                   "Time taken by the last status poll", [('', '', self.last_poll)])
+            metric('wiregui_poll_spawned_processes', 'gauge',
+                   "Processes started between the last two status polls",
+                   [('', '', self.poll_spawns)])
+            metric('wiregui_spawned_processes_total', 'counter',
+                   "Processes started for wg and wg-quick", [('', '', spawn_count())])
+            metric('wiregui_event_loop_lag_seconds', 'gauge',
+                   "How late the last GUI event loop probe ran", [('', '', self.lag)])
+            metric('wiregui_event_loop_lag_max_seconds', 'gauge',
+                   "Largest GUI event loop lag seen", [('', '', self.max_lag)])
+            metric('wiregui_startup_seconds', 'gauge', "When each startup phase was reached",
+                   [('', metric_labels(phase=phase), seconds)
+                    for phase, seconds in self.startup.items()])
+        return '\n'.join(lines) + '\n'
+
+class MetricsServer:
+    """Serves Metrics.render() at /metrics, on localhost only or a Unix socket
+    
+    address is a TCP port on 127.0.0.1 or a socket path (mode 0600).
+    Requests are answered on a background thread.
+    """
+    def __init__(self, metrics, address):
+        self.metrics = metrics
+        self.address = address
+        self.server = None
+        
+    def url(self):
+        if isinstance(self.address, int):
+            return f"http://127.0.0.1:{self.server.server_address[1]}/metrics"
+        return f"unix:{self.address}"
+    
+    def start(self):
+        """Bind and start serving, raises OSError if the address is taken"""
+        import http.server  # only needed when metrics are enabled
+        import socketserver
+        metrics = self.metrics
+        
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                
+            def log_message(self, format, *args):
+                pass
+            
+        if isinstance(self.address, int):
+            self.server = http.server.ThreadingHTTPServer(('127.0.0.1', self.address), Handler)
+        else:
+            class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+                def get_request(self):
+                    connection, _address = super().get_request()
+                    return connection, ('local', 0)
+                
+            os.makedirs(os.path.dirname(self.address), mode=0o700, exist_ok=True)
+            if os.path.exists(self.address):
+                os.remove(self.address)
+            old_umask = os.umask(0o177)
+            try:
+                self.server = UnixHTTPServer(self.address, Handler)
+            finally:
+                os.umask(old_umask)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        
+    def stop(self):
+        if self.server is None:
+            return
+        self.server.shutdown()
+        self.server.server_close()
+        self.server = None
+        if not isinstance(self.address, int):
+            try:
+                os.remove(self.address)
+            except OSError:
+                pass
+
+CLI_COMMANDS = ('status', 'up', 'down', 'list', 'daemon', 'helper')
+
+def format_age(seconds):
+    """Short human readable duration, e.g. 1h 2m 3s, 3m (trailing zeros dropped)"""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    parts = [f"{hours}h", f"{minutes}m", f"{seconds}s"]
+    while len(parts) > 1 and parts[0][0] == '0':
+        parts.pop(0)
+    while len(parts) > 1 and parts[-1][0] == '0':
+        parts.pop()
+    return ' '.join(parts)
+
+def cli_status(interfaces, names, as_json):
+    if names:
+        interfaces = {name: info for name, info in interfaces.items() if name in names}
+    if as_json:
+        print(json.dumps(interfaces, indent=2))
+        return 0 if interfaces or not names else 1
+    now = time.time()
+    for name in sorted(interfaces):
+        info = interfaces[name]
+        rx = sum(peer['rx'] for peer in info['peers'])
+        tx = sum(peer['tx'] for peer in info['peers'])
+        print(f"{name}: up, {len(info['peers'])} peer(s), "
+              f"↓ {format_bytes(rx)} ↑ {format_bytes(tx)}")
+        for peer in info['peers']:
+            handshake = (f"{format_age(now - peer['latest_handshake'])} ago"
+                         if peer['latest_handshake'] else "never")
+            print(f"  {peer['public_key']} {peer['endpoint'] or '(no endpoint)'} "
+                  f"handshake {handshake}")
+    for name in names:
+        if name not in interfaces:
+            print(f"{name}: down")
+    return 0 if all(name in interfaces for name in names) else 1
+
+def cli_main(argv=None):
+    """Headless `wiregui <command>` entry point"""
+    import argparse
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--config-dir', default=CONFIG_DIR)
+    common.add_argument('--backend', choices=('auto', 'netlink', 'wg'), default='auto',
+                        help='how to read tunnel status (default: daemon, netlink, wg)')
+    parser = argparse.ArgumentParser(prog='wiregui', description='WireGuard tunnels without the GUI')
+    commands = parser.add_subparsers(dest='command', required=True)
+    status = commands.add_parser('status', parents=[common], help='show active tunnels')
+    status.add_argument('names', nargs='*')
+    status.add_argument('--json', action='store_true')
+    commands.add_parser('list', parents=[common], help='list configured tunnels')
+    for action in ('up', 'down'):
+        command = commands.add_parser(action, parents=[common], help=f'bring a tunnel {action}')
+        command.add_argument('name')
+    commands.add_parser('daemon', parents=[common], help='run the status daemon in the foreground')
+    helper = commands.add_parser('helper', parents=[common],
+                                 help='run the privileged helper (started through pkexec)')
+    helper.add_argument('--uid', type=int, help='user to serve (default: $PKEXEC_UID)')
+    args = parser.parse_args(argv)
+    local_backend = 'wg' if args.backend == 'wg' else 'local'
+    
+    if args.command == 'daemon':
+        # Leave through the finally blocks so the socket is removed
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        try:
+            StatusDaemon(config_dir=args.config_dir,
+                         backend=select_status_backend(local_backend)).serve_forever()
+        except KeyboardInterrupt:
+            pass
+        except OSError as e:
+            print(f"wiregui: {e}", file=sys.stderr)
+            return 1
+        return 0
+        
+    if args.command == 'helper':
+        uid = args.uid if args.uid is not None else int(os.environ.get('PKEXEC_UID', '-1'))
+        if os.geteuid() != 0 or uid < 0:
+            print("wiregui: the helper must run as root via pkexec (or with --uid)",
+                  file=sys.stderr)
+            return 1
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        try:
+            PrivilegedHelper(uid, config_dir=args.config_dir).serve_forever(idle_timeout=60)
+        except KeyboardInterrupt:
+            pass
+        return 0
+        
+    # Use a running daemon when there is one, it answers without polling
+    client = DaemonClient()
+    daemon = args.backend == 'auto' and client.available()
+    if args.command in ('up', 'down'):
+        if not TUNNEL_NAME.match(args.name):
+            print(f"wiregui: invalid tunnel name: {args.name!r}", file=sys.stderr)
+            return 2
+        try:
+            reply = client.request(args.command, name=args.name) if daemon else None
+        except OSError:
+            reply = None  # the daemon went away, do it ourselves
+        if reply is not None:
+            returncode, stderr = reply['returncode'], reply['stderr']
+        else:
+            result = run_command(['wg-quick', args.command, args.name])
+            returncode, stderr = result.returncode, result.stderr
+        if returncode != 0:
+            sys.stderr.write(stderr)
+        return returncode
+        
+    if args.command == 'list':
+        try:
+            tunnels = list_tunnels(args.config_dir)
+        except OSError as e:
+            print(f"wiregui: {e}", file=sys.stderr)
+            return 1
+    # A daemon lost after available() falls back to the local backend
+    poller = StatusPoller(DaemonBackend(client) if daemon
+                          else select_status_backend(local_backend))
+    interfaces = poller.poll()
+    if poller.error:
+        print(f"wiregui: status unavailable: {poller.error}", file=sys.stderr)
+    if args.command == 'status':
+        return 1 if poller.error else cli_status(interfaces, args.names, args.json)
+    for name in tunnels:
+        state = 'unknown' if poller.error else 'up' if name in interfaces else 'down'
+        print(f"{name}\t{state}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(cli_main())
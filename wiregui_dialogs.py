@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+Dialogs of the WireGUI main window
+
+Kept out of wiregui.py so they (and webbrowser, difflib) are only imported
+when a dialog is first opened, not on startup.
+"""
+
+import webbrowser
+import difflib
+import html
+from datetime import datetime
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QLabel,
+                             QTextEdit, QMessageBox, QLineEdit, QFormLayout, QCheckBox,
+                             QRadioButton, QButtonGroup, QListWidget, QListWidgetItem,
+                             QSplitter)
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtGui import QFont, QColor, QTextCharFormat, QTextCursor
+from wiregui_core import ConfigValidator, TUNNEL_NAME, config_errors
+from wiregui_themes import BUILTIN_THEMES
+
+class SettingsDialog(QDialog):
+    """Settings dialog"""
+    def __init__(self, current_theme, auto_start, parent=None, tray=False, themes=None):
+        super().__init__(parent)
+        self.themes = themes or BUILTIN_THEMES
+        self.current_theme = current_theme
+        self.auto_start = auto_start
+        self.tray = tray
+        self.new_theme = current_theme
+        self.new_auto_start = auto_start
+        self.new_tray = tray
+        self.initUI()
+        if self.themes[current_theme].dark:
+            self.apply_dark_theme()
+        
+    def initUI(self):
+        self.setWindowTitle('Settings')
+        self.setGeometry(300, 300, 400, 300)
+        
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+        
+        # Theme section
+        theme_label = QLabel('Theme:')
+        theme_label.setFont(QFont('Arial', 11, QFont.Bold))
+        layout.addWidget(theme_label)
+        
+        # Built-in themes first, then the user's theme files
+        self.theme_group = QButtonGroup()
+        self.theme_radios = {}
+        for theme in sorted(self.themes.values(),
+                            key=lambda theme: (theme.id not in BUILTIN_THEMES, theme.label)):
+            radio = QRadioButton(theme.label)
+            radio.setChecked(theme.id == self.current_theme)
+            self.theme_group.addButton(radio)
+            self.theme_radios[theme.id] = radio
+            layout.addWidget(radio)
+        
+        layout.addSpacing(20)
+        
+        # Auto-start section
+        autostart_label = QLabel('Startup:')
+        autostart_label.setFont(QFont('Arial', 11, QFont.Bold))
+        layout.addWidget(autostart_label)
+        
+        self.autostart_checkbox = QCheckBox('Launch WireGUI on system startup')
+        self.autostart_checkbox.setChecked(self.auto_start)
+        layout.addWidget(self.autostart_checkbox)
+        
+        self.tray_checkbox = QCheckBox('Keep running in the system tray when closed')
+        self.tray_checkbox.setChecked(self.tray)
+        layout.addWidget(self.tray_checkbox)
+        
+        layout.addSpacing(20)
+        
+        # Support section
+        support_label = QLabel('Support:')
+        support_label.setFont(QFont('Arial', 11, QFont.Bold))
+        layout.addWidget(support_label)
+        
+        bug_btn = QPushButton('Report a Bug')
+        bug_btn.setStyleSheet("background-color: #ff5c3c; color: white; padding: 10px; border-radius: 3px;")
+        bug_btn.clicked.connect(lambda: webbrowser.open('https://github.com/yourusername/issues'))
+        layout.addWidget(bug_btn)
+        
+        help_btn = QPushButton('Need Assistance')
+        help_btn.setStyleSheet("background-color: #ff5c3c; color: white; padding: 10px; border-radius: 3px;")
+        help_btn.clicked.connect(lambda: webbrowser.open('https://github.com/yourusername'))
+        layout.addWidget(help_btn)
+        
+        layout.addStretch()
+        
+        # Save/Cancel buttons
+        btn_layout = QHBoxLayout()
+        
+        save_btn = QPushButton('Save')
+        save_btn.setStyleSheet("background-color: #ff5c3c; color: white; padding: 8px; border-radius: 3px;")
+        save_btn.clicked.connect(self.save_settings)
+        btn_layout.addWidget(save_btn)
+        
+        cancel_btn = QPushButton('Cancel')
+        cancel_btn.clicked.connect(self.reject)
+        btn_layout.addWidget(cancel_btn)
+        
+        layout.addLayout(btn_layout)
+        
+    def save_settings(self):
+        self.new_theme = next((theme_id for theme_id, radio in self.theme_radios.items()
+                               if radio.isChecked()), self.current_theme)
+        self.new_auto_start = self.autostart_checkbox.isChecked()
+        self.new_tray = self.tray_checkbox.isChecked()
+        self.accept()
+        
+    def get_settings(self):
+        return self.new_theme, self.new_auto_start, self.new_tray
+    
+    def apply_dark_theme(self):
+        self.setStyleSheet("""
+            QDialog {
+                background-color: #2b2b2b;
+                color: #ffffff;
+            }
+            QLabel {
+                color: #ffffff;
+            }
+            QRadioButton {
+                color: #ffffff;
+            }
+            QCheckBox {
+                color: #ffffff;
+            }
+            QPushButton {
+                background-color: #3c3c3c;
+                color: #ffffff;
+                border: 1px solid #555555;
+                padding: 8px;
+                border-radius: 3px;
+            }
+            QPushButton:hover {
+                background-color: #4a4a4a;
+            }
+        """)
+
+class ConfigEditorDialog(QDialog):
+    """Dialog to edit configuration and tunnel name"""
+    def __init__(self, tunnel_name, config_content, theme, parent=None):
+        super().__init__(parent)
+        self.tunnel_name = tunnel_name
+        self.config_content = config_content
+        self.new_tunnel_name = tunnel_name
+        self.theme = theme
+        self.validator = ConfigValidator()
+        self.issues = []
+        self.initUI()
+        if theme == "dark":
+            self.apply_dark_theme()
+        self.validate()
+        
+    def initUI(self):
+        self.setWindowTitle(f'Edit configuration: {self.tunnel_name}')
+        self.setGeometry(200, 200, 600, 550)
+        
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+        
+        # Form for tunnel name
+        form_layout = QFormLayout()
+        self.name_input = QLineEdit(self.tunnel_name)
+        form_layout.addRow('Tunnel name:', self.name_input)
+        layout.addLayout(form_layout)
+        
+        # Info label
+        info = QLabel('Edit the WireGuard configuration below:')
+        layout.addWidget(info)
+        
+        # Editor
+        self.editor = QTextEdit()
+        self.editor.setPlainText(self.config_content)
+        self.editor.setFont(QFont('Courier', 10))
+        layout.addWidget(self.editor)
+        
+        # Validation runs shortly after typing stops, only changed sections are re-checked
+        self.issues_label = QLabel()
+        self.issues_label.setWordWrap(True)
+        layout.addWidget(self.issues_label)
+        self.validate_timer = QTimer(self)
+        self.validate_timer.setSingleShot(True)
+        self.validate_timer.setInterval(150)
+        self.validate_timer.timeout.connect(self.validate)
+        self.editor.textChanged.connect(self.validate_timer.start)
+        
+        # Buttons
+        btn_layout = QHBoxLayout()
+        
+        save_btn = QPushButton('Save')
+        save_btn.setStyleSheet("background-color: #ea5c1f; color: white; padding: 8px; border-radius: 3px;")
+        save_btn.clicked.connect(self.save_and_accept)
+        btn_layout.addWidget(save_btn)
+        
+        cancel_btn = QPushButton('Cancel')
+        cancel_btn.clicked.connect(self.reject)
+        btn_layout.addWidget(cancel_btn)
+        
+        layout.addLayout(btn_layout)
+        
+    def validate(self):
+        """Check the config and mark problem lines"""
+        self.issues = self.validator.validate(self.editor.toPlainText())
+        
+        selections = []
+        for issue in self.issues:
+            selection = QTextEdit.ExtraSelection()
+            selection.format.setUnderlineStyle(QTextCharFormat.WaveUnderline)
+            selection.format.setUnderlineColor(
+                QColor('#ff5c3c') if issue.severity == 'error' else QColor('#e0a030'))
+            block = self.editor.document().findBlockByNumber(issue.line - 1)
+            selection.cursor = QTextCursor(block)
+            selection.cursor.select(QTextCursor.LineUnderCursor)
+            selections.append(selection)
+        self.editor.setExtraSelections(selections)
+        
+        if not self.issues:
+            self.issues_label.setText("✓ Configuration is valid")
+            self.issues_label.setStyleSheet("color: #4caf50;")
+        else:
+            lines = [f"{'✗' if i.severity == 'error' else '⚠'} {i}" for i in self.issues[:5]]
+            if len(self.issues) > 5:
+                lines.append(f"… and {len(self.issues) - 5} more")
+            self.issues_label.setText('\n'.join(lines))
+            self.issues_label.setStyleSheet(
+                "color: #ff5c3c;" if config_errors(self.issues) else "color: #e0a030;")
+        
+    def save_and_accept(self):
+        """Save the new tunnel name and accept"""
+        self.new_tunnel_name = self.name_input.text().strip()
+        if not self.new_tunnel_name:
+            QMessageBox.warning(self, "Error", "Tunnel name cannot be empty!")
+            return
+        if not TUNNEL_NAME.match(self.new_tunnel_name):
+            QMessageBox.warning(self, "Error", "Invalid tunnel name. Use up to 15 letters, digits or _=+.-")
+            return
+        self.validate_timer.stop()
+        self.validate()
+        errors = config_errors(self.issues)
+        if errors and not confirm_invalid_config(self, errors, "Save anyway?"):
+            return
+        self.accept()
+        
+    def get_config(self):
+        """Get the edited configuration"""
+        return self.editor.toPlainText()
+    
+    def get_tunnel_name(self):
+        """Get the new tunnel name"""
+        return self.new_tunnel_name
+    
+    def apply_dark_theme(self):
+        """Apply dark theme to dialog"""
+        self.setStyleSheet("""
+            QDialog {
+                background-color: #2b2b2b;
+                color: #ffffff;
+            }
+            QLabel {
+                color: #ffffff;
+            }
+            QLineEdit {
+                background-color: #3c3c3c;
+                color: #ffffff;
+                border: 1px solid #555555;
+                padding: 5px;
+                border-radius: 3px;
+            }
+            QTextEdit {
+                background-color: #1e1e1e;
+                color: #d4d4d4;
+                border: 1px solid #555555;
+                border-radius: 3px;
+            }
+            QPushButton {
+                background-color: #3c3c3c;
+                color: #ffffff;
+                border: 1px solid #555555;
+                padding: 8px;
+                border-radius: 3px;
+            }
+            QPushButton:hover {
+                background-color: #4a4a4a;
+            }
+        """)
+
+class ConfigHistoryDialog(QDialog):
+    """Saved versions of a config, with a diff against the current one and restore"""
+    def __init__(self, tunnel_name, versions, current_config, load_version, theme, parent=None):
+        super().__init__(parent)
+        self.tunnel_name = tunnel_name
+        self.versions = versions
+        self.current_config = current_config
+        self.load_version = load_version
+        self.theme = theme
+        self.selected_config = None
+        self.initUI()
+        if theme == "dark":
+            self.apply_dark_theme()
+        if versions:
+            self.version_list.setCurrentRow(0)
+            
+    def initUI(self):
+        self.setWindowTitle(f'History: {self.tunnel_name}')
+        self.setGeometry(200, 200, 750, 550)
+        
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+        
+        splitter = QSplitter(Qt.Horizontal)
+        self.version_list = QListWidget()
+        for timestamp, digest in self.versions:
+            when = datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+            item = QListWidgetItem(f"{when}  {digest[:8]}")
+            item.setData(Qt.UserRole, digest)
+            self.version_list.addItem(item)
+        self.version_list.currentItemChanged.connect(self.show_diff)
+        splitter.addWidget(self.version_list)
+        
+        self.diff_view = QTextEdit()
+        self.diff_view.setReadOnly(True)
+        self.diff_view.setFont(QFont('Courier', 10))
+        splitter.addWidget(self.diff_view)
+        splitter.setSizes([220, 530])
+        layout.addWidget(splitter)
+        
+        if not self.versions:
+            self.diff_view.setPlainText("No saved versions yet.")
+        
+        btn_layout = QHBoxLayout()
+        self.restore_btn = QPushButton('Restore this version')
+        self.restore_btn.setStyleSheet("background-color: #ea5c1f; color: white; padding: 8px; border-radius: 3px;")
+        self.restore_btn.setEnabled(False)
+        self.restore_btn.clicked.connect(self.accept)
+        btn_layout.addWidget(self.restore_btn)
+        
+        close_btn = QPushButton('Close')
+        close_btn.clicked.connect(self.reject)
+        btn_layout.addWidget(close_btn)
+        
+        layout.addLayout(btn_layout)
+        
+    def show_diff(self, item, _previous=None):
+        """Show what restoring the selected version would change"""
+        if item is None:
+            return
+        try:
+            self.selected_config = self.load_version(item.data(Qt.UserRole))
+        except (OSError, ValueError) as e:
+            self.selected_config = None
+            self.restore_btn.setEnabled(False)
+            self.diff_view.setPlainText(f"Could not load this version:\n{e}")
+            return
+        diff = list(difflib.unified_diff(self.current_config.splitlines(),
+                                         self.selected_config.splitlines(),
+                                         'current', 'selected version', lineterm=''))
+        self.restore_btn.setEnabled(bool(diff))
+        if not diff:
+            self.diff_view.setPlainText("Identical to the current configuration.")
+            return
+        colors = {'+': '#4caf50', '-': '#ff5c3c', '@': '#2196f3'}
+        lines = []
+        for line in diff:
+            color = colors.get(line[:1])
+            escaped = html.escape(line)
+            lines.append(f'<span style="color: {color};">{escaped}</span>' if color else escaped)
+        self.diff_view.setHtml(f"<pre>{chr(10).join(lines)}</pre>")
+        
+    def get_config(self):
+        """Text of the version to restore"""
+        return self.selected_config
+    
+    def apply_dark_theme(self):
+        """Apply dark theme to dialog"""
+        self.setStyleSheet("""
+            QDialog {
+                background-color: #2b2b2b;
+                color: #ffffff;
+            }
+            QListWidget, QTextEdit {
+                background-color: #1e1e1e;
+                color: #d4d4d4;
+                border: 1px solid #555555;
+                border-radius: 3px;
+            }
+            QPushButton {
+                background-color: #3c3c3c;
+                color: #ffffff;
+                border: 1px solid #555555;
+                padding: 8px;
+                border-radius: 3px;
+            }
+            QPushButton:hover {
+                background-color: #4a4a4a;
+            }
+        """)
+
+def confirm_invalid_config(parent, errors, question):
+    """Ask whether to go on with a config that has errors"""
+    details = '\n'.join(str(error) for error in errors[:10])
+    if len(errors) > 10:
+        details += f"\n… and {len(errors) - 10} more"
+    reply = QMessageBox.question(parent, 'Invalid configuration',
+                                 f"The configuration has {len(errors)} error(s), "
+                                 f"wg-quick will likely reject it:\n\n{details}\n\n{question}",
+                                 QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+    return reply == QMessageBox.Yes
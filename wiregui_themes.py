@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Themes of the WireGUI main window
+
+A theme is a set of named colours, compiled into one stylesheet the first
+time it is used. Widgets that change with the tunnel state (the toggle
+button, the status dot) are matched by a `state` property in that
+stylesheet, so a status update only switches a property instead of
+parsing CSS again.
+
+User themes are JSON files in ~/.config/WireGUI/themes, e.g. nord.json:
+
+    {"name": "Nord", "base": "dark",
+     "colors": {"accent": "#88c0d0", "window": "#2e3440"}}
+
+Colours missing from the file are taken from the base theme. The button
+border may also be "none" to draw buttons without one.
+"""
+
+import os
+import re
+import json
+from string import Template
+
+DARK = {
+    'window': '#1e1e1e',
+    'base': '#2b2b2b',
+    'text': '#ffffff',
+    'list': '#252526',
+    'list_text': '#cccccc',
+    'border': '#3e3e3e',
+    'hover': '#3e3e3e',
+    'accent': '#ff5c3c',
+    'accent_text': '#ffffff',
+    'editor': '#1e1e1e',
+    'editor_text': '#d4d4d4',
+    'button': '#3c3c3c',
+    'button_text': '#ffffff',
+    'button_border': '#555555',
+    'button_hover': '#4a4a4a',
+    'disabled': '#2b2b2b',
+    'disabled_text': '#666666',
+    'tab': '#2b2b2b',
+    'tab_text': '#cccccc',
+    'tab_hover': '#3c3c3c',
+    # Tunnel list rows
+    'tunnel_active': '#ff5c3c',
+    'tunnel_inactive': '#cccccc',
+    'tunnel_stale': '#e0a030',
+    # Status dot and toggle button
+    'connected': '#4caf50',
+    'stale': '#e0a030',
+    'disconnected': '#dc3545',
+    'unknown': '#666666',
+    'activate': '#ff5c3c',
+    'activate_hover': '#ff7659',
+    'deactivate': '#dc3545',
+    'deactivate_hover': '#c82333',
+}
+
+LIGHT = dict(DARK, **{
+    'window': '#ffffff',
+    'base': '#f5f5f5',
+    'text': '#000000',
+    'list': '#ffffff',
+    'list_text': '#000000',
+    'border': '#cccccc',
+    'hover': '#e0e0e0',
+    'editor': '#ffffff',
+    'editor_text': '#000000',
+    'button': '#ff5c3c',
+    'button_text': '#ffffff',
+    'button_border': 'none',
+    'button_hover': '#ff7659',
+    'disabled': '#cccccc',
+    'disabled_text': '#666666',
+    'tab': '#e0e0e0',
+    'tab_text': '#000000',
+    'tab_hover': '#d0d0d0',
+    'tunnel_inactive': '#000000',
+})
+
+STYLESHEET = Template("""
+    QMainWindow {
+        background-color: $window;
+    }
+    QWidget {
+        background-color: $base;
+        color: $text;
+    }
+    QListView {
+        background-color: $list;
+        border: 1px solid $border;
+        color: $list_text;
+    }
+    QListView::item:selected {
+        background-color: $accent;
+        color: $accent_text;
+    }
+    QListView::item:hover {
+        background-color: $hover;
+    }
+    QTextEdit {
+        background-color: $editor;
+        color: $editor_text;
+        border: 1px solid $border;
+    }
+    QLabel {
+        color: $text;
+    }
+    QPushButton {
+        background-color: $button;
+        color: $button_text;
+        border: $button_border_rule;
+        padding: 8px;
+        border-radius: 3px;
+    }
+    QPushButton:hover {
+        background-color: $button_hover;
+    }
+    QPushButton:disabled {
+        background-color: $disabled;
+        color: $disabled_text;
+    }
+    QTabWidget::pane {
+        border: 1px solid $border;
+        background-color: $base;
+    }
+    QTabBar::tab {
+        background-color: $tab;
+        color: $tab_text;
+        padding: 8px 20px;
+        border: 1px solid $border;
+    }
+    QTabBar::tab:selected {
+        background-color: $accent;
+        color: $accent_text;
+    }
+    QTabBar::tab:hover {
+        background-color: $tab_hover;
+    }
+    QPushButton#toggle[state="activate"] {
+        background-color: $activate;
+        color: $accent_text;
+        border: none;
+    }
+    QPushButton#toggle[state="activate"]:hover {
+        background-color: $activate_hover;
+    }
+    QPushButton#toggle[state="deactivate"] {
+        background-color: $deactivate;
+        color: $accent_text;
+        border: none;
+    }
+    QPushButton#toggle[state="deactivate"]:hover {
+        background-color: $deactivate_hover;
+    }
+    QLabel#status_dot[state="connected"] {
+        color: $connected;
+    }
+    QLabel#status_dot[state="stale"] {
+        color: $stale;
+    }
+    QLabel#status_dot[state="disconnected"] {
+        color: $disconnected;
+    }
+    QLabel#status_dot[state="unknown"] {
+        color: $unknown;
+    }
+""")
+
+# Hex, rgb()/rgba() or a colour name, nothing that could end a CSS rule
+COLOR = re.compile(r'^(#[0-9a-fA-F]{3,8}|[a-zA-Z]{3,20}|rgba?\(\s*[0-9.%,\s]+\))$')
+
+class Theme:
+    """Named colours plus the stylesheet compiled from them"""
+    def __init__(self, theme_id, label, colors, dark):
+        self.id = theme_id
+        self.label = label
+        self.colors = colors
+        self.dark = dark
+        self._stylesheet = None
+
+    @property
+    def stylesheet(self):
+        """The main window stylesheet, compiled on first use"""
+        if self._stylesheet is None:
+            border = self.colors['button_border']
+            rule = 'none' if border == 'none' else f"1px solid {border}"
+            self._stylesheet = STYLESHEET.substitute(self.colors, button_border_rule=rule)
+        return self._stylesheet
+
+BUILTIN_THEMES = {
+    'dark': Theme('dark', 'Dark Mode', DARK, dark=True),
+    'light': Theme('light', 'Light Mode', LIGHT, dark=False),
+}
+
+def themes_dir():
+    config_home = os.environ.get('XDG_CONFIG_HOME') or os.path.expanduser('~/.config')
+    return os.path.join(config_home, 'WireGUI', 'themes')
+
+def load_theme_file(path):
+    """Read a user theme, raises ValueError (or OSError) if it is unusable"""
+    with open(path, encoding='utf-8') as f:
+        try:
+            data = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"not valid JSON: {e}")
+    if not isinstance(data, dict):
+        raise ValueError("expected a JSON object")
+    base = data.get('base', 'dark')
+    if base not in BUILTIN_THEMES:
+        raise ValueError(f"unknown base theme {base!r}, use 'dark' or 'light'")
+    colors = data.get('colors', {})
+    if not isinstance(colors, dict):
+        raise ValueError("'colors' must be an object")
+    for key, value in colors.items():
+        if key not in DARK:
+            raise ValueError(f"unknown colour {key!r}")
+        if not isinstance(value, str) or not COLOR.match(value.strip()):
+            raise ValueError(f"invalid value for {key!r}: {value!r}")
+    theme_id = os.path.basename(path)[:-5]
+    label = data.get('name') or theme_id
+    if not isinstance(label, str):
+        raise ValueError("'name' must be a string")
+    base_theme = BUILTIN_THEMES[base]
+    return Theme(theme_id, label,
+                 dict(base_theme.colors, **{key: value.strip() for key, value in colors.items()}),
+                 base_theme.dark)
+
+def load_themes(directory=None):
+    """Built-in plus user themes as ({id: Theme}, [error messages])"""
+    themes = dict(BUILTIN_THEMES)
+    errors = []
+    directory = directory or themes_dir()
+    try:
+        names = sorted(f for f in os.listdir(directory) if f.endswith('.json'))
+    except FileNotFoundError:
+        return themes, errors
+    except OSError as e:
+        return themes, [f"{directory}: {e}"]
+    for name in names:
+        path = os.path.join(directory, name)
+        try:
+            theme = load_theme_file(path)
+        except (OSError, ValueError) as e:
+            errors.append(f"{path}: {e}")
+            continue
+        if theme.id in themes:
+            errors.append(f"{path}: the built-in theme {theme.id!r} cannot be replaced")
+            continue
+        themes[theme.id] = theme
+    return themes, errors